@@ -28,7 +28,7 @@ CREATE TABLE IF NOT EXISTS portfolios (
 -- Stock information table
 CREATE TABLE IF NOT EXISTS stocks (
     stock_id INT AUTO_INCREMENT PRIMARY KEY,
-    symbol VARCHAR(10) NOT NULL UNIQUE,
+    symbol VARCHAR(10) COLLATE utf8mb4_0900_ai_ci NOT NULL UNIQUE, -- case-insensitive so symbol lookups use the index
     company_name VARCHAR(200),
     display_name VARCHAR(200),
     sector VARCHAR(100),
@@ -101,7 +101,7 @@ CREATE TABLE IF NOT EXISTS stock_historical_data (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (stock_id) REFERENCES stocks(stock_id) ON DELETE CASCADE,
     UNIQUE KEY unique_stock_date (stock_id, date),
-    INDEX idx_stock_date (stock_id, date),
+    INDEX idx_stock_date_close (stock_id, date, close_price), -- covers per-stock COUNT/MAX(date) and close-price reads
     INDEX idx_date (date)
 );
 
@@ -138,6 +138,17 @@ CREATE TABLE IF NOT EXISTS stock_metadata (
     FOREIGN KEY (stock_id) REFERENCES stocks(stock_id) ON DELETE CASCADE
 );
 
+-- Best ARIMA (p, d, q) per stock, reused for a week instead of re-running the grid search
+CREATE TABLE IF NOT EXISTS arima_cache (
+    stock_id INT PRIMARY KEY,
+    p TINYINT NOT NULL,
+    d TINYINT NOT NULL,
+    q TINYINT NOT NULL,
+    aic DOUBLE,
+    fitted_at DATETIME NOT NULL,
+    FOREIGN KEY (stock_id) REFERENCES stocks(stock_id) ON DELETE CASCADE
+);
+
 -- Insert sample data
 INSERT IGNORE INTO users (username, email) VALUES 
 ('user1', 'user1@example.com'),
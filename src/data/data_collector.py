@@ -2,6 +2,7 @@ from curses import longname
 import yfinance as yf
 import pandas as pd
 import csv
+import threading
 import time
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List, Union
@@ -13,23 +14,42 @@ class DataCollector:
     Enhanced data collector for Yahoo Finance API with flexible date/period options
     """
     
+    DOWNLOAD_BATCH_SIZE = 20  # Symbols per multi-ticker Yahoo request
+    
+    upsert_history_stmt = """
+    INSERT INTO stock_historical_data 
+    (stock_id, date, open_price, high_price, low_price, close_price, 
+     adj_close_price, volume, daily_return)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        open_price = VALUES(open_price),
+        high_price = VALUES(high_price),
+        low_price = VALUES(low_price),
+        close_price = VALUES(close_price),
+        adj_close_price = VALUES(adj_close_price),
+        volume = VALUES(volume),
+        daily_return = VALUES(daily_return)
+    """
+    
     def __init__(self):
         self.db = DatabaseConnection()
         self.data_cache = {}  # Cache for recently fetched data
         self.last_request_time = 0
         self.min_request_interval = 1.0  # Minimum 1 second between requests
+        self._rate_lock = threading.Lock()
     
     def _rate_limit(self):
-        """Ensure we don't exceed rate limits"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last_request
+        """Ensure we don't exceed rate limits (safe to call from several threads)"""
+        # Reserve the next request slot under the lock, then sleep outside it
+        with self._rate_lock:
+            current_time = time.time()
+            slot = max(current_time, self.last_request_time + self.min_request_interval)
+            self.last_request_time = slot
+        
+        sleep_time = slot - current_time
+        if sleep_time > 0:
             print(f"Rate limiting: waiting {sleep_time:.2f} seconds...")
             time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
 
     def get_stock_info(self, symbol: str, max_retries: int = 3) -> Optional[Dict]:
         """
@@ -50,40 +70,7 @@ class DataCollector:
                 info = ticker.info
                 print(f"Info retrieved for {symbol} /n {info.get(longname)}")
                 
-                return {
-                    'symbol': symbol,
-                    'name': info.get('longName', 'N/A'),
-                    'displayName': info.get('displayName', info.get('shortName', 'N/A')),
-                    'exchange': info.get('exchange', 'N/A'),
-                    'sector': info.get('sector', 'N/A'),
-                    'industry': info.get('industry', 'N/A'),
-                    'market_cap': info.get('marketCap'),
-                    'current_price': info.get('currentPrice', info.get('regularMarketPrice')),
-                    'previous_close': info.get('previousClose', info.get('regularMarketPreviousClose')),
-                    'volume': info.get('volume', info.get('regularMarketVolume')),
-                    'average_volume': info.get('averageVolume'),
-                    'pe_ratio': info.get('trailingPE'),
-                    'dividend_yield': info.get('dividendYield'),
-                    'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
-                    'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
-                    'beta': info.get('beta'),
-                    'eps': info.get('trailingEps', info.get('epsTrailingTwelveMonths')),
-                    'book_value': info.get('bookValue'),
-                    'price_to_book': info.get('priceToBook'),
-                    'forward_pe': info.get('forwardPE'),
-                    'price_to_sales': info.get('priceToSalesTrailing12Months'),
-                    'profit_margins': info.get('profitMargins'),
-                    'return_on_equity': info.get('returnOnEquity'),
-                    'return_on_assets': info.get('returnOnAssets'),
-                    'debt_to_equity': info.get('debtToEquity'),
-                    'revenue_growth': info.get('revenueGrowth'),
-                    'earnings_growth': info.get('earningsGrowth'),
-                    'recommendation_mean': info.get('recommendationMean'),
-                    'target_high_price': info.get('targetHighPrice'),
-                    'target_low_price': info.get('targetLowPrice'),
-                    'target_mean_price': info.get('targetMeanPrice'),
-                    'analyst_count': info.get('numberOfAnalystOpinions', 0)
-                }
+                return self._info_to_dict(symbol, info)
                 
             except Exception as e:
                 if "429" in str(e) or "Too Many Requests" in str(e):
@@ -103,6 +90,75 @@ class DataCollector:
         print(f"Failed to fetch {symbol} after {max_retries} attempts")
         return None
     
+    @staticmethod
+    def _info_to_dict(symbol: str, info: Dict) -> Dict:
+        """Map a raw yfinance info dict onto the fields the rest of the app uses"""
+        return {
+            'symbol': symbol,
+            'name': info.get('longName', 'N/A'),
+            'displayName': info.get('displayName', info.get('shortName', 'N/A')),
+            'exchange': info.get('exchange', 'N/A'),
+            'sector': info.get('sector', 'N/A'),
+            'industry': info.get('industry', 'N/A'),
+            'market_cap': info.get('marketCap'),
+            'current_price': info.get('currentPrice', info.get('regularMarketPrice')),
+            'previous_close': info.get('previousClose', info.get('regularMarketPreviousClose')),
+            'volume': info.get('volume', info.get('regularMarketVolume')),
+            'average_volume': info.get('averageVolume'),
+            'pe_ratio': info.get('trailingPE'),
+            'dividend_yield': info.get('dividendYield'),
+            'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
+            'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
+            'beta': info.get('beta'),
+            'eps': info.get('trailingEps', info.get('epsTrailingTwelveMonths')),
+            'book_value': info.get('bookValue'),
+            'price_to_book': info.get('priceToBook'),
+            'forward_pe': info.get('forwardPE'),
+            'price_to_sales': info.get('priceToSalesTrailing12Months'),
+            'profit_margins': info.get('profitMargins'),
+            'return_on_equity': info.get('returnOnEquity'),
+            'return_on_assets': info.get('returnOnAssets'),
+            'debt_to_equity': info.get('debtToEquity'),
+            'revenue_growth': info.get('revenueGrowth'),
+            'earnings_growth': info.get('earningsGrowth'),
+            'recommendation_mean': info.get('recommendationMean'),
+            'target_high_price': info.get('targetHighPrice'),
+            'target_low_price': info.get('targetLowPrice'),
+            'target_mean_price': info.get('targetMeanPrice'),
+            'analyst_count': info.get('numberOfAnalystOpinions', 0)
+        }
+
+    def get_stock_bundle(self, symbol: str, period: str = '1mo') -> tuple:
+        """
+        Get stock info and recent history from one yf.Ticker, sharing its HTTP session
+        
+        A non-empty info dict means Yahoo recognises the symbol, so callers can
+        treat it as validation instead of making a separate request.
+        
+        Returns:
+            (info dict or None, history DataFrame or None)
+        """
+        info, hist = None, None
+        try:
+            self._rate_limit()
+            ticker = yf.Ticker(symbol)
+            
+            raw_info = ticker.info
+            if raw_info:
+                info = self._info_to_dict(symbol, raw_info)
+            
+            hist = ticker.history(period=period)
+            if hist.empty:
+                hist = None
+            else:
+                hist['Symbol'] = symbol
+                hist.reset_index(inplace=True)
+                self.data_cache[symbol] = hist
+        except Exception as e:
+            print(f"Error fetching stock bundle for {symbol}: {str(e)}")
+        
+        return info, hist
+    
     def get_historical_data(
                             self, 
                             symbol: str, 
@@ -199,15 +255,15 @@ class DataCollector:
             data = ticker.history(period='1d', interval='1m')
             
             if not data.empty:
-                latest = data.iloc[-1]
+                # Scalar reads per column; data.iloc[-1] would build a mixed-dtype row Series
                 return {
                     'symbol': symbol,
                     'timestamp': data.index[-1],
-                    'price': float(latest['Close']),
-                    'volume': int(latest['Volume']),
-                    'high': float(latest['High']),
-                    'low': float(latest['Low']),
-                    'open': float(latest['Open'])
+                    'price': float(data['Close'].iat[-1]),
+                    'volume': int(data['Volume'].iat[-1]),
+                    'high': float(data['High'].iat[-1]),
+                    'low': float(data['Low'].iat[-1]),
+                    'open': float(data['Open'].iat[-1])
                 }
             return None
         except Exception as e:
@@ -249,47 +305,107 @@ class DataCollector:
             print(f"Error fetching stock data for {symbol}: {str(e)}")
             return False
     
+    def fetch_stock_data_batch(self, symbols: List[str], period: str = '1y', 
+                               interval: str = '1d') -> Dict[str, bool]:
+        """
+        Fetch and store historical data for many stocks already in the database,
+        using one multi-ticker Yahoo request per DOWNLOAD_BATCH_SIZE symbols
+        
+        Args:
+            symbols: List of stock ticker symbols
+            period: Time period for historical data
+            interval: Data interval
+            
+        Returns:
+            Dictionary with {symbol: success_status}
+        """
+        symbols = [symbol.upper() for symbol in symbols]
+        results = {symbol: False for symbol in symbols}
+        if not symbols:
+            return results
+        
+        placeholders = ",".join(["%s"] * len(symbols))
+        rows = self.db.execute_query(
+            f"SELECT symbol, stock_id FROM stocks WHERE symbol IN ({placeholders})", tuple(symbols)
+        )
+        stock_ids = {symbol.upper(): stock_id for symbol, stock_id in rows or []}
+        
+        records = []
+        for i in range(0, len(symbols), self.DOWNLOAD_BATCH_SIZE):
+            batch = symbols[i:i + self.DOWNLOAD_BATCH_SIZE]
+            try:
+                self._rate_limit()
+                data = yf.download(" ".join(batch), period=period, interval=interval,
+                                   group_by='ticker', threads=True, progress=False)
+            except Exception as e:
+                print(f"Error fetching historical data for {', '.join(batch)}: {str(e)}")
+                continue
+            
+            if data is None or data.empty:
+                print(f"No data found for {', '.join(batch)}")
+                continue
+            
+            for symbol in batch:
+                stock_id = stock_ids.get(symbol)
+                if not stock_id:
+                    print(f"Could not find stock ID for {symbol}")
+                    continue
+                
+                # Columns are (ticker, field) pairs; a ticker with no data is absent or all-NaN
+                if isinstance(data.columns, pd.MultiIndex):
+                    if symbol not in data.columns.get_level_values(0):
+                        print(f"No data found for {symbol}")
+                        continue
+                    hist = data[symbol]
+                else:
+                    hist = data
+                hist = hist.dropna(subset=['Close'])
+                if hist.empty:
+                    print(f"No data found for {symbol}")
+                    continue
+                
+                records.extend(self._historical_records(stock_id, hist))
+                results[symbol] = True
+        
+        if records:
+            self.db.execute_batch(self.upsert_history_stmt, records)
+            if self.db.last_error is not None:
+                return {symbol: False for symbol in symbols}
+            print(f"Stored {len(records)} historical records for {sum(results.values())} stocks")
+        
+        return results
+    
     def _store_historical_data(self, stock_id: int, symbol: str, df: pd.DataFrame) -> bool:
         """Store historical data in database"""
+        # A connection that is already open belongs to the caller's session
+        # (e.g. shared by ARIMAPortfolioTrader); only tear down one made here
+        owns_connection = not (self.db.connection and self.db.connection.is_connected())
         try:
-            if not self.db.connect():
+            if owns_connection and not self.db.connect():
                 print("Failed to connect to database")
                 return False
             
-            # Prepare data for insertion
+            # Prepare data for insertion: one itertuples pass over plain tuples
+            # instead of building a Series per row with iterrows
+            dates = df['Date'] if 'Date' in df.columns else df.index
+            adj_close = df['Adj Close'] if 'Adj Close' in df.columns else df['Close']
+            prices = df[['Open', 'High', 'Low', 'Close']].assign(adj_close=adj_close, volume=df['Volume'])
+            
             records = []
-            for index, row in df.iterrows():
-                # Handle different date sources - check if 'Date' column exists first
-                try:
-                    if 'Date' in df.columns:
-                        # Use the Date column value
-                        date_val = row['Date']
-                    else:
-                        # Use the index
-                        date_val = index
-                    
-                    # Convert to proper date format
-                    if hasattr(date_val, 'strftime'):
-                        date_str = date_val.strftime('%Y-%m-%d')
-                    elif hasattr(date_val, 'date'):
-                        date_str = date_val.date().strftime('%Y-%m-%d')
-                    else:
-                        # Convert to pandas Timestamp then to date
-                        date_str = pd.to_datetime(date_val).strftime('%Y-%m-%d')
-                        
-                except Exception as e:
-                    print(f"Warning: Could not parse date {date_val}, skipping record: {e}")
+            for date_val, (open_, high, low, close, adj, volume) in zip(dates, prices.itertuples(index=False, name=None)):
+                date_str = self._to_date_str(date_val)
+                if date_str is None:
                     continue
                 
                 records.append((
                     stock_id,
                     date_str,
-                    float(row.get('Open', 0)),
-                    float(row.get('High', 0)),
-                    float(row.get('Low', 0)),
-                    float(row.get('Close', 0)),
-                    float(row.get('Adj Close', row.get('Close', 0))),
-                    int(row.get('Volume', 0))
+                    float(open_),
+                    float(high),
+                    float(low),
+                    float(close),
+                    float(adj),
+                    int(volume)
                 ))
             
             # Insert historical data
@@ -306,8 +422,10 @@ class DataCollector:
             volume = VALUES(volume)
             """
             
-            for record in records:
-                self.db.execute_update(insert_query, record)
+            # executemany in 5000-row chunks with one commit instead of a round-trip per row
+            self.db.execute_batch(insert_query, records)
+            if self.db.last_error is not None:
+                return False
             
             print(f"Stored {len(records)} historical records for {symbol}")
             return True
@@ -316,7 +434,51 @@ class DataCollector:
             print(f"Error storing historical data for {symbol}: {str(e)}")
             return False
         finally:
-            self.db.disconnect()
+            if owns_connection:
+                self.db.disconnect()
+    
+    def _historical_records(self, stock_id: int, hist: pd.DataFrame) -> List[tuple]:
+        """Build stock_historical_data insert tuples (with daily returns) from a history frame"""
+        # Calculate daily returns
+        daily_returns = hist['Close'].pct_change()
+        
+        dates = hist['Date'] if 'Date' in hist.columns else hist.index
+        prices = hist[['Open', 'High', 'Low', 'Close', 'Volume']].assign(daily_return=daily_returns)
+        
+        records = []
+        for date_val, (open_, high, low, close, volume, daily_return) in zip(dates, prices.itertuples(index=False, name=None)):
+            date_str = self._to_date_str(date_val)
+            if date_str is None:
+                continue
+            
+            close = float(close) if pd.notna(close) else None
+            records.append((
+                stock_id,
+                date_str,
+                float(open_) if pd.notna(open_) else None,
+                float(high) if pd.notna(high) else None,
+                float(low) if pd.notna(low) else None,
+                close,
+                close,  # Using Close as adj_close for simplicity
+                int(volume) if pd.notna(volume) else 0,
+                float(daily_return) if pd.notna(daily_return) else None
+            ))
+        return records
+    
+    @staticmethod
+    def _to_date_str(date_val) -> Optional[str]:
+        """Format a Date column/index value as YYYY-MM-DD, or None if it can't be parsed"""
+        try:
+            if hasattr(date_val, 'strftime'):
+                return date_val.strftime('%Y-%m-%d')
+            elif hasattr(date_val, 'date'):
+                return date_val.date().strftime('%Y-%m-%d')
+            else:
+                # Convert to pandas Timestamp then to date
+                return pd.to_datetime(date_val).strftime('%Y-%m-%d')
+        except Exception as e:
+            print(f"Warning: Could not parse date {date_val}, skipping record: {e}")
+            return None
     
     def add_stock_to_database(self, symbol: str) -> bool:
         """
@@ -537,63 +699,14 @@ class DataCollector:
                 self._update_stock_metadata(stock_id, stock_info)
             
             # Prepare data for insertion into stock_historical_data table
-            insert_query = """
-            INSERT INTO stock_historical_data 
-            (stock_id, date, open_price, high_price, low_price, close_price, 
-             adj_close_price, volume, daily_return)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                open_price = VALUES(open_price),
-                high_price = VALUES(high_price),
-                low_price = VALUES(low_price),
-                close_price = VALUES(close_price),
-                adj_close_price = VALUES(adj_close_price),
-                volume = VALUES(volume),
-                daily_return = VALUES(daily_return)
-            """
+            records = self._historical_records(stock_id, hist)
             
-            # Calculate daily returns
-            hist['daily_return'] = hist['Close'].pct_change()
-            
-            inserted_count = 0
-            for idx, row in hist.iterrows():
-                # Handle Date column properly with better error handling
-                try:
-                    if 'Date' in hist.columns:
-                        date_val = row['Date']
-                    else:
-                        date_val = idx
-                    
-                    # Convert to proper date format
-                    if hasattr(date_val, 'strftime'):
-                        date_str = date_val.strftime('%Y-%m-%d')
-                    elif hasattr(date_val, 'date'):
-                        date_str = date_val.date().strftime('%Y-%m-%d')
-                    else:
-                        # Convert to pandas Timestamp then to date
-                        date_str = pd.to_datetime(date_val).strftime('%Y-%m-%d')
-                        
-                except Exception as e:
-                    print(f"Warning: Could not parse date {date_val}, skipping record: {e}")
-                    continue
-                
-                params = (
-                    stock_id,
-                    date_str,
-                    float(row['Open']) if pd.notna(row['Open']) else None,
-                    float(row['High']) if pd.notna(row['High']) else None,
-                    float(row['Low']) if pd.notna(row['Low']) else None,
-                    float(row['Close']) if pd.notna(row['Close']) else None,
-                    float(row['Close']) if pd.notna(row['Close']) else None,  # Using Close as adj_close for simplicity
-                    int(row['Volume']) if pd.notna(row['Volume']) else 0,
-                    float(row['daily_return']) if pd.notna(row['daily_return']) else None
-                )
-                
-                result = self.db.execute_update(insert_query, params)
-                if result > 0:
-                    inserted_count += 1
+            # executemany in 5000-row chunks with one commit instead of a round-trip per row
+            self.db.execute_batch(self.upsert_history_stmt, records)
+            if self.db.last_error is not None:
+                return False
             
-            print(f"  Inserted/Updated {inserted_count} records for {symbol}")
+            print(f"  Inserted/Updated {len(records)} records for {symbol}")
             return True
             
         except Exception as e:
@@ -376,61 +376,84 @@ class DataPreprocessor:
                     return False
                 stock_id = result[0][0]
             
-            # Get historical data for the stock, ordered by date
+            # Get historical data ordered by date: for one stock, or for every
+            # stock in one query (ordered by stock) instead of a SELECT per stock
             if stock_id:
                 query = """
-                SELECT date, close_price 
+                SELECT stock_id, date, close_price 
                 FROM stock_historical_data 
                 WHERE stock_id = %s 
                 ORDER BY date ASC
                 """
                 data = db_connection.execute_query(query, (stock_id,))
-                
-                if not data or len(data) < 2:
-                    logger.warning(f"Insufficient data for stock_id {stock_id} to calculate daily returns")
-                    return False
-                
-                # Convert to DataFrame for easier calculation
-                df = pd.DataFrame(data, columns=['date', 'close_price'])
-                df['close_price'] = pd.to_numeric(df['close_price'])
-                
-                # Calculate daily returns
-                df['daily_return'] = df['close_price'].pct_change()
-                
-                # Update each record in the database
-                update_query = """
-                UPDATE stock_historical_data 
-                SET daily_return = %s 
-                WHERE stock_id = %s AND date = %s
+            else:
+                query = """
+                SELECT stock_id, date, close_price 
+                FROM stock_historical_data 
+                ORDER BY stock_id, date ASC
                 """
-                
-                updated_count = 0
-                for idx, row in df.iterrows():
-                    if pd.notna(row['daily_return']):  # Skip the first row which will be NaN
-                        db_connection.execute_update(
-                            update_query, 
-                            (float(row['daily_return']), stock_id, row['date'])
-                        )
-                        updated_count += 1
-                
-                logger.info(f"Updated daily returns for {updated_count} records for stock_id {stock_id}")
+                data = db_connection.execute_query(query)
+            
+            if not data or len(data) < 2:
+                if stock_id:
+                    logger.warning(f"Insufficient data for stock_id {stock_id} to calculate daily returns")
+                else:
+                    logger.warning("No stock price history found in database")
+                return False
+            
+            # Only float price and id columns are needed: fill typed arrays straight
+            # from the rows instead of building a DataFrame (NULL prices become NaN)
+            ids = np.fromiter((row[0] for row in data), dtype=np.int64, count=len(data))
+            prices = np.fromiter(
+                (np.nan if row[2] is None else float(row[2]) for row in data),
+                dtype=np.float64, count=len(data)
+            )
+            
+            # Pad NULL closes with the stock's last valid close, as pct_change()
+            # did: a NULL row gets a 0 return and the next row is measured
+            # against the last valid close. Indexes only carry forward within a
+            # stock because every stock's first row starts a new run.
+            starts = np.empty(len(ids), dtype=bool)
+            starts[0] = True
+            starts[1:] = ids[1:] != ids[:-1]
+            last_valid = np.where(starts | ~np.isnan(prices), np.arange(len(prices)), 0)
+            np.maximum.accumulate(last_valid, out=last_valid)
+            prices = prices[last_valid]
+            
+            # Calculate daily returns; a stock's first row, and rows before its
+            # first valid close, have no previous close and are left untouched
+            with np.errstate(divide='ignore', invalid='ignore'):
+                daily_returns = prices[1:] / prices[:-1] - 1.0
+            has_prev = ~starts[1:] & ~np.isnan(prices[:-1])
+            # A previous close of 0 gives inf (or NaN for 0/0), which the DECIMAL
+            # column cannot hold; those returns are stored as NULL
+            finite = np.isfinite(daily_returns)
+            
+            update_query = """
+            UPDATE stock_historical_data 
+            SET daily_return = %s 
+            WHERE stock_id = %s AND date = %s
+            """
+            
+            # One executemany batch instead of a round-trip per row
+            params_list = [
+                (daily_return if is_finite else None, row[0], row[1])
+                for daily_return, is_finite, keep, row in zip(daily_returns.tolist(), finite.tolist(),
+                                                              has_prev.tolist(), data[1:])
+                if keep
+            ]
+            db_connection.execute_batch(update_query, params_list)
+            if db_connection.last_error is not None:
+                logger.error(f"Error updating daily returns: {db_connection.last_error}")
+                return False
+            
+            if stock_id:
+                logger.info(f"Updated daily returns for {len(params_list)} records for stock_id {stock_id}")
                 return True
-            else:
-                # Update all stocks if no specific stock provided
-                stocks_query = "SELECT stock_id, symbol FROM stocks"
-                stocks = db_connection.execute_query(stocks_query)
-                
-                if not stocks:
-                    logger.warning("No stocks found in database")
-                    return False
-                
-                total_updated = 0
-                for stock_id, symbol in stocks:
-                    if self.update_daily_returns_in_database(db_connection, stock_id=stock_id):
-                        total_updated += 1
-                
-                logger.info(f"Updated daily returns for {total_updated} stocks")
-                return total_updated > 0
+            
+            total_updated = len({params[1] for params in params_list})
+            logger.info(f"Updated daily returns for {total_updated} stocks")
+            return total_updated > 0
                 
         except Exception as e:
             logger.error(f"Error updating daily returns: {e}")
@@ -1,7 +1,12 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from contextlib import contextmanager
+import threading
 import time
 
+_pool = None
+_pool_lock = threading.Lock()
+
 class DatabaseConnection:
     def __init__(self):
         self.host = 'mysql'  # Docker service name
@@ -9,9 +14,13 @@ class DatabaseConnection:
         self.user = 'stock_user'
         self.password = 'stock_password'
         self.connection = None
+        self._prepared_cursors = {}  # query text -> prepared cursor
+        self.last_error = None  # Error raised by the most recent update/insert/transaction, if any
+        self.last_rowcount = 0  # Rows affected by the most recent execute_insert
 
     def connect(self, max_retries=5):
         """Connect to MySQL database with retry logic"""
+        self._prepared_cursors = {}
         for attempt in range(max_retries):
             try:
                 self.connection = mysql.connector.connect(
@@ -33,14 +42,64 @@ class DatabaseConnection:
                     return False
 
     def disconnect(self):
+        for cursor in self._prepared_cursors.values():
+            try:
+                cursor.close()
+            except Error:
+                pass
+        self._prepared_cursors = {}
         if self.connection and self.connection.is_connected():
             self.connection.close()
             print("MySQL connection closed")
 
-    def execute_query(self, query, params=None):
+    def release(self):
+        """Close cursors and hand the connection back; pooled connections
+        return to the pool instead of being torn down"""
+        for cursor in self._prepared_cursors.values():
+            try:
+                cursor.close()
+            except Error:
+                pass
+        self._prepared_cursors = {}
+        if self.connection:
+            try:
+                # End any open read snapshot so the next borrower sees fresh data
+                self.connection.rollback()
+                self.connection.close()
+            except Error:
+                pass
+            self.connection = None
+
+    def refresh(self):
+        """End the connection's current read snapshot so the next SELECT sees
+        rows committed by other sessions since (InnoDB REPEATABLE READ)"""
+        if not self.connection or not self.connection.is_connected():
+            return self.connect()
+        try:
+            self.connection.commit()
+            return True
+        except Error as e:
+            print(f"Error refreshing connection: {e}")
+            return False
+
+    def execute_query(self, query, params=None, prepared=False):
+        """Run a SELECT and return all rows, or None on error.
+
+        With prepared=True the statement is parsed once per connection as a
+        server-side prepared statement and re-bound on every later call.
+        """
         if not self.connection or not self.connection.is_connected():
             self.connect()
         
+        if prepared:
+            cursor = self._get_prepared_cursor(query)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            except Error as e:
+                print(f"Error executing prepared query: {e}")
+                return None
+        
         cursor = self.connection.cursor()
         try:
             cursor.execute(query, params)
@@ -51,18 +110,186 @@ class DatabaseConnection:
         finally:
             cursor.close()
 
+    def read_dataframe(self, query, params=None, chunksize=None, **kwargs):
+        """Run a SELECT through pandas.read_sql_query on this connection, so
+        pandas builds the typed frame from the cursor without an intermediate
+        list of row tuples. With chunksize the rows are fetched and typed that
+        many at a time and the typed chunks concatenated, so a large result
+        never holds all its rows as Python tuples at once. Extra keyword
+        arguments (parse_dates, index_col, ...) are passed through. Returns
+        None on error."""
+        import pandas as pd
+        if not self.connection or not self.connection.is_connected():
+            self.connect()
+        
+        try:
+            if chunksize is not None:
+                chunks = pd.read_sql_query(query, self.connection, params=params,
+                                           chunksize=chunksize, **kwargs)
+                return pd.concat(chunks)
+            return pd.read_sql_query(query, self.connection, params=params, **kwargs)
+        except Exception as e:
+            print(f"Error reading query into DataFrame: {e}")
+            return None
+
+    def _get_prepared_cursor(self, query):
+        """Return the prepared cursor cached for this query text, creating it on first use"""
+        cursor = self._prepared_cursors.get(query)
+        if cursor is None:
+            cursor = self.connection.cursor(prepared=True)
+            self._prepared_cursors[query] = cursor
+        return cursor
+
+    def stream_query(self, query, params=None, batch_size=100):
+        """Yield rows from an unbuffered cursor so large results are never fully
+        materialized on the client"""
+        if not self.connection or not self.connection.is_connected():
+            self.connect()
+        
+        cursor = self.connection.cursor(buffered=False)
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except Error as e:
+            print(f"Error streaming query: {e}")
+        finally:
+            try:
+                cursor.fetchall()  # drain unread rows if the caller stopped early
+            except Error:
+                pass
+            cursor.close()
+
     def execute_update(self, query, params=None):
         if not self.connection or not self.connection.is_connected():
             self.connect()
         
+        self.last_error = None
         cursor = self.connection.cursor()
         try:
             cursor.execute(query, params)
             self.connection.commit()
             return cursor.rowcount
         except Error as e:
+            self.last_error = e
             print(f"Error executing update: {e}")
             self.connection.rollback()
             return 0
         finally:
-            cursor.close()
\ No newline at end of file
+            cursor.close()
+
+    def execute_insert(self, query, params=None):
+        """Execute an INSERT and return the generated auto-increment id, taken
+        from cursor.lastrowid so no extra SELECT LAST_INSERT_ID() is needed.
+        The affected-row count is kept in last_rowcount (0 when an
+        ON DUPLICATE KEY UPDATE clause left an existing row unchanged).
+        Returns None on error."""
+        if not self.connection or not self.connection.is_connected():
+            self.connect()
+        
+        self.last_error = None
+        self.last_rowcount = 0
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, params)
+            self.connection.commit()
+            self.last_rowcount = cursor.rowcount
+            return cursor.lastrowid
+        except Error as e:
+            self.last_error = e
+            print(f"Error executing insert: {e}")
+            self.connection.rollback()
+            return None
+        finally:
+            cursor.close()
+
+    def execute_prepared_update(self, query, params=None, commit=True):
+        """Execute an update through a server-side prepared statement that is
+        parsed once per connection and re-bound on every later call.
+
+        With commit=False the statement joins the open transaction and the
+        caller commits (or rolls back) once the whole unit of work is done.
+        Returns the affected-row count, or -1 on error (the transaction has
+        then been rolled back and the error is kept in last_error)."""
+        if not self.connection or not self.connection.is_connected():
+            self.connect()
+
+        self.last_error = None
+        cursor = self._get_prepared_cursor(query)
+        try:
+            cursor.execute(query, params)
+            if commit:
+                self.connection.commit()
+            return cursor.rowcount
+        except Error as e:
+            self.last_error = e
+            print(f"Error executing prepared update: {e}")
+            self.connection.rollback()
+            return -1
+
+    def execute_transaction(self, statements):
+        """Execute several (query, params_list) batches with executemany inside
+        one transaction; everything is rolled back if any batch fails"""
+        if not self.connection or not self.connection.is_connected():
+            self.connect()
+        
+        self.last_error = None
+        cursor = self.connection.cursor()
+        try:
+            total_rows = 0
+            for query, params_list in statements:
+                if not params_list:
+                    continue
+                cursor.executemany(query, params_list)
+                total_rows += cursor.rowcount
+            self.connection.commit()
+            return total_rows
+        except Error as e:
+            self.last_error = e
+            print(f"Error executing transaction: {e}")
+            self.connection.rollback()
+            return 0
+        finally:
+            cursor.close()
+
+    def execute_batch(self, query, params_list, batch_size=5000):
+        """executemany a large parameter list in batch_size chunks (one round-trip
+        each) inside a single transaction; returns the affected-row count"""
+        chunks = [params_list[i:i + batch_size] for i in range(0, len(params_list), batch_size)]
+        return self.execute_transaction([(query, chunk) for chunk in chunks])
+
+
+def get_pool(pool_size=8):
+    """Return the process-wide MySQL connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = DatabaseConnection()
+            _pool = pooling.MySQLConnectionPool(
+                pool_name="pf",
+                pool_size=pool_size,
+                pool_reset_session=False,  # Skip the reset round-trip when a connection is returned
+                host=config.host,
+                database=config.database,
+                user=config.user,
+                password=config.password
+            )
+    return _pool
+
+@contextmanager
+def get_conn():
+    """Borrow a pooled connection wrapped in a DatabaseConnection.
+
+    Usage:
+        with get_conn() as db:
+            rows = db.execute_query(query, params)
+    """
+    db = DatabaseConnection()
+    db.connection = get_pool().get_connection()
+    try:
+        yield db
+    finally:
+        db.release()
@@ -390,7 +390,7 @@ class StockAnalysisApp:
                 print("Failed to connect to database")
                 return
             
-            stocks = db.execute_query("SELECT symbol FROM stocks ORDER BY symbol")
+            stocks = db.execute_query("SELECT stock_id, symbol FROM stocks ORDER BY symbol")
             if not stocks:
                 print("No stocks found in database")
                 db.disconnect()
@@ -403,16 +403,16 @@ class StockAnalysisApp:
             from portfolio.stock_validator import StockValidator
             validator = StockValidator()
             
-            for i, (symbol,) in enumerate(stocks, 1):
+            # Fetch all stock info concurrently, then write each row
+            print("Fetching stock information concurrently...")
+            infos = validator.get_stock_infos([symbol for _, symbol in stocks])
+            
+            for i, (stock_id, symbol) in enumerate(stocks, 1):
                 print(f"[{i}/{len(stocks)}] Processing {symbol}...")
                 
                 try:
-                    # Rate limiting
-                    if i > 1:
-                        print(" Waiting 2 seconds (rate limiting)...")
-                        time.sleep(2)
-                    
-                    success = self._update_single_stock_metadata(symbol)
+                    stock_info = infos.get(symbol.upper())
+                    success = bool(stock_info) and self.data_collector._update_stock_metadata(stock_id, stock_info)
                     if success:
                         successful += 1
                         print(f" {symbol} updated")
@@ -1,29 +1,107 @@
-from database.db_connection import DatabaseConnection
+from database.db_connection import DatabaseConnection, get_pool
+from mysql.connector import Error, errorcode
 from portfolio.stock_validator import StockValidator
 import yfinance as yf
+import numpy as np
+import pandas as pd
+import sys
+import time
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
 
 class PortfolioManager:
+    # Hot-path statements executed as prepared statements (parsed once per connection)
+    insert_txn_stmt = """
+    INSERT INTO portfolio_transactions 
+    (portfolio_id, stock_id, txn_time, action, quantity, price, txn_value, fees, notes)
+    VALUES (%s, %s, NOW(), %s, %s, %s, %s, %s, %s)
+    """
+
+    upsert_holding_stmt = """
+    INSERT INTO portfolio_holdings (portfolio_id, stock_id, quantity, avg_cost, market_value)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        quantity = VALUES(quantity),
+        avg_cost = VALUES(avg_cost),
+        market_value = VALUES(market_value),
+        last_updated = NOW()
+    """
+
+    # Applies a signed quantity delta to a holding; the weighted average cost is
+    # recomputed in SQL (before quantity is updated) when the trade opens or adds
+    # to a position on the same side, so no prior SELECT is needed
+    apply_trade_stmt = """
+    INSERT INTO portfolio_holdings (portfolio_id, stock_id, quantity, avg_cost, market_value)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        avg_cost = IF(%s AND quantity * VALUES(quantity) >= 0,
+                      (ABS(quantity) * avg_cost + ABS(VALUES(quantity)) * %s)
+                          / (ABS(quantity) + ABS(VALUES(quantity))),
+                      avg_cost),
+        quantity = quantity + VALUES(quantity),
+        market_value = quantity * %s,
+        last_updated = NOW()
+    """
+
+    PRICE_BATCH_SIZE = 5000  # Rows per executemany round-trip when storing prices
+
+    holding_snapshot_stmt = """
+    SELECT quantity, avg_cost, market_value, unrealized_pnl
+    FROM portfolio_holdings
+    WHERE portfolio_id = %s AND stock_id = %s"""
+
     def __init__(self):
         self.db = DatabaseConnection()
         self.validator = StockValidator()
+        self.active_users_ttl = 30  # Seconds before the cached active-user list is refreshed
+        self._active_users_cache = None  # (fetched_at, rows)
+        self._portfolio_names = {}  # portfolio_id -> portfolio_name
+        self._stock_ids = {}  # symbol -> stock_id; ids never change once assigned
+        self._stock_ids_loaded = False  # True once the whole stocks table has been preloaded
+        self.portfolio_cache_ttl = 15  # Seconds before cached holdings/details are re-read
+        self._portfolio_cache = {}  # (kind, portfolio_id) -> (fetched_at, value)
+
+    def __enter__(self):
+        """Borrow one pooled connection for the whole session; every call reuses it.
+        If the pool can't be opened the connection is made lazily as before."""
+        if not self.db.connection:
+            try:
+                self.db.connection = get_pool().get_connection()
+            except Error as e:
+                print(f"Connection pool unavailable, connecting directly: {e}")
+        self._load_stock_ids()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        """Return the session's connection (to the pool when it came from one)"""
+        self.db.release()
 
     def create_portfolio(self, name, description="", user_id=None):
-        """Create a new portfolio for a specific user"""
+        """Create a new portfolio for a specific user; returns the new portfolio_id or False"""
         # Validate that user_id is provided
         if user_id is None:
             print("Error: User ID is required to create a portfolio")
             return False
         
-        # Check if user exists and is active
-        user_query = "SELECT user_id, username, is_active FROM users WHERE user_id = %s"
-        user_result = self.db.execute_query(user_query, (user_id,))
-        
-        if not user_result:
-            print(f"Error: User ID {user_id} does not exist")
-            return False
-        
-        user_id_db, username, is_active = user_result[0]
+        # Check if user exists and is active; a fresh active-user list answers
+        # this without another round-trip
+        username = self._get_cached_active_username(user_id)
+        if username is not None:
+            is_active = True
+        else:
+            user_query = "SELECT user_id, username, is_active FROM users WHERE user_id = %s"
+            user_result = self.db.execute_query(user_query, (user_id,))
+            
+            if not user_result:
+                print(f"Error: User ID {user_id} does not exist")
+                return False
+            
+            user_id_db, username, is_active = user_result[0]
         
         if not is_active:
             print(f"Error: User '{username}' (ID: {user_id}) is not active")
@@ -33,19 +111,60 @@ class PortfolioManager:
         
         # Create portfolio with user_id
         query = "INSERT INTO portfolios (user_id, portfolio_name, description) VALUES (%s, %s, %s)"
-        result = self.db.execute_update(query, (user_id, name, description))
+        portfolio_id = self.db.execute_insert(query, (user_id, name, description))
         
-        if result > 0:
+        if portfolio_id:
             print(f"Portfolio '{name}' created successfully for {username}!")
-            return True
+            return portfolio_id
         else:
             print("Failed to create portfolio!")
             return False
 
     def get_active_users(self):
-        """Get all active users from the database"""
+        """Get all active users from the database (cached for active_users_ttl seconds)"""
+        now = time.monotonic()
+        if self._active_users_cache is not None:
+            fetched_at, rows = self._active_users_cache
+            if now - fetched_at < self.active_users_ttl:
+                return rows
+        
         query = "SELECT user_id, username, email FROM users WHERE is_active = 1 ORDER BY username"
-        return self.db.execute_query(query)
+        rows = self.db.execute_query(query)
+        if rows is not None:
+            self._active_users_cache = (now, rows)
+        return rows
+    
+    def _get_cached_active_username(self, user_id):
+        """Return the username for user_id from an unexpired active-user cache, else None"""
+        if self._active_users_cache is None:
+            return None
+        fetched_at, rows = self._active_users_cache
+        if time.monotonic() - fetched_at >= self.active_users_ttl:
+            return None
+        for cached_id, username, email in rows:
+            if cached_id == user_id:
+                return username
+        return None
+    
+    def invalidate_active_users_cache(self):
+        """Drop the cached active-user list; call after creating or changing users"""
+        self._active_users_cache = None
+    
+    def _get_cached_portfolio(self, kind, portfolio_id):
+        """Return an unexpired cached get_portfolio_stocks/get_portfolio_with_details result, else None"""
+        entry = self._portfolio_cache.get((kind, portfolio_id))
+        if entry is None:
+            return None
+        fetched_at, value = entry
+        if time.monotonic() - fetched_at >= self.portfolio_cache_ttl:
+            del self._portfolio_cache[(kind, portfolio_id)]
+            return None
+        return value
+    
+    def invalidate_portfolio_cache(self, portfolio_id):
+        """Drop cached holdings/details for a portfolio; called after every change to its holdings"""
+        self._portfolio_cache.pop(('stocks', portfolio_id), None)
+        self._portfolio_cache.pop(('details', portfolio_id), None)
     
     def display_active_users(self):
         """Display all active users in a formatted way"""
@@ -66,54 +185,200 @@ class PortfolioManager:
 
     def execute_trade(self, portfolio_id, symbol, action, quantity, price, fees=0.0, notes=""):
         """Execute a trade transaction"""
+        return self._execute_trade(portfolio_id, symbol, action, quantity, price, fees, notes) is not None
+
+    def execute_trade_with_snapshot(self, portfolio_id, symbol, action, quantity, price, fees=0.0, notes=""):
+        """Execute a trade and return (before, after) holdings dicts read inside the
+        same transaction (either may be None if there is no position); None on failure"""
+        return self._execute_trade(portfolio_id, symbol, action, quantity, price, fees, notes, snapshot=True)
+
+    def _execute_trade(self, portfolio_id, symbol, action, quantity, price, fees, notes, snapshot=False):
+        """Record a trade and update holdings in one transaction; returns (before, after) or None"""
         # Get stock ID (assumes validation already done at UI level)
         stock_id = self._get_stock_id(symbol)
         if not stock_id:
             print(f"Error: '{symbol}' is not in the database. Add the stock to the database first before trading.")
-            return False
+            return None
 
         # Note: Stock validation should be done at the UI level before calling this method
         # This is a backup check in case method is called directly
 
-        # Validate action
-        valid_actions = ['BUY_TO_OPEN', 'BUY_TO_CLOSE', 'SELL_TO_CLOSE', 'SELL_TO_OPEN']
-        if action not in valid_actions:
-            print(f"Invalid action. Must be one of: {', '.join(valid_actions)}")
-            return False
+        values = self._validate_trade_values(action, quantity, price, fees)
+        if values is None:
+            return None
+        quantity, price, fees = values
 
-        # Validate quantity and price
         try:
-            quantity = float(quantity)
-            price = float(price)
-            fees = float(fees) if fees else 0.0
+            # The ledger entry and the holdings change commit together or not at all.
+            # The holdings upsert computes the new quantity/avg_cost from the locked
+            # row inside MySQL, so concurrent trades can't lose each other's update.
+            before = after = None
+            closes_position = action in ('SELL_TO_CLOSE', 'BUY_TO_CLOSE')
+            if snapshot or closes_position:
+                # Lock the row so the BEFORE snapshot is exactly what this trade applies to
+                # and no other session can trade the position until we commit
+                before = self._read_holding(portfolio_id, stock_id, symbol, for_update=True)
+            
+            if closes_position:
+                # Check availability under the lock: a close can't exceed the open position
+                held = before['quantity'] if before else 0.0
+                available = held if action == 'SELL_TO_CLOSE' else -held
+                if available < quantity:
+                    print(f"Error: Cannot close {quantity} shares of {symbol}, only {max(available, 0.0)} available")
+                    self.db.connection.rollback()
+                    return None
             
-            if quantity <= 0:
-                print("Quantity must be positive")
-                return False
-            if price <= 0:
-                print("Price must be positive")
-                return False
-        except (ValueError, TypeError):
-            print("Invalid quantity, price, or fees")
-            return False
-
-        try:
             # 1. Record the transaction
-            if not self._record_transaction(portfolio_id, stock_id, action, quantity, price, fees, notes):
-                return False
+            if not self._record_transaction(portfolio_id, stock_id, action, quantity, price, fees, notes, commit=False):
+                self.db.connection.rollback()
+                return None
             
             # 2. Update holdings based on the transaction
-            if not self._update_holdings_from_transaction(portfolio_id, stock_id, action, quantity, price):
-                return False
+            if not self._update_holdings_from_transaction(portfolio_id, stock_id, action, quantity, price, commit=False):
+                self.db.connection.rollback()
+                return None
+            
+            if snapshot:
+                after = self._read_holding(portfolio_id, stock_id, symbol)
+            
+            self.db.connection.commit()
+            self.invalidate_portfolio_cache(portfolio_id)
             
             print(f" {action}: {quantity} shares of {symbol} at ${price:.2f}/share")
             if fees > 0:
                 print(f"  Fees: ${fees:.2f}")
-            return True
+            return before, after
             
         except Exception as e:
             print(f"Error executing trade: {e}")
+            self.db.connection.rollback()
+            return None
+
+    def _read_holding(self, portfolio_id, stock_id, symbol, for_update=False):
+        """Read one holding as a dict on the manager's connection, or None if absent"""
+        query = self.holding_snapshot_stmt + (" FOR UPDATE" if for_update else "")
+        result = self.db.execute_query(query, (portfolio_id, stock_id), prepared=True)
+        if not result:
+            return None
+        quantity, avg_cost, market_value, unrealized_pnl = result[0]
+        return {
+            'symbol': symbol,
+            'quantity': float(quantity),
+            'avg_cost': float(avg_cost) if avg_cost else 0.0,
+            'market_value': float(market_value) if market_value else 0.0,
+            'unrealized_pnl': float(unrealized_pnl) if unrealized_pnl else 0.0
+        }
+
+    def execute_trades(self, trades):
+        """Execute a batch of trades in a single database transaction
+        
+        Each trade is a dict with keys: portfolio_id, symbol, action, quantity,
+        price and optionally fees and notes. All trades are validated first; if
+        any is invalid nothing is written.
+        """
+        if not trades:
+            print("No trades to execute")
+            return False
+        
+        # 1. Validate every row before touching the database
+        parsed = []
+        for i, trade in enumerate(trades, 1):
+            symbol = (trade.get('symbol') or '').strip().upper()
+            if not symbol:
+                print(f"Trade #{i}: stock symbol cannot be empty")
+                return False
+            values = self._validate_trade_values(trade.get('action'), trade.get('quantity'),
+                                                 trade.get('price'), trade.get('fees', 0.0))
+            if values is None:
+                print(f"Trade #{i} ({symbol}) rejected; no trades were executed")
+                return False
+            quantity, price, fees = values
+            try:
+                portfolio_id = int(trade['portfolio_id'])
+            except (KeyError, ValueError, TypeError):
+                print(f"Trade #{i} ({symbol}): invalid or missing portfolio ID")
+                return False
+            parsed.append((portfolio_id, symbol, trade['action'],
+                           quantity, price, fees, trade.get('notes', '')))
+        
+        # 2. Resolve all stock IDs with one IN query
+        symbols = sorted({t[1] for t in parsed})
+        placeholders = ', '.join(['%s'] * len(symbols))
+        stock_rows = self.db.execute_query(
+            f"SELECT UPPER(symbol), stock_id FROM stocks WHERE symbol IN ({placeholders})",
+            tuple(symbols)
+        ) or []
+        stock_ids = dict(stock_rows)
+        missing = [sym for sym in symbols if sym not in stock_ids]
+        if missing:
+            print(f"Error: {', '.join(missing)} not in the database. Add the stocks first before trading.")
+            return False
+        
+        # 3. Lock and load current positions for every (portfolio, stock) pair
+        # touched. FOR UPDATE opens the write transaction here: the row locks are
+        # held until execute_transaction commits the new totals below, so a
+        # concurrent trade on these holdings waits instead of being overwritten
+        pairs = sorted({(t[0], stock_ids[t[1]]) for t in parsed})
+        pair_placeholders = ', '.join(['(%s, %s)'] * len(pairs))
+        position_rows = self.db.execute_query(
+            f"""
+            SELECT portfolio_id, stock_id, quantity, avg_cost FROM portfolio_holdings
+            WHERE (portfolio_id, stock_id) IN ({pair_placeholders})
+            FOR UPDATE
+            """,
+            tuple(value for pair in pairs for value in pair)
+        )
+        if position_rows is None:
+            self.db.connection.rollback()
+            print("Could not read current positions; no trades were executed")
+            return False
+        positions = {
+            (row[0], row[1]): {'quantity': float(row[2]), 'avg_cost': float(row[3])}
+            for row in position_rows
+        }
+        
+        # 4. Net the trades per (portfolio, stock) in Python
+        txn_params = []
+        last_price = {}
+        for portfolio_id, symbol, action, quantity, price, fees, notes in parsed:
+            key = (portfolio_id, stock_ids[symbol])
+            position = positions.get(key, {'quantity': 0.0, 'avg_cost': 0.0})
+            if action in ('SELL_TO_CLOSE', 'BUY_TO_CLOSE'):
+                # Same rule as the single-trade path, checked against the locked
+                # position netted with the batch's earlier trades
+                held = position['quantity']
+                available = held if action == 'SELL_TO_CLOSE' else -held
+                if available < quantity:
+                    print(f"Error: Cannot close {quantity} shares of {symbol}, only {max(available, 0.0)} available")
+                    print("No trades were executed")
+                    self.db.connection.rollback()
+                    return False
+            new_quantity, new_avg_cost = self._apply_trade(position, action, quantity, price)
+            positions[key] = {'quantity': new_quantity, 'avg_cost': new_avg_cost}
+            last_price[key] = price
+            txn_params.append((portfolio_id, key[1], action, quantity, price,
+                               quantity * price, fees, notes))
+        
+        holding_params = [
+            (key[0], key[1], positions[key]['quantity'], positions[key]['avg_cost'],
+             positions[key]['quantity'] * last_price[key])
+            for key in last_price
+        ]
+        
+        # 5. One multi-row insert for the ledger and one upsert for holdings, atomically
+        result = self.db.execute_transaction([
+            (self.insert_txn_stmt, txn_params),
+            (self.upsert_holding_stmt, holding_params)
+        ])
+        if result <= 0:
+            print("Batch trade execution failed; no trades were recorded")
             return False
+        
+        for portfolio_id, _ in last_price:
+            self.invalidate_portfolio_cache(portfolio_id)
+        
+        print(f" Executed {len(txn_params)} trades across {len(holding_params)} holdings")
+        return True
 
     def close_position(self, portfolio_id, symbol):
         """Close entire position for a stock (requires current market price)"""
@@ -155,25 +420,24 @@ class PortfolioManager:
 
     def display_all_portfolios(self):
         """Display all portfolios"""
+        # One row per (portfolio, stock); rows arrive ordered so they can be grouped while streaming
         query = """
-        SELECT p.portfolio_id, p.portfolio_name, p.created_date, p.description,
-               GROUP_CONCAT(s.symbol) as stocks
+        SELECT p.portfolio_id, p.portfolio_name, p.created_date, p.description, s.symbol
         FROM portfolios p
         LEFT JOIN portfolio_holdings ps ON p.portfolio_id = ps.portfolio_id
         LEFT JOIN stocks s ON ps.stock_id = s.stock_id
-        GROUP BY p.portfolio_id, p.portfolio_name, p.created_date, p.description
+        ORDER BY p.portfolio_id, s.symbol
         """
         
-        results = self.db.execute_query(query)
-        
-        if not results:
-            print("No portfolios found")
-            return
-        
-        print("\n=== All Portfolios ===")
-        for row in results:
-            portfolio_id, name, created_date, description, stocks = row
-            stocks_list = stocks.split(',') if stocks else ['No stocks']
+        found = False
+        rows = self.db.stream_query(query)
+        for portfolio_id, portfolio_rows in groupby(rows, key=itemgetter(0)):
+            if not found:
+                print("\n=== All Portfolios ===")
+                found = True
+            portfolio_rows = list(portfolio_rows)
+            _, name, created_date, description, _ = portfolio_rows[0]
+            stocks_list = [row[4] for row in portfolio_rows if row[4]] or ['No stocks']
             print(f"""
 Portfolio ID: {portfolio_id}
 Name: {name}
@@ -181,9 +445,16 @@ Created Date: {created_date}
 Description: {description}
 Stocks: {', '.join(stocks_list)}
 """)
+        
+        if not found:
+            print("No portfolios found")
 
     def get_portfolio_stocks(self, portfolio_id):
-        """Get all stocks with positions in a specific portfolio"""
+        """Get all stocks with positions in a specific portfolio (cached for portfolio_cache_ttl seconds)"""
+        cached = self._get_cached_portfolio('stocks', portfolio_id)
+        if cached is not None:
+            return cached
+        
         query = """
         SELECT s.stock_id, s.symbol, s.company_name, h.quantity, h.avg_cost, h.unrealized_pnl
         FROM stocks s
@@ -191,94 +462,93 @@ Stocks: {', '.join(stocks_list)}
         WHERE h.portfolio_id = %s AND h.quantity != 0
         ORDER BY s.symbol
         """
-        return self.db.execute_query(query, (portfolio_id,))
+        rows = self.db.execute_query(query, (portfolio_id,))
+        if rows is not None:
+            self._portfolio_cache[('stocks', portfolio_id)] = (time.monotonic(), rows)
+        return rows
 
-    def _record_transaction(self, portfolio_id, stock_id, action, quantity, price, fees, notes):
+    def _record_transaction(self, portfolio_id, stock_id, action, quantity, price, fees, notes, commit=True):
         """Record a transaction in the transaction ledger"""
         try:
             # Calculate transaction value
             txn_value = float(quantity) * float(price)
             
-            query = """
-            INSERT INTO portfolio_transactions 
-            (portfolio_id, stock_id, txn_time, action, quantity, price, txn_value, fees, notes)
-            VALUES (%s, %s, NOW(), %s, %s, %s, %s, %s, %s)
-            """
-            
-            result = self.db.execute_update(query, (portfolio_id, stock_id, action, quantity, price, txn_value, fees, notes))
+            result = self.db.execute_prepared_update(
+                self.insert_txn_stmt,
+                (portfolio_id, stock_id, action, quantity, price, txn_value, fees, notes),
+                commit=commit
+            )
             return result > 0
             
         except Exception as e:
             print(f"Error recording transaction: {e}")
             return False
     
-    def _update_holdings_from_transaction(self, portfolio_id, stock_id, action, quantity, price):
+    def _update_holdings_from_transaction(self, portfolio_id, stock_id, action, quantity, price, commit=True):
         """Update holdings based on a transaction"""
         try:
-            # Get current position
-            current_position = self._get_current_position(portfolio_id, stock_id)
-            
-            # Calculate new position based on action
-            if action == 'BUY_TO_OPEN':
-                new_quantity = current_position['quantity'] + quantity
-                new_avg_cost = self._calculate_avg_cost(current_position, quantity, price, 'BUY')
-            elif action == 'SELL_TO_CLOSE':
-                new_quantity = current_position['quantity'] - quantity
-                new_avg_cost = current_position['avg_cost']  # Avg cost doesn't change on sale
-            elif action == 'SELL_TO_OPEN':  # Short selling
-                new_quantity = current_position['quantity'] - quantity
-                new_avg_cost = self._calculate_avg_cost(current_position, quantity, price, 'SELL')
-            elif action == 'BUY_TO_CLOSE':  # Covering short
-                new_quantity = current_position['quantity'] + quantity
-                new_avg_cost = current_position['avg_cost']  # Avg cost doesn't change when covering
-            
-            # Calculate market value (using latest trade price as approximation for current market price)
-            new_market_value = float(new_quantity) * float(price)
-            
-            # Upsert the holding
-            if current_position['exists']:
-                # Update existing holding
-                update_query = """
-                UPDATE portfolio_holdings 
-                SET quantity = %s, avg_cost = %s, market_value = %s, last_updated = NOW()
-                WHERE portfolio_id = %s AND stock_id = %s
-                """
-                result = self.db.execute_update(update_query, (new_quantity, new_avg_cost, new_market_value, portfolio_id, stock_id))
-            else:
-                # Create new holding
-                insert_query = """
-                INSERT INTO portfolio_holdings (portfolio_id, stock_id, quantity, avg_cost, market_value)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                result = self.db.execute_update(insert_query, (portfolio_id, stock_id, new_quantity, new_avg_cost, new_market_value))
+            # Buys add to the position, sells subtract from it
+            delta = quantity if action in ('BUY_TO_OPEN', 'BUY_TO_CLOSE') else -quantity
+            # Only opening trades change the cost basis
+            opens_position = action in ('BUY_TO_OPEN', 'SELL_TO_OPEN')
+            initial_avg_cost = price if opens_position else 0.0
+            
+            # Market value uses the latest trade price as approximation for current market price
+            result = self.db.execute_prepared_update(
+                self.apply_trade_stmt,
+                (portfolio_id, stock_id, delta, initial_avg_cost, delta * price,
+                 int(opens_position), price, price),
+                commit=commit
+            )
             
-            return result >= 0
+            # The upsert always inserts or changes a row, so 0 rows means nothing
+            # was written; -1 means the statement failed and was rolled back
+            return result > 0 and self.db.last_error is None
             
         except Exception as e:
             print(f"Error updating holdings: {e}")
             return False
     
-    def _get_current_position(self, portfolio_id, stock_id):
-        """Get current position for a stock in a portfolio"""
-        query = """
-        SELECT quantity, avg_cost FROM portfolio_holdings 
-        WHERE portfolio_id = %s AND stock_id = %s
-        """
-        result = self.db.execute_query(query, (portfolio_id, stock_id))
-        
-        if result:
-            return {
-                'exists': True,
-                'quantity': float(result[0][0]),
-                'avg_cost': float(result[0][1])
-            }
-        else:
-            return {
-                'exists': False, 
-                'quantity': 0.0,
-                'avg_cost': 0.0
-            }
-    
+    def _validate_trade_values(self, action, quantity, price, fees):
+        """Validate a trade's action and numbers; returns (quantity, price, fees) or None"""
+        valid_actions = ['BUY_TO_OPEN', 'BUY_TO_CLOSE', 'SELL_TO_CLOSE', 'SELL_TO_OPEN']
+        if action not in valid_actions:
+            print(f"Invalid action. Must be one of: {', '.join(valid_actions)}")
+            return None
+
+        try:
+            quantity = float(quantity)
+            price = float(price)
+            fees = float(fees) if fees else 0.0
+            
+            if quantity <= 0:
+                print("Quantity must be positive")
+                return None
+            if price <= 0:
+                print("Price must be positive")
+                return None
+        except (ValueError, TypeError):
+            print("Invalid quantity, price, or fees")
+            return None
+
+        return quantity, price, fees
+
+    def _apply_trade(self, current_position, action, quantity, price):
+        """Return the (quantity, avg_cost) of a position after applying a trade"""
+        if action == 'BUY_TO_OPEN':
+            new_quantity = current_position['quantity'] + quantity
+            new_avg_cost = self._calculate_avg_cost(current_position, quantity, price, 'BUY')
+        elif action == 'SELL_TO_CLOSE':
+            new_quantity = current_position['quantity'] - quantity
+            new_avg_cost = current_position['avg_cost']  # Avg cost doesn't change on sale
+        elif action == 'SELL_TO_OPEN':  # Short selling
+            new_quantity = current_position['quantity'] - quantity
+            new_avg_cost = self._calculate_avg_cost(current_position, quantity, price, 'SELL')
+        elif action == 'BUY_TO_CLOSE':  # Covering short
+            new_quantity = current_position['quantity'] + quantity
+            new_avg_cost = current_position['avg_cost']  # Avg cost doesn't change when covering
+        return new_quantity, new_avg_cost
+
     def _calculate_avg_cost(self, current_position, new_quantity, new_price, action_type):
         """Calculate new average cost basis"""
         current_qty = current_position['quantity']
@@ -304,6 +574,21 @@ Stocks: {', '.join(stocks_list)}
         
         return current_avg
     
+    def _load_stock_ids(self):
+        """Preload the whole symbol -> stock_id map with one query so later lookups
+        are dictionary hits instead of one SELECT per symbol"""
+        if self._stock_ids_loaded:
+            return
+        rows = self.db.execute_query("SELECT symbol, stock_id FROM stocks")
+        if rows is None:
+            return
+        self._stock_ids.update((symbol.upper(), stock_id) for symbol, stock_id in rows)
+        self._stock_ids_loaded = True
+
+    def get_stock_ids(self, symbols):
+        """Map each symbol to its stock_id (None when the stock isn't in the database)"""
+        return {symbol: self._get_stock_id(symbol) for symbol in symbols}
+
     def _get_stock_id(self, symbol):
         """Get stock ID if it exists in database (read-only, no creation)"""
         # Normalize symbol: strip whitespace and convert to uppercase
@@ -311,29 +596,31 @@ Stocks: {', '.join(stocks_list)}
         
         if not normalized_symbol:
             return None
-            
-        check_query = "SELECT stock_id FROM stocks WHERE UPPER(symbol) = %s"
-        result = self.db.execute_query(check_query, (normalized_symbol,))
-        return result[0][0] if result else None
-    
-    def get_position(self, portfolio_id, symbol):
-        """Get current position for a stock"""
-        # Get stock ID
-        stock_query = "SELECT stock_id FROM stocks WHERE symbol = %s"
-        stock_result = self.db.execute_query(stock_query, (symbol,))
         
-        if not stock_result:
-            return None
+        self._load_stock_ids()
+        stock_id = self._stock_ids.get(normalized_symbol)
+        if stock_id is not None:
+            return stock_id
         
-        stock_id = stock_result[0][0]
+        # symbol uses a case-insensitive collation, so a plain equality hits the unique index
+        check_query = "SELECT stock_id FROM stocks WHERE symbol = %s"
+        result = self.db.execute_query(check_query, (normalized_symbol,), prepared=True)
+        if not result:
+            # Misses aren't cached: the stock may be inserted later in the session
+            return None
         
-        # Get position
+        self._stock_ids[normalized_symbol] = result[0][0]
+        return result[0][0]
+    
+    def get_position(self, portfolio_id, symbol):
+        """Get current position for a stock"""
         position_query = """
-        SELECT quantity, avg_cost, unrealized_pnl, last_updated
-        FROM portfolio_holdings 
-        WHERE portfolio_id = %s AND stock_id = %s
+        SELECT h.quantity, h.avg_cost, h.unrealized_pnl, h.last_updated
+        FROM portfolio_holdings h
+        JOIN stocks s ON s.stock_id = h.stock_id
+        WHERE h.portfolio_id = %s AND s.symbol = %s
         """
-        result = self.db.execute_query(position_query, (portfolio_id, stock_id))
+        result = self.db.execute_query(position_query, (portfolio_id, symbol), prepared=True)
         
         if result:
             return {
@@ -345,8 +632,9 @@ Stocks: {', '.join(stocks_list)}
             }
         return None
     
-    def get_transaction_history(self, portfolio_id, symbol=None):
-        """Get transaction history for a portfolio or specific stock"""
+    def get_transaction_history(self, portfolio_id, symbol=None, limit=None):
+        """Get transaction history for a portfolio or specific stock, newest first.
+        With a limit only that many rows are returned by the server."""
         if symbol:
             # Get transactions for specific stock
             query = """
@@ -356,7 +644,7 @@ Stocks: {', '.join(stocks_list)}
             WHERE t.portfolio_id = %s AND s.symbol = %s
             ORDER BY t.txn_time DESC
             """
-            return self.db.execute_query(query, (portfolio_id, symbol))
+            params = (portfolio_id, symbol)
         else:
             # Get all transactions for portfolio
             query = """
@@ -366,7 +654,13 @@ Stocks: {', '.join(stocks_list)}
             WHERE t.portfolio_id = %s
             ORDER BY t.txn_time DESC
             """
-            return self.db.execute_query(query, (portfolio_id,))
+            params = (portfolio_id,)
+        
+        if limit is None:
+            return self.db.execute_query(query, params)
+        
+        # Push the limit into SQL so the server stops after `limit` rows
+        return self.db.execute_query(query + "LIMIT %s", params + (int(limit),))
     
     def _get_or_create_stock(self, symbol):
         """Get or create a stock record"""
@@ -398,6 +692,17 @@ Stocks: {', '.join(stocks_list)}
             print(f"Error getting stock information: {e}")
             return None
 
+    def _get_portfolio_name(self, portfolio_id):
+        """Get a portfolio's name (cached per manager; None if it does not exist)"""
+        if portfolio_id not in self._portfolio_names:
+            result = self.db.execute_query(
+                "SELECT portfolio_name FROM portfolios WHERE portfolio_id = %s", (portfolio_id,)
+            )
+            if not result:
+                return None
+            self._portfolio_names[portfolio_id] = result[0][0]
+        return self._portfolio_names[portfolio_id]
+
     def add_stock_to_portfolio(self, portfolio_id, symbol, quantity=0):
         """Add a stock to portfolio without trading (for portfolio composition management)"""
         # Validate stock exists in database
@@ -406,44 +711,41 @@ Stocks: {', '.join(stocks_list)}
             print(f"Error: '{symbol}' is not in the database. Add the stock to the database first.")
             return False
         
-        # Check if portfolio exists
-        portfolio_query = "SELECT portfolio_name FROM portfolios WHERE portfolio_id = %s"
-        portfolio_result = self.db.execute_query(portfolio_query, (portfolio_id,))
-        if not portfolio_result:
-            print(f"Error: Portfolio ID {portfolio_id} does not exist")
-            return False
-        
-        portfolio_name = portfolio_result[0][0]
-        
         try:
-            # Check if stock is already in portfolio
-            existing_query = """
-            SELECT quantity FROM portfolio_holdings 
-            WHERE portfolio_id = %s AND stock_id = %s
-            """
-            existing_result = self.db.execute_query(existing_query, (portfolio_id, stock_id))
-            
-            if existing_result:
-                print(f"Stock {symbol} is already in portfolio '{portfolio_name}'")
-                current_qty = existing_result[0][0]
-                if current_qty != 0:
-                    print(f"Current position: {current_qty} shares")
-                return True
-            
-            # Add stock to portfolio with zero position (for watchlist/composition tracking)
+            # Add stock to portfolio with zero position (for watchlist/composition tracking).
+            # The portfolio FK rejects unknown portfolios and an existing holding is left untouched,
+            # so no separate existence checks are needed.
             insert_query = """
             INSERT INTO portfolio_holdings (portfolio_id, stock_id, quantity, avg_cost, market_value)
             VALUES (%s, %s, %s, 0.0, 0.0)
+            ON DUPLICATE KEY UPDATE quantity = quantity
             """
             
             result = self.db.execute_update(insert_query, (portfolio_id, stock_id, quantity))
             
             if result > 0:
-                print(f" Added {symbol} to portfolio '{portfolio_name}'")
+                self.invalidate_portfolio_cache(portfolio_id)
+                print(f" Added {symbol} to portfolio '{self._get_portfolio_name(portfolio_id)}'")
                 return True
-            else:
-                print(f"Failed to add {symbol} to portfolio")
+            
+            error = self.db.last_error
+            if error is not None:
+                if getattr(error, 'errno', None) == errorcode.ER_NO_REFERENCED_ROW_2:
+                    print(f"Error: Portfolio ID {portfolio_id} does not exist")
+                else:
+                    print(f"Failed to add {symbol} to portfolio")
                 return False
+            
+            # No row inserted and no error: the stock is already in the portfolio
+            print(f"Stock {symbol} is already in portfolio '{self._get_portfolio_name(portfolio_id)}'")
+            existing_query = """
+            SELECT quantity FROM portfolio_holdings 
+            WHERE portfolio_id = %s AND stock_id = %s
+            """
+            existing_result = self.db.execute_query(existing_query, (portfolio_id, stock_id))
+            if existing_result and existing_result[0][0] != 0:
+                print(f"Current position: {existing_result[0][0]} shares")
+            return True
                 
         except Exception as e:
             print(f"Error adding stock to portfolio: {e}")
@@ -457,48 +759,41 @@ Stocks: {', '.join(stocks_list)}
             print(f"Error: Stock '{symbol}' not found")
             return False
         
-        # Check if portfolio exists
-        portfolio_query = "SELECT portfolio_name FROM portfolios WHERE portfolio_id = %s"
-        portfolio_result = self.db.execute_query(portfolio_query, (portfolio_id,))
-        if not portfolio_result:
-            print(f"Error: Portfolio ID {portfolio_id} does not exist")
-            return False
-        
-        portfolio_name = portfolio_result[0][0]
-        
         try:
-            # Check current position
-            position_query = """
-            SELECT quantity FROM portfolio_holdings 
-            WHERE portfolio_id = %s AND stock_id = %s
-            """
-            position_result = self.db.execute_query(position_query, (portfolio_id, stock_id))
-            
-            if not position_result:
-                print(f"Stock {symbol} is not in portfolio '{portfolio_name}'")
-                return False
-            
-            current_qty = float(position_result[0][0])
-            
-            if current_qty != 0:
-                print(f"Cannot remove {symbol}: Current position is {current_qty} shares")
-                print("Please close the position first using trading operations")
-                return False
-            
-            # Remove stock from portfolio
+            # Remove stock from portfolio; the quantity guard keeps open positions in place
             delete_query = """
             DELETE FROM portfolio_holdings 
-            WHERE portfolio_id = %s AND stock_id = %s
+            WHERE portfolio_id = %s AND stock_id = %s AND quantity = 0
             """
             
             result = self.db.execute_update(delete_query, (portfolio_id, stock_id))
             
             if result > 0:
-                print(f" Removed {symbol} from portfolio '{portfolio_name}'")
+                self.invalidate_portfolio_cache(portfolio_id)
+                print(f" Removed {symbol} from portfolio '{self._get_portfolio_name(portfolio_id)}'")
                 return True
-            else:
+            if self.db.last_error is not None:
                 print(f"Failed to remove {symbol} from portfolio")
                 return False
+            
+            # Nothing deleted: work out why with a single lookup
+            reason_query = """
+            SELECT p.portfolio_name, ph.quantity
+            FROM portfolios p
+            LEFT JOIN portfolio_holdings ph
+                ON ph.portfolio_id = p.portfolio_id AND ph.stock_id = %s
+            WHERE p.portfolio_id = %s
+            """
+            reason = self.db.execute_query(reason_query, (stock_id, portfolio_id))
+            
+            if not reason:
+                print(f"Error: Portfolio ID {portfolio_id} does not exist")
+            elif reason[0][1] is None:
+                print(f"Stock {symbol} is not in portfolio '{reason[0][0]}'")
+            else:
+                print(f"Cannot remove {symbol}: Current position is {float(reason[0][1])} shares")
+                print("Please close the position first using trading operations")
+            return False
                 
         except Exception as e:
             print(f"Error removing stock from portfolio: {e}")
@@ -507,22 +802,10 @@ Stocks: {', '.join(stocks_list)}
     def create_portfolio_with_stocks(self, name, stock_symbols, description="", user_id=None):
         """Create a new portfolio and add multiple stocks to it"""
         # Create the portfolio first
-        if not self.create_portfolio(name, description, user_id):
+        portfolio_id = self.create_portfolio(name, description, user_id)
+        if not portfolio_id:
             return False
         
-        # Get the newly created portfolio ID
-        portfolio_query = """
-        SELECT portfolio_id FROM portfolios 
-        WHERE portfolio_name = %s AND user_id = %s 
-        ORDER BY created_date DESC LIMIT 1
-        """
-        portfolio_result = self.db.execute_query(portfolio_query, (name, user_id))
-        
-        if not portfolio_result:
-            print("Error: Could not retrieve newly created portfolio")
-            return False
-        
-        portfolio_id = portfolio_result[0][0]
         print(f"Portfolio created with ID: {portfolio_id}")
         
         # Add stocks to the portfolio
@@ -531,18 +814,18 @@ Stocks: {', '.join(stocks_list)}
             success_count = 0
             failed_stocks = []
             
-            for symbol in stock_symbols:
-                symbol = symbol.strip().upper()
-                if symbol:  # Skip empty symbols
-                    # Validate stock before adding
-                    if self.validator.validate_stock(symbol):
-                        if self.add_stock_to_portfolio(portfolio_id, symbol):
-                            success_count += 1
-                        else:
-                            failed_stocks.append(symbol)
+            # Validate all symbols up front in batched quote requests
+            validation = self.validator.validate_stocks(stock_symbols)
+            
+            for symbol, is_valid in validation.items():
+                if is_valid:
+                    if self.add_stock_to_portfolio(portfolio_id, symbol):
+                        success_count += 1
                     else:
-                        print(f" Invalid stock symbol: {symbol}")
                         failed_stocks.append(symbol)
+                else:
+                    print(f" Invalid stock symbol: {symbol}")
+                    failed_stocks.append(symbol)
             
             print(f"\nStock addition summary:")
             print(f" Successfully added: {success_count} stocks")
@@ -552,11 +835,19 @@ Stocks: {', '.join(stocks_list)}
         return True
 
     def get_portfolio_with_details(self, portfolio_id):
-        """Get detailed portfolio information including stocks and performance"""
+        """Get detailed portfolio information including stocks and performance
+        (cached for portfolio_cache_ttl seconds)"""
+        cached = self._get_cached_portfolio('details', portfolio_id)
+        if cached is not None:
+            return cached
+        
         try:
             # Get portfolio basic info
             portfolio_query = """
-            SELECT p.portfolio_id, p.portfolio_name, p.created_date, p.description, u.username
+            SELECT p.portfolio_id, p.portfolio_name, p.created_date, p.description, u.username,
+                   (SELECT COALESCE(SUM(ph.market_value), 0)
+                    FROM portfolio_holdings ph
+                    WHERE ph.portfolio_id = p.portfolio_id) AS total_market_value
             FROM portfolios p
             LEFT JOIN users u ON p.user_id = u.user_id
             WHERE p.portfolio_id = %s
@@ -571,7 +862,8 @@ Stocks: {', '.join(stocks_list)}
                 'name': portfolio_result[0][1],
                 'created_date': portfolio_result[0][2],
                 'description': portfolio_result[0][3],
-                'username': portfolio_result[0][4]
+                'username': portfolio_result[0][4],
+                'total_market_value': float(portfolio_result[0][5] or 0.0)
             }
             
             # Get stocks in portfolio
@@ -585,9 +877,8 @@ Stocks: {', '.join(stocks_list)}
             stocks_result = self.db.execute_query(stocks_query, (portfolio_id,))
             
             portfolio_info['stocks'] = []
-            total_market_value = 0.0
             
-            for stock in stocks_result:
+            for stock in stocks_result or []:
                 stock_info = {
                     'symbol': stock[0],
                     'company_name': stock[1],
@@ -597,10 +888,8 @@ Stocks: {', '.join(stocks_list)}
                     'unrealized_pnl': float(stock[5]) if stock[5] else 0.0
                 }
                 portfolio_info['stocks'].append(stock_info)
-                total_market_value += stock_info['market_value']
-            
-            portfolio_info['total_market_value'] = total_market_value
             
+            self._portfolio_cache[('details', portfolio_id)] = (time.monotonic(), portfolio_info)
             return portfolio_info
             
         except Exception as e:
@@ -632,18 +921,21 @@ Stocks: {', '.join(stocks_list)}
         for row in results:
             portfolio_id, name, created_date, description, username, stock_count = row
             
-            print(f"\nPortfolio ID: {portfolio_id}")
-            print(f"Name: {name}")
-            print(f"Owner: {username if username else 'Unknown'}")
-            print(f"Created: {created_date}")
-            print(f"Description: {description if description else 'No description'}")
-            print(f"Number of stocks: {stock_count}")
+            # Build the whole block first and emit it with a single write
+            lines = [
+                f"\nPortfolio ID: {portfolio_id}",
+                f"Name: {name}",
+                f"Owner: {username if username else 'Unknown'}",
+                f"Created: {created_date}",
+                f"Description: {description if description else 'No description'}",
+                f"Number of stocks: {stock_count}"
+            ]
             
             # Get stock details for this portfolio
             if stock_count > 0:
                 stock_details = self.get_portfolio_stocks(portfolio_id)
                 if stock_details:
-                    print("Stocks:")
+                    lines.append("Stocks:")
                     total_value = 0.0
                     for stock in stock_details:
                         symbol, company_name, quantity, avg_cost, unrealized_pnl = stock[1], stock[2], stock[3], stock[4], stock[5]
@@ -651,19 +943,18 @@ Stocks: {', '.join(stocks_list)}
                         total_value += market_value
                         
                         if quantity != 0:
-                            print(f"  • {symbol} ({company_name}): {quantity} shares @ ${avg_cost:.2f}")
+                            lines.append(f"  • {symbol} ({company_name}): {quantity} shares @ ${avg_cost:.2f}")
                         else:
-                            print(f"  • {symbol} ({company_name}): Watchlist")
+                            lines.append(f"  • {symbol} ({company_name}): Watchlist")
                     
                     if total_value > 0:
-                        print(f"Total Portfolio Value: ${total_value:,.2f}")
+                        lines.append(f"Total Portfolio Value: ${total_value:,.2f}")
             
-            print("-" * 40)
+            lines.append("-" * 40)
+            sys.stdout.write("\n".join(lines) + "\n")
 
     def fetch_portfolio_price_data(self, portfolio_id, start_date=None, end_date=None, period='1mo'):
         """Fetch price data for all stocks in a specific portfolio for a date range"""
-        from data.data_collector import DataCollector
-        
         # Get all stocks in the portfolio  
         stocks_query = """
         SELECT s.symbol FROM stocks s
@@ -678,32 +969,100 @@ Stocks: {', '.join(stocks_list)}
             return False
         
         symbols = [stock[0] for stock in stocks]
+        return self.fetch_portfolio_price_data_bulk(symbols, start_date, end_date, period)
+
+    def fetch_portfolio_price_data_bulk(self, symbols, start_date=None, end_date=None, period='1mo'):
+        """Fetch daily prices for all symbols with one threaded yf.download call
+        and store them with chunked executemany batches in a single transaction"""
         print(f"Fetching price data for {len(symbols)} stocks in portfolio...")
         print(f"Stocks: {', '.join(symbols)}")
         
-        # Initialize data collector
-        dc = DataCollector()
-        success_count = 0
+        stock_ids = self.get_stock_ids(symbols)
+        
+        try:
+            if start_date and end_date:
+                # Use date range
+                data = yf.download(symbols, start=start_date, end=end_date, interval='1d',
+                                   group_by='ticker', threads=True, progress=False)
+            else:
+                # Use period
+                data = yf.download(symbols, period=period, interval='1d',
+                                   group_by='ticker', threads=True, progress=False)
+        except Exception as e:
+            print(f" Error downloading price data: {e}")
+            return False
+        
+        if data is None or data.empty:
+            print(" No price data returned")
+            return False
         
+        rows = []
+        success_count = 0
         for symbol in symbols:
-            print(f"Fetching data for {symbol}...")
+            stock_id = stock_ids[symbol]
+            if not stock_id:
+                print(f" {symbol} not found in database")
+                continue
             
-            try:
-                if start_date and end_date:
-                    # Use date range
-                    success = dc.fetch_stock_data(symbol, interval='1d', start=start_date, end=end_date)
-                else:
-                    # Use period
-                    success = dc.fetch_stock_data(symbol, period=period, interval='1d')
-                
-                if success:
-                    success_count += 1
-                    print(f" {symbol} data updated")
-                else:
+            # Columns are (ticker, field) pairs; a ticker with no data is absent or all-NaN
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
                     print(f" {symbol} data update failed")
-                    
-            except Exception as e:
-                print(f" Error fetching {symbol}: {e}")
+                    continue
+                hist = data[symbol]
+            else:
+                hist = data
+            hist = hist.dropna(subset=['Close'])
+            if hist.empty:
+                print(f" {symbol} data update failed")
+                continue
+            
+            # Close has no NaN after the dropna, so the returns are one diff/divide
+            # over the raw array (no shifted copy or fill pass); the first day has none
+            close = hist['Close'].to_numpy(dtype=np.float64)
+            daily_returns = np.full(len(close), np.nan)
+            np.divide(np.diff(close), close[:-1], out=daily_returns[1:])
+            for date, open_, high, low, close, volume, daily_return in zip(
+                    hist.index, hist['Open'], hist['High'], hist['Low'], hist['Close'],
+                    hist['Volume'], daily_returns):
+                rows.append((
+                    stock_id,
+                    date.strftime('%Y-%m-%d'),
+                    float(open_) if pd.notna(open_) else None,
+                    float(high) if pd.notna(high) else None,
+                    float(low) if pd.notna(low) else None,
+                    float(close),
+                    float(close),  # Using Close as adj_close for simplicity
+                    int(volume) if pd.notna(volume) else 0,
+                    float(daily_return) if pd.notna(daily_return) else None
+                ))
+            success_count += 1
+            print(f" {symbol} data updated")
+        
+        if not rows:
+            print(f"\nCompleted: 0/{len(symbols)} stocks updated successfully")
+            return False
+        
+        insert_query = """
+        INSERT INTO stock_historical_data 
+        (stock_id, date, open_price, high_price, low_price, close_price, 
+         adj_close_price, volume, daily_return)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            open_price = VALUES(open_price),
+            high_price = VALUES(high_price),
+            low_price = VALUES(low_price),
+            close_price = VALUES(close_price),
+            adj_close_price = VALUES(adj_close_price),
+            volume = VALUES(volume),
+            daily_return = VALUES(daily_return)
+        """
+        # Rows already up to date count as 0 affected, so check for an error instead
+        self.db.execute_batch(insert_query, rows, self.PRICE_BATCH_SIZE)
+        if self.db.last_error is not None:
+            print(" Failed to store price data")
+            return False
         
+        print(f"Stored {len(rows)} price records")
         print(f"\nCompleted: {success_count}/{len(symbols)} stocks updated successfully")
         return success_count > 0
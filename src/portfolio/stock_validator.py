@@ -1,30 +1,134 @@
 import yfinance as yf
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import os
+import shelve
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+class TokenBucket:
+    """Thread-safe token bucket: allows bursts of up to max_rate requests,
+    refilled continuously at max_rate tokens per time_period seconds"""
+
+    def __init__(self, max_rate, time_period=1.0):
+        self.max_rate = max_rate
+        self.refill_rate = max_rate / time_period
+        self.tokens = max_rate
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.max_rate, self.tokens + (now - self.updated_at) * self.refill_rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.refill_rate
+            time.sleep(wait_time)
 
 class StockValidator:
+    VALIDATE_BATCH_SIZE = 20  # Symbols per multi-ticker Yahoo download
+    MAX_CONCURRENT_REQUESTS = 10
+    INFO_CACHE_TTL = 600  # Seconds a fetched info dict is reused
+    INFO_CACHE_SIZE = 1024
+    VALIDATE_CACHE_TTL = 3600  # Seconds a symbol stays known-valid
+    VALIDATE_CACHE_SIZE = 4096
+    DISK_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "stock_validator", "stock_info")
+    DISK_CACHE_TTL = 86400  # Stock metadata changes slowly; reuse it across runs for a day
+
     def __init__(self):
-        self.last_request_time = 0
-        self.min_request_interval = 1.0  # Minimum 1 second between requests
+        self.limiter = TokenBucket(max_rate=2.9, time_period=1)  # Stay just under Yahoo's burst budget
+        self.session = self._create_session()
+        self._info_cache = {}  # symbol -> (expires_at, info)
+        self._validate_cache = {}  # symbol -> expires_at, valid symbols only
+        self._cache_lock = threading.RLock()
+
+    def _create_session(self):
+        """Create a pooled HTTP session that retries throttled and failed requests"""
+        session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # Browser-like headers; Yahoo answers bare clients with 429s far sooner
+        session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                          "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+            "Accept": "application/json,text/plain,*/*",
+            "Accept-Language": "en-US,en;q=0.9"
+        })
+        return session
+
+    def warm_up(self):
+        """Open a pooled connection to Yahoo (DNS + TLS) ahead of the first real request"""
+        try:
+            self.session.head("https://query1.finance.yahoo.com/", timeout=5)
+        except requests.RequestException:
+            pass  # Best effort; the first real request will connect instead
+
+    def _cache_get(self, cache, key):
+        """Return the unexpired cached value for key, or None"""
+        with self._cache_lock:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del cache[key]
+                return None
+            return value
+
+    def _cache_put(self, cache, key, value, ttl, maxsize):
+        """Store value for ttl seconds, evicting the oldest entry when full"""
+        with self._cache_lock:
+            cache.pop(key, None)
+            if len(cache) >= maxsize:
+                del cache[next(iter(cache))]
+            cache[key] = (time.monotonic() + ttl, value)
+
+    def _mark_valid(self, symbol):
+        """Remember that symbol validated successfully"""
+        self._cache_put(self._validate_cache, symbol, True, self.VALIDATE_CACHE_TTL, self.VALIDATE_CACHE_SIZE)
 
     def validate_stock(self, symbol, max_retries: int = 3):
+        """Validate if stock symbol is valid, reusing recent positive results"""
+        if self._cache_get(self._validate_cache, symbol):
+            return True
+        
+        is_valid = self._validate_stock_uncached(symbol, max_retries)
+        if is_valid:
+            self._mark_valid(symbol)
+        return is_valid
+
+    def _validate_stock_uncached(self, symbol, max_retries):
         """Validate if stock symbol is valid with rate limiting"""
         for attempt in range(max_retries):
             try:
-                self._rate_limit()
+                self.limiter.acquire()
                 
                 ticker = yf.Ticker(symbol)
-                # Try to get basic info to verify stock exists
-                info = ticker.info
+                # fast_info only loads price metadata, not the full info payload
+                try:
+                    last_price = ticker.fast_info.last_price
+                except (KeyError, TypeError, ValueError):
+                    # Unknown symbols have no price metadata
+                    last_price = None
                 
-                # Check if we have valid data
-                if 'regularMarketPrice' in info or 'currentPrice' in info:
-                    return True
-                elif info.get('longName') or info.get('shortName'):
-                    return True
-                else:
-                    # Try to get historical data as final verification
-                    hist = ticker.history(period="1d")
-                    return not hist.empty
+                return last_price is not None
                     
             except Exception as e:
                 if "429" in str(e) or "Too Many Requests" in str(e):
@@ -44,59 +148,106 @@ class StockValidator:
         print(f"Failed to validate {symbol} after {max_retries} attempts")
         return False
 
-    def _rate_limit(self):
-        """Ensure we don't exceed rate limits"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
+    def validate_stocks(self, symbols):
+        """Validate a list of stock symbols with one yfinance download per 20 symbols
+
+        Returns a dict mapping each symbol to True/False. A symbol is valid if
+        Yahoo returns any recent close for it. If a batch download fails or
+        returns nothing at all, that chunk falls back to validate_stock run on
+        a thread pool.
+        """
+        results = {}
+        symbols = [symbol.strip().upper() for symbol in symbols if symbol and symbol.strip()]
+        
+        pending = []
+        for symbol in symbols:
+            if self._cache_get(self._validate_cache, symbol):
+                results[symbol] = True
+            else:
+                pending.append(symbol)
         
-        if time_since_last_request < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last_request
-            print(f"Rate limiting: waiting {sleep_time:.2f} seconds...")
-            time.sleep(sleep_time)
+        for start in range(0, len(pending), self.VALIDATE_BATCH_SIZE):
+            chunk = pending[start:start + self.VALIDATE_BATCH_SIZE]
+            try:
+                # yfinance takes care of Yahoo's cookie and crumb, which the bare
+                # quote endpoint rejects requests without
+                self.limiter.acquire()
+                data = yf.download(" ".join(chunk), period="5d", group_by='column',
+                                   threads=True, progress=False)
+                if data is None or data.empty:
+                    # A network failure and a chunk of unknown symbols look the same
+                    raise ValueError("no price data returned")
+                # Close columns are one per ticker; unknown tickers are all-NaN or absent
+                closes = data['Close']
+                if isinstance(closes, pd.Series):
+                    closes = closes.to_frame(chunk[0])
+                found = {str(symbol).upper() for symbol in closes.columns[closes.notna().any().to_numpy()]}
+                for symbol in chunk:
+                    results[symbol] = symbol in found
+                    if results[symbol]:
+                        self._mark_valid(symbol)
+            except Exception as e:
+                print(f"Batch validation failed for {', '.join(chunk)}: {e}")
+                print("Falling back to per-symbol validation...")
+                # Validate the chunk in parallel; the shared token bucket keeps the request rate in check
+                with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS) as executor:
+                    results.update(zip(chunk, executor.map(self.validate_stock, chunk)))
         
-        self.last_request_time = time.time()
+        # Preserve the caller's symbol order
+        return {symbol: results[symbol] for symbol in symbols}
 
     def get_stock_info(self, symbol, max_retries: int = 3):
+        """Get detailed stock information, reusing results from the memory or disk cache"""
+        cached = self._lookup_info(symbol)
+        if cached is not None:
+            return cached
+        
+        info = self._fetch_stock_info(symbol, max_retries)
+        if info is not None:
+            self._remember_info(symbol, info)
+        return info
+
+    def _lookup_info(self, symbol):
+        """Return cached info from memory, falling back to the on-disk cache"""
+        info = self._cache_get(self._info_cache, symbol)
+        if info is not None:
+            return info
+        
+        try:
+            with self._cache_lock, shelve.open(self.DISK_CACHE_PATH, flag='r') as disk:
+                entry = disk.get(symbol)
+        except Exception:
+            # Missing or unreadable cache file; treat as a miss
+            return None
+        
+        if entry and time.time() - entry['t'] < self.DISK_CACHE_TTL:
+            self._cache_put(self._info_cache, symbol, entry['v'], self.INFO_CACHE_TTL, self.INFO_CACHE_SIZE)
+            return entry['v']
+        return None
+
+    def _remember_info(self, symbol, info):
+        """Cache a fetched info dict in memory and on disk; a symbol with info is also known-valid"""
+        self._cache_put(self._info_cache, symbol, info, self.INFO_CACHE_TTL, self.INFO_CACHE_SIZE)
+        self._mark_valid(symbol)
+        
+        try:
+            os.makedirs(os.path.dirname(self.DISK_CACHE_PATH), exist_ok=True)
+            with self._cache_lock, shelve.open(self.DISK_CACHE_PATH) as disk:
+                disk[symbol] = {'t': time.time(), 'v': info}
+        except Exception as e:
+            print(f"Could not write stock info cache for {symbol}: {e}")
+
+    def _fetch_stock_info(self, symbol, max_retries):
         """Get detailed stock information with rate limiting"""
         for attempt in range(max_retries):
             try:
-                self._rate_limit()
+                self.limiter.acquire()
                 
                 ticker = yf.Ticker(symbol)
                 info = ticker.info
                 
                 # Return all metadata fields that match the database schema
-                return {
-                    'symbol': symbol,
-                    'name': info.get('longName', 'N/A'),
-                    'sector': info.get('sector', 'N/A'),
-                    'market_cap': info.get('marketCap'),
-                    'current_price': info.get('currentPrice') or info.get('regularMarketPrice'),
-                    'previous_close': info.get('previousClose'),
-                    'volume': info.get('volume') or info.get('regularMarketVolume'),
-                    'average_volume': info.get('averageVolume'),
-                    'pe_ratio': info.get('trailingPE'),
-                    'forward_pe': info.get('forwardPE'),
-                    'dividend_yield': info.get('dividendYield'),
-                    'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
-                    'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
-                    'beta': info.get('beta'),
-                    'eps': info.get('epsTrailingTwelveMonths') or info.get('trailingEps'),
-                    'book_value': info.get('bookValue'),
-                    'price_to_book': info.get('priceToBook'),
-                    'price_to_sales': info.get('priceToSalesTrailing12Months'),
-                    'profit_margins': info.get('profitMargins'),
-                    'return_on_equity': info.get('returnOnEquity'),
-                    'return_on_assets': info.get('returnOnAssets'),
-                    'debt_to_equity': info.get('debtToEquity'),
-                    'revenue_growth': info.get('revenueGrowth'),
-                    'earnings_growth': info.get('earningsGrowth'),
-                    'recommendation_mean': info.get('recommendationMean'),
-                    'target_high_price': info.get('targetHighPrice'),
-                    'target_low_price': info.get('targetLowPrice'),
-                    'target_mean_price': info.get('targetMeanPrice'),
-                    'analyst_count': info.get('numberOfAnalystOpinions')
-                }
+                return self._build_stock_info(symbol, info)
                 
             except Exception as e:
                 if "429" in str(e) or "Too Many Requests" in str(e):
@@ -114,4 +265,83 @@ class StockValidator:
                         return None
         
         print(f"Failed to get info for {symbol} after {max_retries} attempts")
-        return None
\ No newline at end of file
+        return None
+
+    def get_stock_infos(self, symbols, max_concurrent=None):
+        """Get stock information for many symbols concurrently
+
+        Args:
+            symbols: List of stock symbols
+            max_concurrent: Maximum number of in-flight requests
+
+        Returns:
+            Dict mapping each symbol to its info dict, or None if the fetch failed
+        """
+        symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol and symbol.strip()))
+        if not symbols:
+            return {}
+        
+        results = {symbol: self._lookup_info(symbol) for symbol in symbols}
+        missing = [symbol for symbol, info in results.items() if info is None]
+        if missing:
+            fetched = asyncio.run(self._gather_stock_infos(missing, max_concurrent or self.MAX_CONCURRENT_REQUESTS))
+            for symbol, info in fetched.items():
+                if info is not None:
+                    self._remember_info(symbol, info)
+                results[symbol] = info
+        return results
+
+    async def _gather_stock_infos(self, symbols, max_concurrent):
+        """Fetch info for all symbols, bounded by a semaphore"""
+        semaphore = asyncio.Semaphore(max_concurrent)
+        infos = await asyncio.gather(*[self._fetch_info(semaphore, symbol) for symbol in symbols])
+        return dict(zip(symbols, infos))
+
+    async def _fetch_info(self, semaphore, symbol):
+        """Fetch one symbol's info in a worker thread while holding the semaphore"""
+        async with semaphore:
+            try:
+                info = await asyncio.to_thread(self._fetch_raw_info, symbol)
+                return self._build_stock_info(symbol, info)
+            except Exception as e:
+                print(f"Error getting stock info for '{symbol}': {e}")
+                return None
+
+    def _fetch_raw_info(self, symbol):
+        """Fetch the raw info dict once a rate-limit token is available"""
+        self.limiter.acquire()
+        return yf.Ticker(symbol).info
+
+    def _build_stock_info(self, symbol, info):
+        """Map a Yahoo Finance info dict onto the fields used by the database schema"""
+        return {
+            'symbol': symbol,
+            'name': info.get('longName', 'N/A'),
+            'sector': info.get('sector', 'N/A'),
+            'market_cap': info.get('marketCap'),
+            'current_price': info.get('currentPrice') or info.get('regularMarketPrice'),
+            'previous_close': info.get('previousClose'),
+            'volume': info.get('volume') or info.get('regularMarketVolume'),
+            'average_volume': info.get('averageVolume'),
+            'pe_ratio': info.get('trailingPE'),
+            'forward_pe': info.get('forwardPE'),
+            'dividend_yield': info.get('dividendYield'),
+            'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
+            'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
+            'beta': info.get('beta'),
+            'eps': info.get('epsTrailingTwelveMonths') or info.get('trailingEps'),
+            'book_value': info.get('bookValue'),
+            'price_to_book': info.get('priceToBook'),
+            'price_to_sales': info.get('priceToSalesTrailing12Months'),
+            'profit_margins': info.get('profitMargins'),
+            'return_on_equity': info.get('returnOnEquity'),
+            'return_on_assets': info.get('returnOnAssets'),
+            'debt_to_equity': info.get('debtToEquity'),
+            'revenue_growth': info.get('revenueGrowth'),
+            'earnings_growth': info.get('earningsGrowth'),
+            'recommendation_mean': info.get('recommendationMean'),
+            'target_high_price': info.get('targetHighPrice'),
+            'target_low_price': info.get('targetLowPrice'),
+            'target_mean_price': info.get('targetMeanPrice'),
+            'analyst_count': info.get('numberOfAnalystOpinions')
+        }
@@ -6,13 +6,13 @@ Requirement: User should have option to create a portfolio and define a list of
 
 import sys
 import os
+import threading
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from portfolio.portfolio_manager import PortfolioManager
-from database.db_connection import DatabaseConnection
 
-def create_new_user():
-    """Create a new user"""
+def create_new_user(db):
+    """Create a new user on the caller's database connection"""
     print("\n" + "="*40)
     print("CREATE NEW USER")
     print("="*40)
@@ -24,51 +24,29 @@ def create_new_user():
     
     email = input("Enter email (optional): ").strip()
     
-    db = DatabaseConnection()
-    if db.connect():
-        try:
-            # Check if username already exists
-            check_query = "SELECT user_id FROM users WHERE username = %s"
-            existing = db.execute_query(check_query, (username,))
-            
-            if existing:
-                print(f"  Username '{username}' already exists")
-                db.disconnect()
-                return None
-            
-            # Create new user
-            insert_query = """
-            INSERT INTO users (username, email) 
-            VALUES (%s, %s)
-            """
-            result = db.execute_update(insert_query, (username, email))
-            
-            if result > 0:
-                # Get the new user ID
-                user_id_result = db.execute_query("SELECT LAST_INSERT_ID()")
-                if user_id_result:
-                    user_id = user_id_result[0][0]
-                    print(f"  User '{username}' created successfully with ID: {user_id}")
-                    # Ensure the transaction is committed
-                    if hasattr(db.connection, 'commit'):
-                        db.connection.commit()
-                    db.disconnect()
-                    return user_id
-                else:
-                    print("  Failed to get new user ID")
-                    db.disconnect()
-                    return None
-            else:
-                print("  Failed to insert new user")
-                db.disconnect()
-                return None
-                
-        except Exception as e:
-            print(f"  Error creating user: {e}")
-            db.disconnect()
+    try:
+        # Insert, or hand back the existing row's id if the username is taken;
+        # the UNIQUE index on username makes this atomic
+        insert_query = """
+        INSERT INTO users (username, email) 
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE user_id = LAST_INSERT_ID(user_id)
+        """
+        user_id = db.execute_insert(insert_query, (username, email))
+        
+        if not user_id:
+            print("  Failed to insert new user")
             return None
-    else:
-        print("  Could not connect to database")
+        
+        if db.last_rowcount == 0:
+            print(f"  Username '{username}' already exists")
+            return None
+        
+        print(f"  User '{username}' created successfully with ID: {user_id}")
+        return user_id
+            
+    except Exception as e:
+        print(f"  Error creating user: {e}")
         return None
 
 def main():
@@ -78,6 +56,10 @@ def main():
     
     pm = PortfolioManager()
     
+    # Resolve DNS and finish the TLS handshake to Yahoo while the user is
+    # typing, so stock validation in step 3 starts on a warm connection
+    threading.Thread(target=pm.validator.warm_up, daemon=True).start()
+    
     # Display available users
     print("\nStep 1: Select or Create User")
     users = pm.display_active_users()
@@ -90,17 +72,14 @@ def main():
     
     try:
         if user_choice == 'new':
-            user_id = create_new_user()
+            # Created on the PortfolioManager's own connection, so the new
+            # user is visible to it without reconnecting
+            user_id = create_new_user(pm.db)
             if user_id is None:
                 print("  Failed to create new user")
                 return False
             
-            # Refresh the PortfolioManager's database connection to see the new user
-            print("Refreshing database connection...")
-            pm.db.disconnect()
-            if not pm.db.connect():
-                print("  Failed to reconnect to database")
-                return False
+            pm.invalidate_active_users_cache()
         else:
             user_id = int(user_choice)
             
@@ -133,7 +112,12 @@ def main():
             print(" No stocks specified")
             return False
         
-        stock_symbols = [symbol.strip().upper() for symbol in stocks_input.split(',')]
+        # Normalize and drop duplicates/blanks while keeping the order entered
+        stock_symbols = list(dict.fromkeys(s.strip().upper() for s in stocks_input.split(',') if s.strip()))
+        
+        if not stock_symbols:
+            print(" No stocks specified")
+            return False
         
         print(f"\nCreating portfolio '{portfolio_name}' with stocks: {', '.join(stock_symbols)}")
         print("Validating stocks and creating portfolio...")
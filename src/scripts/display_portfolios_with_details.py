@@ -6,12 +6,67 @@ Requirement: Display all portfolios with creation date and list of stocks in the
 
 import sys
 import os
+import io
+from collections import defaultdict
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from portfolio.portfolio_manager import PortfolioManager
-from database.db_connection import DatabaseConnection
 
-def display_comprehensive_portfolio_info(pm):
+# Active-positions table layout, built once at import time
+ACTIVE_ROW_FMT = "      {:<8} | {:<20} | {:<8.2f} | ${:<9.2f} | ${:<9.2f}"
+ACTIVE_HEADER = (
+    f"      {'Symbol':<8} | {'Company':<20} | {'Shares':<8} | {'Avg Cost':<10} | {'Value':<10}\n"
+    + "      " + "-" * 65 + "\n"
+)
+format_active_row = ACTIVE_ROW_FMT.format
+
+def format_portfolio_block(index, portfolio, holdings):
+    """Render one portfolio and its (active, watchlist) holdings as a single string"""
+    (portfolio_id, name, created_date, description, username, user_id, 
+     stock_count, total_market_value) = portfolio
+    
+    buf = io.StringIO()
+    buf.write(f"  PORTFOLIO #{index}\n")
+    buf.write("━" * 60 + "\n")
+    buf.write(f" Portfolio ID: {portfolio_id}\n")
+    buf.write(f" Name: {name}\n")
+    buf.write(f" Owner: {username} (ID: {user_id})\n")
+    buf.write(f" Creation Date: {created_date}\n")  # KEY REQUIREMENT
+    buf.write(f" Description: {description if description else 'No description provided'}\n")
+    buf.write(f" Total Market Value: ${(total_market_value or 0):.2f}\n")
+    
+    buf.write(f" Stocks in Portfolio: {stock_count} total\n")
+    
+    if holdings:
+        active_positions, watchlist_items = holdings
+        
+        if active_positions:
+            buf.write(f"    Active Positions ({len(active_positions)}):\n")
+            buf.write(ACTIVE_HEADER)
+            
+            buf.write("\n".join(
+                format_active_row(symbol, (company or "N/A")[:18], qty, avg_cost, market_val)
+                for symbol, company, qty, avg_cost, market_val, last_updated in active_positions
+            ) + "\n")
+        
+        if watchlist_items:
+            buf.write(f"    Watchlist Items ({len(watchlist_items)}):\n")
+            buf.write("\n".join(
+                f"      • {symbol} - {(company or 'N/A')[:30]}"
+                for symbol, company, qty, avg_cost, market_val, last_updated in watchlist_items
+            ) + "\n")
+        
+        # Summary list of all stocks - KEY REQUIREMENT
+        all_symbols = sorted(s[0] for s in active_positions + watchlist_items)
+        buf.write(f"    Complete Stock List: {', '.join(all_symbols)}\n")
+        
+    else:
+        buf.write("    No stocks in this portfolio\n")
+    
+    buf.write("\n")  # Spacing between portfolios
+    return buf.getvalue()
+
+def display_comprehensive_portfolio_info(pm, db):
     """Display comprehensive portfolio information including all required details"""
     print("=" * 80)
     print("COMPREHENSIVE PORTFOLIO DISPLAY")
@@ -27,7 +82,12 @@ def display_comprehensive_portfolio_info(pm):
         u.username,
         u.user_id,
         COUNT(ph.stock_id) as stock_count,
-        SUM(CASE WHEN ph.quantity != 0 THEN ph.market_value ELSE 0 END) as total_market_value
+        SUM(CASE WHEN ph.quantity != 0 THEN ph.market_value ELSE 0 END) as total_market_value,
+        SUM(COUNT(ph.stock_id) > 0) OVER () as portfolios_with_stocks,
+        MIN(p.created_date) OVER () as earliest_date,
+        MAX(p.created_date) OVER () as latest_date,
+        (SELECT COUNT(DISTINCT stock_id) FROM portfolio_holdings) as total_unique_stocks,
+        COUNT(*) OVER () as total_portfolios
     FROM portfolios p
     LEFT JOIN users u ON p.user_id = u.user_id
     LEFT JOIN portfolio_holdings ph ON p.portfolio_id = ph.portfolio_id
@@ -35,122 +95,72 @@ def display_comprehensive_portfolio_info(pm):
     ORDER BY p.created_date DESC
     """
     
-    db = DatabaseConnection()
-    if not db.connect():
-        print(" Could not connect to database")
-        return False
-    
     try:
-        portfolios = db.execute_query(query)
+        # Get detailed stock lists for every portfolio in one query - KEY REQUIREMENT
+        stock_query = """
+        SELECT 
+            ph.portfolio_id,
+            s.symbol, 
+            s.company_name, 
+            ph.quantity, 
+            ph.avg_cost, 
+            ph.market_value,
+            ph.last_updated,
+            ph.quantity != 0 as is_active
+        FROM portfolio_holdings ph
+        JOIN stocks s ON ph.stock_id = s.stock_id
+        ORDER BY ph.portfolio_id, s.symbol
+        """
         
-        if not portfolios:
-            print(" No portfolios found in the system")
-            db.disconnect()
-            return True
+        # portfolio_id -> (active positions, watchlist items), classified by the database
+        stocks_by_portfolio = defaultdict(lambda: ([], []))
+        for row in db.stream_query(stock_query, batch_size=200):
+            active_positions, watchlist_items = stocks_by_portfolio[row[0]]
+            (active_positions if row[7] else watchlist_items).append(row[1:7])
         
-        print(f"Found {len(portfolios)} portfolios in the system\n")
+        # Portfolios are streamed so output starts with the first row; the
+        # system-wide summary columns are identical on every row
+        summary = None
         
-        for i, portfolio in enumerate(portfolios, 1):
-            (portfolio_id, name, created_date, description, username, user_id, 
-             stock_count, total_market_value) = portfolio
-            
-            print(f"  PORTFOLIO #{i}")
-            print("━" * 60)
-            print(f" Portfolio ID: {portfolio_id}")
-            print(f" Name: {name}")
-            print(f" Owner: {username} (ID: {user_id})")
-            print(f" Creation Date: {created_date}")  # KEY REQUIREMENT
-            print(f" Description: {description if description else 'No description provided'}")
-            print(f" Total Market Value: ${(total_market_value or 0):.2f}")
-            
-            # Get detailed stock list for this portfolio - KEY REQUIREMENT
-            stock_query = """
-            SELECT 
-                s.symbol, 
-                s.company_name, 
-                ph.quantity, 
-                ph.avg_cost, 
-                ph.market_value,
-                ph.last_updated
-            FROM portfolio_holdings ph
-            JOIN stocks s ON ph.stock_id = s.stock_id
-            WHERE ph.portfolio_id = %s
-            ORDER BY s.symbol
-            """
-            
-            stocks = db.execute_query(stock_query, (portfolio_id,))
+        for i, portfolio in enumerate(db.stream_query(query, batch_size=200), 1):
+            if summary is None:
+                summary = portfolio[8:]
+                print(f"Found {summary[4]} portfolios in the system\n")
             
-            print(f" Stocks in Portfolio: {stock_count} total")
-            
-            if stocks:
-                # Separate active positions from watchlist items
-                active_positions = [s for s in stocks if s[2] != 0]  # quantity != 0
-                watchlist_items = [s for s in stocks if s[2] == 0]   # quantity == 0
-                
-                if active_positions:
-                    print(f"    Active Positions ({len(active_positions)}):")
-                    print(f"      {'Symbol':<8} | {'Company':<20} | {'Shares':<8} | {'Avg Cost':<10} | {'Value':<10}")
-                    print("      " + "-" * 65)
-                    
-                    for stock in active_positions:
-                        symbol, company, qty, avg_cost, market_val, last_updated = stock
-                        company_short = company[:18] if company else "N/A"
-                        print(f"      {symbol:<8} | {company_short:<20} | {qty:<8.2f} | ${avg_cost:<9.2f} | ${market_val:<9.2f}")
-                
-                if watchlist_items:
-                    print(f"    Watchlist Items ({len(watchlist_items)}):")
-                    for stock in watchlist_items:
-                        symbol, company, qty, avg_cost, market_val, last_updated = stock
-                        company_short = company[:30] if company else "N/A"
-                        print(f"      • {symbol} - {company_short}")
-                
-                # Summary list of all stocks - KEY REQUIREMENT
-                all_symbols = [s[0] for s in stocks]
-                print(f"    Complete Stock List: {', '.join(all_symbols)}")
-                
-            else:
-                print("    No stocks in this portfolio")
-            
-            print()  # Spacing between portfolios
+            sys.stdout.write(format_portfolio_block(i, portfolio[:8], stocks_by_portfolio.get(portfolio[0])))
+        
+        if summary is None:
+            print(" No portfolios found in the system")
+            return True
         
         # Summary statistics
         print("=" * 80)
         print(" PORTFOLIO SYSTEM SUMMARY")
         print("=" * 80)
         
-        total_portfolios = len(portfolios)
-        portfolios_with_stocks = len([p for p in portfolios if p[6] > 0])  # stock_count > 0
-        total_unique_stocks = db.execute_query("SELECT COUNT(DISTINCT stock_id) FROM portfolio_holdings")[0][0]
+        # System-wide aggregates are computed by the window columns of the main query
+        portfolios_with_stocks, earliest_date, latest_date, total_unique_stocks, total_portfolios = summary
         
         print(f"Total Portfolios: {total_portfolios}")
         print(f"Portfolios with Stocks: {portfolios_with_stocks}")
         print(f"Unique Stocks Across All Portfolios: {total_unique_stocks}")
         
         # Show creation date range
-        if portfolios:
-            earliest_date = min(p[2] for p in portfolios if p[2])
-            latest_date = max(p[2] for p in portfolios if p[2])
+        if earliest_date:
             print(f"Portfolio Creation Date Range: {earliest_date} to {latest_date}")
         
-        db.disconnect()
         return True
         
     except Exception as e:
         print(f" Error displaying portfolios: {e}")
-        db.disconnect()
         return False
 
-def display_portfolio_creation_timeline(pm):
+def display_portfolio_creation_timeline(pm, db):
     """Show portfolios in chronological order of creation"""
     print("\n" + "=" * 60)
     print("PORTFOLIO CREATION TIMELINE")
     print("=" * 60)
     
-    db = DatabaseConnection()
-    if not db.connect():
-        print(" Could not connect to database")
-        return False
-    
     try:
         timeline_query = """
         SELECT 
@@ -179,12 +189,10 @@ def display_portfolio_creation_timeline(pm):
                 
                 print(f"{date_str:<12} | {name_short:<20} | {username_short:<10} | {stock_count}")
         
-        db.disconnect()
         return True
         
     except Exception as e:
         print(f" Error displaying timeline: {e}")
-        db.disconnect()
         return False
 
 def main():
@@ -194,17 +202,23 @@ def main():
     
     pm = PortfolioManager()
     
+    # One connection for every display below, including the PortfolioManager views
+    db = pm.db
+    if not db.connect():
+        print(" Could not connect to database")
+        return False
+    
     try:
         # Main comprehensive display
         print("\n  COMPREHENSIVE PORTFOLIO INFORMATION")
-        success1 = display_comprehensive_portfolio_info(pm)
+        success1 = display_comprehensive_portfolio_info(pm, db)
         
         if not success1:
             return False
         
         # Timeline view
         print("\n  PORTFOLIO CREATION TIMELINE")
-        success2 = display_portfolio_creation_timeline(pm)
+        success2 = display_portfolio_creation_timeline(pm, db)
         
         # Enhanced display using portfolio manager method
         print("\n  ENHANCED PORTFOLIO DISPLAY (via PortfolioManager)")
@@ -221,6 +235,8 @@ def main():
     except Exception as e:
         print(f" Error: {e}")
         return False
+    finally:
+        db.disconnect()
 
 if __name__ == "__main__":
     print("Requirement: Display all portfolios with creation date and list of stocks")
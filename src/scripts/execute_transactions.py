@@ -7,54 +7,70 @@ Key Focus: Transaction entry → Portfolio holdings update with proper accountin
 
 import sys
 import os
+import re
+import numpy as np
+import pandas as pd
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from portfolio.portfolio_manager import PortfolioManager
-from database.db_connection import DatabaseConnection
 
-def show_portfolio_holdings_before_after(pm, portfolio_id, symbol, operation_description):
-    """Show portfolio holdings before and after transaction"""
-    
-    def get_holdings_state():
-        db = DatabaseConnection()
-        if db.connect():
-            query = """
-            SELECT s.symbol, ph.quantity, ph.avg_cost, ph.market_value, ph.unrealized_pnl
-            FROM portfolio_holdings ph
-            JOIN stocks s ON ph.stock_id = s.stock_id
-            WHERE ph.portfolio_id = %s AND s.symbol = %s
-            """
-            result = db.execute_query(query, (portfolio_id, symbol))
-            db.disconnect()
-            
-            if result:
-                return {
-                    'symbol': result[0][0],
-                    'quantity': float(result[0][1]),
-                    'avg_cost': float(result[0][2]) if result[0][2] else 0.0,
-                    'market_value': float(result[0][3]) if result[0][3] else 0.0,
-                    'unrealized_pnl': float(result[0][4]) if result[0][4] else 0.0
-                }
-        return None
-    
-    return get_holdings_state
+# Unsigned decimal such as "10", "10.5" or ".5"; checked before float() so bad input never raises
+_NUMBER_RE = re.compile(r"^(?:\d+(?:\.\d*)?|\.\d+)$")
+
+# Row templates parsed once at import; the bound .format is called per row
+LEDGER_ROW_FMT = "{:<20} | {:<6} | {:<12} | {:<8} | ${:<7.2f} | ${:<5.2f}"
+format_ledger_row = LEDGER_ROW_FMT.format
+HOLDING_COLUMNS = ['stock_id', 'symbol', 'company', 'quantity', 'avg_cost', 'pnl']
+
+def format_holdings_table(stocks):
+    """Format every holdings row with column-wise string operations instead of a per-row loop"""
+    df = pd.DataFrame(stocks, columns=HOLDING_COLUMNS)
+    
+    def money(col):
+        # '%.2f' over the whole column, padded like '{:<9.2f}'
+        values = np.char.mod('%.2f', df[col].fillna(0).astype(float).to_numpy())
+        return pd.Series(values, index=df.index).str.ljust(9)
+    
+    lines = (
+        df['symbol'].str.ljust(8) + " | "
+        + df['company'].fillna('').str.slice(0, 20).str.ljust(20) + " | "
+        + df['quantity'].astype(str).str.ljust(10) + " | $"
+        + money('avg_cost') + " | $"
+        + money('pnl')
+    )
+    return lines.tolist()
+
+def read_number(prompt, default=None):
+    """Prompt until the user enters a non-negative number (or blank when a default is given)"""
+    while True:
+        text = input(prompt).strip()
+        if not text and default is not None:
+            return default
+        if _NUMBER_RE.match(text):
+            return float(text)
+        print(" Please enter a valid non-negative number")
 
 def show_transaction_ledger(pm, portfolio_id, symbol=None):
     """Show recent transactions in the ledger"""
     print("\n--- RECENT TRANSACTIONS ---")
     
-    transactions = pm.get_transaction_history(portfolio_id, symbol)
+    # Only the 10 most recent rows are shown, so only those are fetched
+    transactions = pm.get_transaction_history(portfolio_id, symbol, limit=10)
     
     if not transactions:
         print("No transactions found")
         return
     
-    print(f"{'Date':<20} | {'Symbol':<6} | {'Action':<12} | {'Qty':<8} | {'Price':<8} | {'Fees':<6}")
-    print("-" * 70)
-    
-    for txn in transactions[:10]:  # Show last 10 transactions
-        txn_time, sym, action, quantity, price, fees, notes = txn
-        print(f"{str(txn_time):<20} | {sym:<6} | {action:<12} | {quantity:<8} | ${price:<7.2f} | ${fees:<5.2f}")
+    # Build the table and write it in one call instead of one print per row
+    lines = [
+        f"{'Date':<20} | {'Symbol':<6} | {'Action':<12} | {'Qty':<8} | {'Price':<8} | {'Fees':<6}",
+        "-" * 70
+    ]
+    lines.extend(
+        format_ledger_row(str(txn_time), sym, action, quantity, price, fees)
+        for txn_time, sym, action, quantity, price, fees, notes in transactions
+    )
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def execute_buy_transaction(pm, portfolio_id):
     """Execute a BUY transaction and show holdings update"""
@@ -67,34 +83,19 @@ def execute_buy_transaction(pm, portfolio_id):
         print(" Stock symbol cannot be empty")
         return False
     
-    try:
-        quantity = float(input("Enter quantity to buy: "))
-        price = float(input("Enter price per share: $"))
-        fees = float(input("Enter trading fees (optional, default 0): ") or "0")
-        
-        if quantity <= 0 or price <= 0:
-            print(" Quantity and price must be positive")
-            return False
-        
-    except ValueError:
-        print(" Invalid quantity, price, or fees")
-        return False
-    
-    # Get holdings state before transaction
-    get_holdings = show_portfolio_holdings_before_after(pm, portfolio_id, symbol, "BUY")
-    holdings_before = get_holdings()
+    quantity = read_number("Enter quantity to buy: ")
+    price = read_number("Enter price per share: $")
+    fees = read_number("Enter trading fees (optional, default 0): ", default=0.0)
     
-    print(f"\nBEFORE TRANSACTION:")
-    if holdings_before:
-        print(f"  {symbol}: {holdings_before['quantity']} shares @ ${holdings_before['avg_cost']:.2f} avg cost")
-        print(f"  Market Value: ${holdings_before['market_value']:.2f}")
-    else:
-        print(f"  {symbol}: No current position")
+    if quantity <= 0 or price <= 0:
+        print(" Quantity and price must be positive")
+        return False
     
-    # Execute the transaction
+    # Execute the transaction; the BEFORE/AFTER holdings are read inside the
+    # same database transaction as the trade, on the manager's connection
     print(f"\nExecuting: BUY {quantity} shares of {symbol} at ${price:.2f}/share...")
     
-    success = pm.execute_trade(
+    snapshots = pm.execute_trade_with_snapshot(
         portfolio_id=portfolio_id,
         symbol=symbol,
         action="BUY_TO_OPEN",
@@ -104,12 +105,18 @@ def execute_buy_transaction(pm, portfolio_id):
         notes="Test buy transaction"
     )
     
-    if not success:
+    if snapshots is None:
         print(" Transaction failed")
         return False
     
-    # Get holdings state after transaction
-    holdings_after = get_holdings()
+    holdings_before, holdings_after = snapshots
+    
+    print(f"\nBEFORE TRANSACTION:")
+    if holdings_before:
+        print(f"  {symbol}: {holdings_before['quantity']} shares @ ${holdings_before['avg_cost']:.2f} avg cost")
+        print(f"  Market Value: ${holdings_before['market_value']:.2f}")
+    else:
+        print(f"  {symbol}: No current position")
     
     print(f"\nAFTER TRANSACTION:")
     if holdings_after:
@@ -151,36 +158,23 @@ def execute_sell_transaction(pm, portfolio_id):
     
     print(f"Current position: {position['quantity']} shares @ ${position['avg_cost']:.2f}")
     
-    try:
-        quantity = float(input("Enter quantity to sell: "))
-        price = float(input("Enter price per share: $"))
-        fees = float(input("Enter trading fees (optional, default 0): ") or "0")
-        
-        if quantity <= 0 or price <= 0:
-            print(" Quantity and price must be positive")
-            return False
-            
-        if quantity > position['quantity']:
-            print(f" Cannot sell {quantity} shares, only have {position['quantity']} shares")
-            return False
+    quantity = read_number("Enter quantity to sell: ")
+    price = read_number("Enter price per share: $")
+    fees = read_number("Enter trading fees (optional, default 0): ", default=0.0)
+    
+    if quantity <= 0 or price <= 0:
+        print(" Quantity and price must be positive")
+        return False
         
-    except ValueError:
-        print(" Invalid quantity, price, or fees")
+    if quantity > position['quantity']:
+        print(f" Cannot sell {quantity} shares, only have {position['quantity']} shares")
         return False
     
-    # Get holdings state before transaction
-    get_holdings = show_portfolio_holdings_before_after(pm, portfolio_id, symbol, "SELL")
-    holdings_before = get_holdings()
-    
-    print(f"\nBEFORE TRANSACTION:")
-    if holdings_before:
-        print(f"  {symbol}: {holdings_before['quantity']} shares @ ${holdings_before['avg_cost']:.2f} avg cost")
-        print(f"  Market Value: ${holdings_before['market_value']:.2f}")
-    
-    # Execute the transaction
+    # Execute the transaction; the BEFORE/AFTER holdings are read inside the
+    # same database transaction as the trade, on the manager's connection
     print(f"\nExecuting: SELL {quantity} shares of {symbol} at ${price:.2f}/share...")
     
-    success = pm.execute_trade(
+    snapshots = pm.execute_trade_with_snapshot(
         portfolio_id=portfolio_id,
         symbol=symbol,
         action="SELL_TO_CLOSE",
@@ -190,12 +184,16 @@ def execute_sell_transaction(pm, portfolio_id):
         notes="Test sell transaction"
     )
     
-    if not success:
+    if snapshots is None:
         print(" Transaction failed")
         return False
     
-    # Get holdings state after transaction
-    holdings_after = get_holdings()
+    holdings_before, holdings_after = snapshots
+    
+    print(f"\nBEFORE TRANSACTION:")
+    if holdings_before:
+        print(f"  {symbol}: {holdings_before['quantity']} shares @ ${holdings_before['avg_cost']:.2f} avg cost")
+        print(f"  Market Value: ${holdings_before['market_value']:.2f}")
     
     print(f"\nAFTER TRANSACTION:")
     if holdings_after and holdings_after['quantity'] > 0:
@@ -215,97 +213,101 @@ def execute_sell_transaction(pm, portfolio_id):
     print("\n TRANSACTION LOGGED AND HOLDINGS UPDATED!")
     return True
 
+def show_current_holdings(pm, portfolio_id):
+    """Show the portfolio's current non-zero holdings"""
+    print("\n--- CURRENT PORTFOLIO HOLDINGS ---")
+    stocks = pm.get_portfolio_stocks(portfolio_id)
+    if not stocks:
+        print("No holdings found")
+        return
+    
+    lines = [
+        f"{'Symbol':<8} | {'Company':<20} | {'Quantity':<10} | {'Avg Cost':<10} | {'P&L':<10}",
+        "-" * 70
+    ]
+    lines.extend(format_holdings_table(stocks))
+    sys.stdout.write("\n".join(lines) + "\n")
+
+# Menu choice -> (handler, entry recorded in the session summary when it succeeds)
+MENU_HANDLERS = {
+    '1': (execute_buy_transaction, "BUY transaction"),
+    '2': (execute_sell_transaction, "SELL transaction"),
+    '3': (show_transaction_ledger, None),
+    '4': (show_current_holdings, None),
+}
+EXIT_CHOICE = '5'
+
 def main():
     print("=" * 70)
     print("EXECUTE TRANSACTIONS → UPDATE PORTFOLIO HOLDINGS")
     print("=" * 70)
     
-    pm = PortfolioManager()
-    
-    # Select portfolio
-    print("\nStep 1: Select Portfolio")
-    pm.display_all_portfolios()
-    
-    try:
-        portfolio_id = int(input("\nEnter Portfolio ID: "))
-        
-        transactions_executed = []
+    with PortfolioManager() as pm:
+        # Select portfolio
+        print("\nStep 1: Select Portfolio")
+        pm.display_all_portfolios()
         
-        while True:
-            print(f"\n" + "="*50)
-            print("TRANSACTION EXECUTION MENU")
-            print("="*50)
-            print("1. Execute BUY Transaction (BUY_TO_OPEN)")
-            print("2. Execute SELL Transaction (SELL_TO_CLOSE)")
-            print("3. View Transaction History")
-            print("4. View Current Holdings")
-            print("5. Exit")
+        try:
+            portfolio_id = int(input("\nEnter Portfolio ID: "))
             
-            choice = input("\nEnter your choice (1-5): ").strip()
+            transactions_executed = []
             
-            if choice == '1':
-                success = execute_buy_transaction(pm, portfolio_id)
-                if success:
-                    transactions_executed.append("BUY transaction")
-                    
-            elif choice == '2':
-                success = execute_sell_transaction(pm, portfolio_id)
-                if success:
-                    transactions_executed.append("SELL transaction")
-                    
-            elif choice == '3':
-                show_transaction_ledger(pm, portfolio_id)
+            while True:
+                print(f"\n" + "="*50)
+                print("TRANSACTION EXECUTION MENU")
+                print("="*50)
+                print("1. Execute BUY Transaction (BUY_TO_OPEN)")
+                print("2. Execute SELL Transaction (SELL_TO_CLOSE)")
+                print("3. View Transaction History")
+                print("4. View Current Holdings")
+                print("5. Exit")
+                
+                choice = input("\nEnter your choice (1-5): ").strip()
+                
+                if choice == EXIT_CHOICE:
+                    break
+                
+                entry = MENU_HANDLERS.get(choice)
+                if entry is None:
+                    print(" Invalid choice")
+                    continue
                 
-            elif choice == '4':
-                print("\n--- CURRENT PORTFOLIO HOLDINGS ---")
+                handler, summary = entry
+                if handler(pm, portfolio_id) and summary:
+                    transactions_executed.append(summary)
+            
+            # Summary
+            print(f"\n" + "="*70)
+            print("TRANSACTION SESSION SUMMARY")
+            print("="*70)
+            
+            if transactions_executed:
+                print(" TRANSACTIONS EXECUTED:")
+                for i, txn in enumerate(transactions_executed, 1):
+                    print(f"  {i}. {txn}")
+                
+                print(f"\nFinal Holdings State:")
                 stocks = pm.get_portfolio_stocks(portfolio_id)
                 if stocks:
-                    print(f"{'Symbol':<8} | {'Company':<20} | {'Quantity':<10} | {'Avg Cost':<10} | {'P&L':<10}")
-                    print("-" * 70)
                     for stock in stocks:
                         stock_id, symbol, company, qty, avg_cost, pnl = stock
-                        print(f"{symbol:<8} | {company[:20]:<20} | {qty:<10} | ${avg_cost:<9.2f} | ${pnl:<9.2f}")
-                else:
-                    print("No holdings found")
-                    
-            elif choice == '5':
-                break
+                        if qty != 0:
+                            print(f"  • {symbol}: {qty} shares @ ${avg_cost:.2f} (P&L: ${pnl:.2f})")
+                
+                print(f"\nTransaction Ledger:")
+                show_transaction_ledger(pm, portfolio_id)
                 
+                return True
             else:
-                print(" Invalid choice")
-        
-        # Summary
-        print(f"\n" + "="*70)
-        print("TRANSACTION SESSION SUMMARY")
-        print("="*70)
-        
-        if transactions_executed:
-            print(" TRANSACTIONS EXECUTED:")
-            for i, txn in enumerate(transactions_executed, 1):
-                print(f"  {i}. {txn}")
-            
-            print(f"\nFinal Holdings State:")
-            stocks = pm.get_portfolio_stocks(portfolio_id)
-            if stocks:
-                for stock in stocks:
-                    stock_id, symbol, company, qty, avg_cost, pnl = stock
-                    if qty != 0:
-                        print(f"  • {symbol}: {qty} shares @ ${avg_cost:.2f} (P&L: ${pnl:.2f})")
-            
-            print(f"\nTransaction Ledger:")
-            show_transaction_ledger(pm, portfolio_id)
-            
-            return True
-        else:
-            print("No transactions executed")
-            return True
-            
-    except ValueError:
-        print(" Invalid portfolio ID")
-        return False
-    except Exception as e:
-        print(f" Error: {e}")
-        return False
+                print("No transactions executed")
+                return True
+                
+        except ValueError:
+            print(" Invalid portfolio ID")
+            return False
+        except Exception as e:
+            print(f" Error: {e}")
+            return False
 
 if __name__ == "__main__":
     print("Requirement: Enter transactions which update portfolio holdings")
@@ -9,9 +9,15 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from portfolio.portfolio_manager import PortfolioManager
-from database.db_connection import DatabaseConnection
+from database.db_connection import get_conn
+from mysql.connector import Error
 from datetime import datetime, timedelta
 
+# Verification row template parsed once at import; the bound .format is called per row
+VERIFY_ROW_FMT = "{:<8} | {:<12} | {:<8} | {}"
+format_verify_row = VERIFY_ROW_FMT.format
+STATUS_LABELS = {'success': ' Updated', 'no_data': ' No Data', 'not_found': ' Not Found'}
+
 def show_portfolio_stocks(pm, portfolio_id):
     """Display stocks in the selected portfolio"""
     print("\n--- STOCKS IN PORTFOLIO ---")
@@ -87,88 +93,100 @@ def get_date_range_input():
         else:
             print(" Invalid option")
 
-def verify_price_data_updated(portfolio_id, stock_symbols, date_params):
-    """Verify that price data was actually fetched and stored"""
+def run_price_fetch(pm, stock_symbols, date_params):
+    """Fetch and store prices for all symbols with one bulk download"""
+    if date_params['type'] == 'period':
+        return pm.fetch_portfolio_price_data_bulk(
+            stock_symbols, 
+            period=date_params['period']
+        )
+    return pm.fetch_portfolio_price_data_bulk(
+        stock_symbols,
+        start_date=date_params['start_date'],
+        end_date=date_params['end_date']
+    )
+
+def verify_price_data_updated(portfolio_id, stock_symbols, date_params, stock_ids):
+    """Verify that price data was actually fetched and stored; stock_ids maps each
+    symbol to its stock_id (None if not in the database)"""
     print("\n--- VERIFYING PRICE DATA ---")
     
-    db = DatabaseConnection()
-    if not db.connect():
-        print(" Could not connect to database for verification")
+    try:
+        with get_conn() as db:
+            return _verify_with_connection(db, stock_symbols, date_params, stock_ids)
+    except Error as e:
+        print(f" Could not connect to database for verification: {e}")
         return False
-    
+
+def _verify_with_connection(db, stock_symbols, date_params, stock_ids):
+    """Run the verification queries on a borrowed connection"""
     try:
         verification_results = {}
         
-        for symbol in stock_symbols:
-            # Get stock_id
-            stock_query = "SELECT stock_id FROM stocks WHERE symbol = %s"
-            stock_result = db.execute_query(stock_query, (symbol,))
-            
-            if not stock_result:
-                verification_results[symbol] = {'status': 'not_found', 'records': 0}
-                continue
-            
-            stock_id = stock_result[0][0]
+        # Symbols were resolved from the preloaded stock_id map, so one grouped
+        # query on the price table's (stock_id, date) index covers every stock
+        known_ids = [stock_id for stock_id in stock_ids.values() if stock_id]
+        count_result = []
+        if known_ids:
+            placeholders = ",".join(["%s"] * len(known_ids))
+            params = list(known_ids)
+            date_filter = ""
+            if date_params['type'] != 'period':
+                date_filter = "AND date BETWEEN %s AND %s"
+                params.extend([date_params['start_date'], date_params['end_date']])
             
-            # Count price records
-            if date_params['type'] == 'period':
-                # For period-based, we'll check recent records
-                count_query = """
-                SELECT COUNT(*), MIN(date) as earliest, MAX(date) as latest
-                FROM stock_historical_data 
-                WHERE stock_id = %s
-                """
-                count_result = db.execute_query(count_query, (stock_id,))
-            else:
-                # For date range, check specific range
-                count_query = """
-                SELECT COUNT(*), MIN(date) as earliest, MAX(date) as latest
-                FROM stock_historical_data 
-                WHERE stock_id = %s AND date BETWEEN %s AND %s
-                """
-                count_result = db.execute_query(count_query, (stock_id, date_params['start_date'], date_params['end_date']))
-            
-            if count_result:
-                count, earliest, latest = count_result[0]
+            count_query = f"""
+            SELECT stock_id, COUNT(*), MIN(date) as earliest, MAX(date) as latest
+            FROM stock_historical_data
+            WHERE stock_id IN ({placeholders}) {date_filter}
+            GROUP BY stock_id
+            """
+            count_result = db.execute_query(count_query, tuple(params))
+        
+        if count_result is None:
+            verification_results = {symbol: {'status': 'error', 'records': 0} for symbol in stock_symbols}
+        else:
+            found = {row[0]: row[1:] for row in count_result}
+            for symbol in stock_symbols:
+                stock_id = stock_ids.get(symbol)
+                if not stock_id:
+                    verification_results[symbol] = {'status': 'not_found', 'records': 0}
+                    continue
+                
+                count, earliest, latest = found.get(stock_id, (0, None, None))
                 verification_results[symbol] = {
                     'status': 'success' if count > 0 else 'no_data',
                     'records': count,
                     'earliest': earliest,
                     'latest': latest
                 }
-            else:
-                verification_results[symbol] = {'status': 'error', 'records': 0}
         
-        # Display results
-        print(f"{'Symbol':<8} | {'Status':<12} | {'Records':<8} | {'Date Range'}")
-        print("-" * 60)
+        # Display results, buffered into a single write
+        lines = [
+            f"{'Symbol':<8} | {'Status':<12} | {'Records':<8} | {'Date Range'}",
+            "-" * 60
+        ]
         
         total_success = 0
         for symbol, result in verification_results.items():
             status = result['status']
             records = result['records']
             
+            date_range = "N/A"
             if status == 'success':
                 earliest = result['earliest']
                 latest = result['latest']
                 date_range = f"{earliest} to {latest}" if earliest and latest else "Unknown"
-                print(f"{symbol:<8} | {' Updated':<12} | {records:<8} | {date_range}")
                 total_success += 1
-            elif status == 'no_data':
-                print(f"{symbol:<8} | {' No Data':<12} | {records:<8} | N/A")
-            elif status == 'not_found':
-                print(f"{symbol:<8} | {' Not Found':<12} | {records:<8} | N/A")
-            else:
-                print(f"{symbol:<8} | {' Error':<12} | {records:<8} | N/A")
+            lines.append(format_verify_row(symbol, STATUS_LABELS.get(status, ' Error'), records, date_range))
+        sys.stdout.write("\n".join(lines) + "\n")
         
         print(f"\nSummary: {total_success}/{len(stock_symbols)} stocks updated successfully")
         
-        db.disconnect()
         return total_success > 0
         
     except Exception as e:
         print(f" Verification error: {e}")
-        db.disconnect()
         return False
 
 def main():
@@ -176,92 +194,84 @@ def main():
     print("FETCH STOCK PRICE DATA FOR PORTFOLIO (DATE RANGE)")
     print("=" * 70)
     
-    pm = PortfolioManager()
-    
-    # Step 1: Select Portfolio
-    print("\nStep 1: Select Portfolio")
-    pm.display_all_portfolios()
-    
-    try:
-        portfolio_id = int(input("\nEnter Portfolio ID: "))
-        
-        # Step 2: Display stocks in portfolio
-        print("\nStep 2: Review Portfolio Stocks")
-        stock_symbols = show_portfolio_stocks(pm, portfolio_id)
+    with PortfolioManager() as pm:
+        # Step 1: Select Portfolio
+        print("\nStep 1: Select Portfolio")
+        pm.display_all_portfolios()
         
-        if not stock_symbols:
-            print(" No stocks in portfolio to fetch data for")
-            return False
-        
-        print(f"\nFound {len(stock_symbols)} stocks: {', '.join(stock_symbols)}")
-        
-        # Step 3: Get date range parameters
-        print("\nStep 3: Specify Date Range")
-        date_params = get_date_range_input()
-        
-        # Step 4: Confirm operation
-        print(f"\n" + "="*50)
-        print("OPERATION SUMMARY")
-        print("="*50)
-        print(f"Portfolio ID: {portfolio_id}")
-        print(f"Stocks to update: {', '.join(stock_symbols)} ({len(stock_symbols)} stocks)")
-        
-        if date_params['type'] == 'period':
-            print(f"Date Range: {date_params['period']} period")
-        else:
-            print(f"Date Range: {date_params['start_date']} to {date_params['end_date']}")
-        
-        confirm = input("\nProceed with price data fetch? (y/N): ").strip().lower()
-        if confirm != 'y':
-            print("Operation cancelled")
-            return False
-        
-        # Step 5: Execute price data fetch
-        print(f"\n" + "="*50)
-        print("FETCHING PRICE DATA...")
-        print("="*50)
-        
-        if date_params['type'] == 'period':
-            success = pm.fetch_portfolio_price_data(
-                portfolio_id, 
-                period=date_params['period']
-            )
-        else:
-            success = pm.fetch_portfolio_price_data(
-                portfolio_id,
-                start_date=date_params['start_date'],
-                end_date=date_params['end_date']
-            )
-        
-        # Step 6: Verify results
-        if success:
-            print("\n PRICE DATA FETCH COMPLETED!")
+        try:
+            portfolio_id = int(input("\nEnter Portfolio ID: "))
+            
+            # Step 2: Display stocks in portfolio
+            print("\nStep 2: Review Portfolio Stocks")
+            stock_symbols = show_portfolio_stocks(pm, portfolio_id)
+            
+            if not stock_symbols:
+                print(" No stocks in portfolio to fetch data for")
+                return False
+            
+            print(f"\nFound {len(stock_symbols)} stocks: {', '.join(stock_symbols)}")
+            
+            # Step 3: Get date range parameters
+            print("\nStep 3: Specify Date Range")
+            date_params = get_date_range_input()
+            
+            # Step 4: Confirm operation
+            print(f"\n" + "="*50)
+            print("OPERATION SUMMARY")
+            print("="*50)
+            print(f"Portfolio ID: {portfolio_id}")
+            print(f"Stocks to update: {', '.join(stock_symbols)} ({len(stock_symbols)} stocks)")
             
-            # Verify data was actually stored
-            verification_success = verify_price_data_updated(portfolio_id, stock_symbols, date_params)
+            if date_params['type'] == 'period':
+                print(f"Date Range: {date_params['period']} period")
+            else:
+                print(f"Date Range: {date_params['start_date']} to {date_params['end_date']}")
+            
+            confirm = input("\nProceed with price data fetch? (y/N): ").strip().lower()
+            if confirm != 'y':
+                print("Operation cancelled")
+                return False
+            
+            # Step 5: Execute price data fetch
+            print(f"\n" + "="*50)
+            print("FETCHING PRICE DATA...")
+            print("="*50)
+            
+            # All symbols go to Yahoo in one threaded download
+            success = run_price_fetch(pm, stock_symbols, date_params)
             
-            if verification_success:
-                print("\n SUCCESS: Portfolio price data updated successfully!")
-                print("\nKey accomplishments:")
-                print("• Identified stocks in portfolio")
-                print("• Applied specified date range")
-                print("• Fetched historical price data from Yahoo Finance")
-                print("• Stored data in database with duplicate prevention")
-                print("• Verified data integrity")
-                return True
+            # Step 6: Verify results
+            if success:
+                print("\n PRICE DATA FETCH COMPLETED!")
+                
+                # Verify data was actually stored
+                verification_success = verify_price_data_updated(
+                    portfolio_id, stock_symbols, date_params, pm.get_stock_ids(stock_symbols)
+                )
+                
+                if verification_success:
+                    print("\n SUCCESS: Portfolio price data updated successfully!")
+                    print("\nKey accomplishments:")
+                    print("• Identified stocks in portfolio")
+                    print("• Applied specified date range")
+                    print("• Fetched historical price data from Yahoo Finance")
+                    print("• Stored data in database with duplicate prevention")
+                    print("• Verified data integrity")
+                    return True
+                else:
+                    print("\n  Price data fetch completed but verification failed")
+                    return False
             else:
-                print("\n  Price data fetch completed but verification failed")
+                print("\n PRICE DATA FETCH FAILED")
                 return False
-        else:
-            print("\n PRICE DATA FETCH FAILED")
+                
+        except ValueError:
+            print(" Invalid portfolio ID")
+            return False
+        except Exception as e:
+            print(f" Error: {e}")
             return False
-            
-    except ValueError:
-        print(" Invalid portfolio ID")
-        return False
-    except Exception as e:
-        print(f" Error: {e}")
-        return False
 
 if __name__ == "__main__":
     print("Requirement: Fetch stock price data for input date range for list of stocks in portfolio")
@@ -12,30 +12,34 @@ from portfolio.portfolio_manager import PortfolioManager
 from database.db_connection import DatabaseConnection
 
 def add_stock_to_portfolio(pm, portfolio_id):
-    """Add a stock to portfolio with validation"""
+    """Add one or more stocks to portfolio with validation"""
     print("\n--- ADD STOCK TO PORTFOLIO ---")
     
-    symbol = input("Enter stock symbol to add: ").strip().upper()
-    if not symbol:
+    symbols_input = input("Enter stock symbol(s) to add (comma-separated): ")
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols_input.split(',') if s.strip()))
+    if not symbols:
         print(" Stock symbol cannot be empty")
         return False
     
-    print(f"Validating stock symbol '{symbol}'...")
+    print(f"Validating stock symbol(s) {', '.join(symbols)}...")
     
-    # Validate stock using Yahoo Finance
-    if not pm.validator.validate_stock(symbol):
-        print(f" INVALID STOCK NAME: '{symbol}' is not a valid stock symbol")
-        return False
+    # Validate all symbols with batched Yahoo Finance requests
+    validation = pm.validator.validate_stocks(symbols)
     
-    # Add stock to portfolio
-    success = pm.add_stock_to_portfolio(portfolio_id, symbol)
+    added = 0
+    for symbol in symbols:
+        if not validation.get(symbol):
+            print(f" INVALID STOCK NAME: '{symbol}' is not a valid stock symbol")
+            continue
+        
+        # Add stock to portfolio
+        if pm.add_stock_to_portfolio(portfolio_id, symbol):
+            print(f" ADDED SUCCESSFULLY: '{symbol}' added to portfolio")
+            added += 1
+        else:
+            print(f" Failed to add '{symbol}' to portfolio")
     
-    if success:
-        print(f" ADDED SUCCESSFULLY: '{symbol}' added to portfolio")
-        return True
-    else:
-        print(f" Failed to add '{symbol}' to portfolio")
-        return False
+    return added > 0
 
 def remove_stock_from_portfolio(pm, portfolio_id):
     """Remove a stock from portfolio"""
@@ -82,79 +86,79 @@ def display_portfolio_details(pm, portfolio_id):
     
     return True
 
+# Menu choice -> (handler, entry recorded in the session summary when it succeeds)
+MENU_HANDLERS = {
+    '1': (add_stock_to_portfolio, "Added stock"),
+    '2': (remove_stock_from_portfolio, "Removed stock"),
+    '3': (display_portfolio_details, None),
+}
+EXIT_CHOICE = '4'
+
 def main():
     print("=" * 60)
     print("MANAGE PORTFOLIO STOCKS")
     print("=" * 60)
     
-    pm = PortfolioManager()
-    
-    # Display available portfolios
-    print("\nStep 1: Select Portfolio")
-    pm.display_all_portfolios()
-    
-    try:
-        portfolio_id = int(input("\nEnter Portfolio ID: "))
+    with PortfolioManager() as pm:
+        # Display available portfolios
+        print("\nStep 1: Select Portfolio")
+        pm.display_all_portfolios()
         
-        # Verify portfolio exists and show current state
-        if not display_portfolio_details(pm, portfolio_id):
-            return False
-        
-        operations_performed = []
-        
-        while True:
-            print(f"\n" + "=" * 40)
-            print("PORTFOLIO MANAGEMENT OPTIONS")
-            print("=" * 40)
-            print("1. Add Stock to Portfolio")
-            print("2. Remove Stock from Portfolio") 
-            print("3. View Portfolio Details")
-            print("4. Exit")
+        try:
+            portfolio_id = int(input("\nEnter Portfolio ID: "))
             
-            choice = input("\nEnter your choice (1-4): ").strip()
+            # Verify portfolio exists and show current state
+            if not display_portfolio_details(pm, portfolio_id):
+                return False
             
-            if choice == '1':
-                success = add_stock_to_portfolio(pm, portfolio_id)
-                if success:
-                    operations_performed.append("Added stock")
-                    
-            elif choice == '2':
-                success = remove_stock_from_portfolio(pm, portfolio_id)
-                if success:
-                    operations_performed.append("Removed stock")
-                    
-            elif choice == '3':
-                display_portfolio_details(pm, portfolio_id)
+            operations_performed = []
+            
+            while True:
+                print(f"\n" + "=" * 40)
+                print("PORTFOLIO MANAGEMENT OPTIONS")
+                print("=" * 40)
+                print("1. Add Stock to Portfolio")
+                print("2. Remove Stock from Portfolio") 
+                print("3. View Portfolio Details")
+                print("4. Exit")
                 
-            elif choice == '4':
-                break
+                choice = input("\nEnter your choice (1-4): ").strip()
                 
-            else:
-                print(" Invalid choice")
-        
-        # Summary
-        print(f"\n" + "=" * 60)
-        print("PORTFOLIO MANAGEMENT SESSION COMPLETE")
-        print("=" * 60)
-        
-        if operations_performed:
-            print(" OPERATIONS PERFORMED:")
-            for i, op in enumerate(operations_performed, 1):
-                print(f"  {i}. {op}")
+                if choice == EXIT_CHOICE:
+                    break
+                
+                entry = MENU_HANDLERS.get(choice)
+                if entry is None:
+                    print(" Invalid choice")
+                    continue
+                
+                handler, summary = entry
+                if handler(pm, portfolio_id) and summary:
+                    operations_performed.append(summary)
             
-            print("\nFinal Portfolio State:")
-            display_portfolio_details(pm, portfolio_id)
-            return True
-        else:
-            print("No changes made to portfolio")
-            return True
+            # Summary
+            print(f"\n" + "=" * 60)
+            print("PORTFOLIO MANAGEMENT SESSION COMPLETE")
+            print("=" * 60)
             
-    except ValueError:
-        print(" Invalid portfolio ID")
-        return False
-    except Exception as e:
-        print(f" Error: {e}")
-        return False
+            if operations_performed:
+                print(" OPERATIONS PERFORMED:")
+                for i, op in enumerate(operations_performed, 1):
+                    print(f"  {i}. {op}")
+                
+                print("\nFinal Portfolio State:")
+                display_portfolio_details(pm, portfolio_id)
+                return True
+            else:
+                print("No changes made to portfolio")
+                return True
+                
+        except ValueError:
+            print(" Invalid portfolio ID")
+            return False
+        except Exception as e:
+            print(f" Error: {e}")
+            return False
 
 if __name__ == "__main__":
     print("Requirement: Manage portfolio with add/remove operations and validation")
@@ -7,22 +7,19 @@ This script demonstrates all the key requirements for the project
 import sys
 import os
 
-def print_header(title, char="="):
-    """Print a formatted header"""
-    print(f"\n{char * 80}")
-    print(f"{title.center(80)}")
-    print(f"{char * 80}")
+def format_header(title, char="="):
+    """Return a formatted header block"""
+    return f"\n{char * 80}\n{title.center(80)}\n{char * 80}"
 
-def print_requirement(num, title, description):
-    """Print requirement information"""
-    print(f"\n{num}  REQUIREMENT {num}: {title}")
-    print(f" {description}")
-    print("-" * 60)
+def format_requirement(num, title, description):
+    """Return the requirement information block"""
+    return f"\n{num}  REQUIREMENT {num}: {title}\n {description}\n{'-' * 60}"
 
 def main():
-    print_header("PORTFOLIO MANAGEMENT SYSTEM - ALL REQUIREMENTS DEMO", "")
+    # The whole report is collected as text blocks and written with one call
+    out = [format_header("PORTFOLIO MANAGEMENT SYSTEM - ALL REQUIREMENTS DEMO", "")]
     
-    print("""
+    out.append("""
  This demo will showcase all implemented requirements:
 
 1. Create portfolio with defined stock list
@@ -99,22 +96,18 @@ def main():
         }
     ]
     
-    print_header("AVAILABLE DEMONSTRATION SCRIPTS")
+    out.append(format_header("AVAILABLE DEMONSTRATION SCRIPTS"))
     
     for i, script in enumerate(scripts, 1):
-        print_requirement(i, script["requirement"], script["description"])
-        
-        print(f" Script: {script['name']}")
-        print(f" Key Features:")
-        for feature in script["key_features"]:
-            print(f"   • {feature}")
-        
-        print(f"\n To run this requirement:")
-        print(f"   docker exec stock_python_app python /app/src/scripts/{script['name']}")
+        out.append(format_requirement(i, script["requirement"], script["description"]))
+        out.append(f" Script: {script['name']}\n Key Features:")
+        out.append("\n".join(f"   • {feature}" for feature in script["key_features"]))
+        out.append(f"\n To run this requirement:\n"
+                   f"   docker exec stock_python_app python /app/src/scripts/{script['name']}")
     
-    print_header("HOW TO TEST ALL REQUIREMENTS")
+    out.append(format_header("HOW TO TEST ALL REQUIREMENTS"))
     
-    print("""
+    out.append("""
  STEP-BY-STEP TESTING PROCESS:
 
 1  First, run the portfolio creation script:
@@ -161,9 +154,9 @@ def main():
    • Display portfolio timeline and statistics
 """)
     
-    print_header("VERIFICATION COMMANDS")
+    out.append(format_header("VERIFICATION COMMANDS"))
     
-    print("""
+    out.append("""
  To verify the system is working correctly:
 
 1. Check that all scripts exist and run without import errors:
@@ -191,9 +184,9 @@ def main():
    "
 """)
     
-    print_header("SYSTEM ARCHITECTURE OVERVIEW")
+    out.append(format_header("SYSTEM ARCHITECTURE OVERVIEW"))
     
-    print("""
+    out.append("""
   The portfolio management system includes:
 
  DATABASE COMPONENTS:
@@ -223,9 +216,9 @@ def main():
     Menu-driven interface integration
 """)
     
-    print_header("READY TO DEMONSTRATE ALL REQUIREMENTS!", "")
+    out.append(format_header("READY TO DEMONSTRATE ALL REQUIREMENTS!", ""))
     
-    print("""
+    out.append("""
 The portfolio management system is fully implemented and ready for testing!
 
 All requirements are satisfied:
@@ -238,6 +231,8 @@ All requirements are satisfied:
 Use the individual scripts above to test each requirement separately,
 or use the main menu system (python /app/src/main.py) for integrated access.
 """)
+    
+    sys.stdout.write("\n".join(out) + "\n")
 
 if __name__ == "__main__":
     main()
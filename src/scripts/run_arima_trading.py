@@ -8,116 +8,278 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-import pandas as pd
-import numpy as np
+import io
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from datetime import datetime, timedelta
 
 # Import your existing modules
 from database.db_connection import DatabaseConnection
-from portfolio.portfolio_manager import PortfolioManager
-from data.data_collector import DataCollector
+from trading.order_cache import load_cached_orders, save_orders
 
-# Import ARIMA algorithm
-sys.path.append(os.path.join(os.path.dirname(__file__), '../trading'))
-from arima_algorithm import ARIMATradingAlgorithm
+# pandas/numpy, the data/portfolio modules (yfinance) and the ARIMA algorithm
+# (statsmodels) are imported inside the functions that use them, so the menu
+# comes up without paying for those imports
 
-def fetch_and_predict(symbol):
+HISTORY_DAYS = 365  # Trading days of close prices fed to ARIMA
+MAX_ARIMA_WORKERS = 8  # Processes fitting ARIMA models in parallel
+
+# Per-stock history reads, run as server-side prepared statements: each is
+# parsed once per connection and re-executed with new bound parameters
+HISTORY_QUERY = """
+SELECT date, close_price FROM (
+    SELECT date, close_price 
+    FROM stock_historical_data 
+    WHERE stock_id = %s 
+    AND close_price IS NOT NULL
+    ORDER BY date DESC
+    LIMIT %s
+) latest
+ORDER BY date ASC
+"""
+TOPUP_QUERY = """
+SELECT date, close_price 
+FROM stock_historical_data 
+WHERE stock_id = %s AND date > %s
+AND close_price IS NOT NULL
+ORDER BY date ASC
+"""
+
+# Summary row template parsed once at import
+SIGNAL_ROW_FMT = "  {}: Expected return {:.2%}, Confidence {:.0%}"
+
+def format_signal_row(symbol, signal):
+    """One BUY/SELL summary line; the signal dict is looked up once per row"""
+    return SIGNAL_ROW_FMT.format(symbol, signal['expected_return'], signal['confidence'])
+
+# stock_id -> (last_date, dates, prices) for the latest HISTORY_DAYS closes;
+# later calls only query rows newer than last_date
+_HIST_CACHE = {}
+
+def _cache_history(stock_id, dates, prices):
+    """Keep the latest HISTORY_DAYS rows for a stock and return them as a Series"""
+    import pandas as pd
+    dates, prices = dates[-HISTORY_DAYS:], prices[-HISTORY_DAYS:]
+    if len(dates):
+        _HIST_CACHE[stock_id] = (dates[-1].astype('datetime64[D]').item(), dates, prices)
+    return pd.Series(prices, index=pd.DatetimeIndex(dates), copy=False)
+
+def _column_arrays(rows, date_col, price_col):
+    """Pull (dates, prices) numpy arrays straight out of DB rows, with no DataFrame in between"""
+    import numpy as np
+    dates = np.fromiter((row[date_col] for row in rows), dtype='datetime64[D]', count=len(rows))
+    prices = np.fromiter((float(row[price_col]) for row in rows), dtype=np.float64, count=len(rows))
+    return dates, prices
+
+def get_history_stats(db, stock_id):
+    """
+    (row count, latest date) of a stock's stored close prices in one aggregate
+    query, answered from the (stock_id, date, close_price) index alone
+    """
+    stats_query = """
+    SELECT COUNT(*), MAX(date)
+    FROM stock_historical_data
+    WHERE stock_id = %s AND close_price IS NOT NULL
+    """
+    result = db.execute_query(stats_query, (stock_id,), prepared=True)
+    if not result:
+        return 0, None
+    return result[0][0], result[0][1]
+
+def get_price_series(db, stock_id, latest_date=None):
+    """
+    Latest HISTORY_DAYS close prices for a stock, served from _HIST_CACHE and
+    topped up with only the rows added since the cached last date. When the
+    caller already knows the stored latest_date an up-to-date cache skips the query.
+    """
+    import numpy as np
+    import pandas as pd
+    cached = _HIST_CACHE.get(stock_id)
+    if cached is not None:
+        last_date, dates, prices = cached
+        if (datetime.now().date() - last_date < timedelta(days=1)
+                or (latest_date is not None and last_date >= latest_date)):
+            return pd.Series(prices, index=pd.DatetimeIndex(dates), copy=False)
+        
+        rows = db.execute_query(TOPUP_QUERY, (stock_id, last_date), prepared=True) or []
+        new_dates, new_prices = _column_arrays(rows, 0, 1)
+        return _cache_history(stock_id, np.concatenate([dates, new_dates]),
+                              np.concatenate([prices, new_prices]))
+    
+    rows = db.execute_query(HISTORY_QUERY, (stock_id, HISTORY_DAYS), prepared=True) or []
+    dates, prices = _column_arrays(rows, 0, 1)
+    return _cache_history(stock_id, dates, prices)
+
+def save_searched_orders(db, fitted):
+    """
+    Store the orders that were searched this run in arima_cache
+    
+    Args:
+        fitted: list of (stock_id, result) pairs from analyze_price_series
+    """
+    save_orders(db, [
+        (stock_id, result['order'], result['aic'])
+        for stock_id, result in fitted
+        if result and result.get('searched')
+    ])
+
+def lookup_stock_ids(symbols):
+    """
+    Resolve several symbols to stock_ids with one IN query
+    
+    Returns:
+        Dictionary of {symbol: stock_id} for the symbols found in the database
+    """
+    if not symbols:
+        return {}
+    
+    db = DatabaseConnection()
+    if not db.connect():
+        print("Failed to connect to database")
+        return {}
+    
+    try:
+        placeholders = ",".join(["%s"] * len(symbols))
+        rows = db.execute_query(
+            f"SELECT symbol, stock_id FROM stocks WHERE symbol IN ({placeholders})", tuple(symbols)
+        )
+        return {symbol.upper(): stock_id for symbol, stock_id in rows or []}
+    finally:
+        db.disconnect()
+
+def fetch_and_predict(symbol, stock_id=None, db=None):
     """
-    Fetch data from database and make ARIMA predictions
+    Fetch data from database and make ARIMA predictions; pass stock_id when it
+    is already known to skip the symbol lookup, and a connected db to reuse its
+    prepared statements across calls (the caller then owns the connection)
     """
+    from data.data_collector import DataCollector
     print(f"\n{'='*60}")
     print(f"ARIMA ANALYSIS FOR {symbol}")
     print(f"{'='*60}")
     
     # Connect to database
-    db = DatabaseConnection()
-    if not db.connect():
-        print("Failed to connect to database")
-        return None
+    owns_db = db is None
+    if owns_db:
+        db = DatabaseConnection()
+        if not db.connect():
+            print("Failed to connect to database")
+            return None
     
     try:
         # Get stock_id
         stock_query = "SELECT stock_id FROM stocks WHERE symbol = %s"
-        stock_result = db.execute_query(stock_query, (symbol,))
+        stock_result = [(stock_id,)] if stock_id else db.execute_query(stock_query, (symbol,))
+        fetched = False  # Whether this call already pulled the 1y history from Yahoo
         
         if not stock_result:
             print(f"Stock {symbol} not found in database")
             # Try to add it
+            # The collector writes on this connection instead of opening its own
             dc = DataCollector()
+            dc.db = db
             if dc.add_stock_to_database(symbol):
                 print(f"Added {symbol} to database")
                 # Fetch historical data
                 dc.fetch_stock_data(symbol, period='1y')
-                # Retry query
+                fetched = True
+                # Retry query; the collector's commits already ended this
+                # connection's read snapshot
                 stock_result = db.execute_query(stock_query, (symbol,))
-            else:
+            if not stock_result:
                 return None
         
         stock_id = stock_result[0][0]
         
-        # Fetch historical data
-        data_query = """
-        SELECT date, close_price 
-        FROM stock_historical_data 
-        WHERE stock_id = %s 
-        AND close_price IS NOT NULL
-        ORDER BY date ASC
-        LIMIT 365
-        """
+        # Decide whether Yahoo is needed from COUNT/MAX alone, before reading any rows
+        row_count, latest_date = get_history_stats(db, stock_id)
         
-        data_result = db.execute_query(data_query, (stock_id,))
+        # The history was just fetched; asking Yahoo for the same year again
+        # would not add rows
+        if row_count < 30 and fetched:
+            print(f"Insufficient historical data for {symbol}")
+            return None
         
-        if not data_result or len(data_result) < 30:
+        if row_count < 30:
             print(f"Insufficient historical data for {symbol}")
             print("Fetching from Yahoo Finance...")
             
-            # Fetch using data collector
+            # Fetch using data collector, on this connection so its commit also
+            # makes the new rows visible here
             dc = DataCollector()
+            dc.db = db
             dc.fetch_stock_data(symbol, period='1y')
-            
-            # Refresh DB connection to pick up newly inserted history
-            db.disconnect()
-            if not db.connect():
-                print("Failed to reconnect to database after data fetch")
-                return None
 
-            # Retry query
-            data_result = db.execute_query(data_query, (stock_id,))
+            # Retry query; older rows may have been added, so reload in full
+            _HIST_CACHE.pop(stock_id, None)
+            row_count, latest_date = get_history_stats(db, stock_id)
             
-            if not data_result or len(data_result) < 30:
+            if row_count < 30:
                 print("Still insufficient data")
                 return None
         
-        # Convert to pandas Series
-        df = pd.DataFrame(data_result, columns=['date', 'close_price'])
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-        price_series = df['close_price'].astype(float)
+        # Fetch historical data (cached; only new rows are queried on repeat calls)
+        price_series = get_price_series(db, stock_id, latest_date)
+        
+        # Reuse a recently searched order instead of re-running the grid search
+        order = load_cached_orders(db, [stock_id]).get(stock_id)
+        result = analyze_price_series(symbol, price_series, order)
+        save_searched_orders(db, [(stock_id, result)])
+        return result
+        
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
         
+    finally:
+        if owns_db:
+            db.disconnect()
+
+
+def analyze_price_series(symbol, price_series, order=None, n_jobs=None):
+    """
+    Run the ARIMA analysis on an already-loaded daily close price series; with
+    a known (p, d, q) order the model is fit once instead of grid searched.
+    n_jobs caps the processes used by the grid search (None = all cores).
+    """
+    from trading.arima_algorithm import ARIMATradingAlgorithm
+    try:
         print(f"✓ Loaded {len(price_series)} days of price data")
         print(f"  Date range: {price_series.index[0].date()} to {price_series.index[-1].date()}")
-        print(f"  Current price: ${price_series.iloc[-1]:.2f}")
+        print(f"  Current price: ${price_series.iat[-1]:.2f}")
         
         # Initialize ARIMA
         arima = ARIMATradingAlgorithm(
             confidence_threshold=0.02,
-            prediction_horizon=5
+            prediction_horizon=5,
+            n_jobs=n_jobs
         )
         
         # Test stationarity
         print("\n1. STATIONARITY TEST")
         print("-" * 40)
-        is_stationary, _, p_value, _ = arima.test_stationarity(price_series)
+        is_stationary, _, p_value, _ = arima.test_stationarity(price_series, verbose=True)
         
         # Find optimal parameters
         print("\n2. FINDING OPTIMAL ARIMA PARAMETERS")
         print("-" * 40)
-        optimal_order, model, _ = arima.find_optimal_order(
-            price_series,
-            max_p=3,
-            max_d=2,
-            max_q=3
-        )
+        model = None
+        if order is not None:
+            print(f"Using cached ARIMA order {tuple(order)}")
+            try:
+                optimal_order, model = tuple(order), arima.fit_arima(price_series, order=tuple(order))
+            except Exception as e:
+                print(f"Cached order failed to fit ({e}); searching again")
+                order = None
+        if order is None:
+            optimal_order, model, _ = arima.find_optimal_order(
+                price_series,
+                max_p=3,
+                max_d=2,
+                max_q=3
+            )
 
         if model is None:
             print("Failed to fit ARIMA model; skipping predictions")
@@ -135,11 +297,11 @@ def fetch_and_predict(symbol):
         # Generate trading signal
         print("\n4. TRADING SIGNAL")
         print("-" * 40)
-        current_price = price_series.iloc[-1]
-        signal = arima.generate_signals(current_price)
+        current_price = price_series.iat[-1]
+        signal = arima.generate_signals(current_price, include_reason=True)
         
         print(f"\nCurrent Price: ${current_price:.2f}")
-        print(f"5-Day Prediction: ${predictions['prediction'].iloc[-1]:.2f}")
+        print(f"5-Day Prediction: ${predictions.values[-1]:.2f}")
         print(f"\n📊 SIGNAL: {signal['action']}")
         print(f"   Confidence: {signal['confidence']:.2%}")
         print(f"   Expected Return: {signal.get('expected_return', 0):.2%}")
@@ -154,13 +316,21 @@ def fetch_and_predict(symbol):
             initial_capital=10000
         )
         
+        # The result (pickled back from worker processes) keeps only the
+        # fitted parameters, not the results object with its training data
+        aic = model.aic
+        arima.release_model()
+        
         return {
             'symbol': symbol,
             'current_price': current_price,
             'predictions': predictions,
             'signal': signal,
             'backtest': backtest,
-            'model': arima
+            'model': arima,
+            'order': optimal_order,
+            'aic': aic,
+            'searched': order is None
         }
         
     except Exception as e:
@@ -168,15 +338,68 @@ def fetch_and_predict(symbol):
         import traceback
         traceback.print_exc()
         return None
-        
-    finally:
-        db.disconnect()
+
+
+def _arima_worker(payload):
+    """
+    Process-pool entry point: rebuild the series from plain numpy arrays (cheap
+    to pickle), run the analysis and return (captured output, result) so the
+    parent can print each stock's report in order
+    """
+    import pandas as pd
+    symbol, dates, prices, order = payload
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        # The pool already runs one stock per process, so search sequentially here
+        series = pd.Series(prices, index=pd.DatetimeIndex(dates), copy=False)
+        result = analyze_price_series(symbol, series, order, n_jobs=1)
+    return buffer.getvalue(), result
+
+
+def load_price_series(db, stock_ids, max_days=HISTORY_DAYS):
+    """
+    Load the latest max_days of close prices for several stocks in one query
+    
+    Returns:
+        Dictionary of {stock_id: price Series indexed by date}
+    """
+    import numpy as np
+    if not stock_ids:
+        return {}
+    
+    placeholders = ",".join(["%s"] * len(stock_ids))
+    query = f"""
+    SELECT stock_id, date, close_price
+    FROM (
+        SELECT stock_id, date, close_price,
+               ROW_NUMBER() OVER (PARTITION BY stock_id ORDER BY date DESC) AS rn
+        FROM stock_historical_data
+        WHERE stock_id IN ({placeholders})
+        AND close_price IS NOT NULL
+    ) ranked
+    WHERE rn <= %s
+    ORDER BY stock_id, date
+    """
+    rows = db.execute_query(query, tuple(stock_ids) + (max_days,))
+    if not rows:
+        return {}
+    
+    # Rows arrive ordered by stock_id, so each stock is one contiguous slice
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    dates, prices = _column_arrays(rows, 1, 2)
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1, [len(rows)]))
+    return {
+        int(ids[start]): _cache_history(int(ids[start]), dates[start:end], prices[start:end])
+        for start, end in zip(bounds[:-1], bounds[1:])
+    }
 
 
 def analyze_portfolio(portfolio_id):
     """
     Analyze all stocks in a portfolio using ARIMA
     """
+    from data.data_collector import DataCollector
+    from portfolio.portfolio_manager import PortfolioManager
     print(f"\n{'='*80}")
     print(f"PORTFOLIO ARIMA ANALYSIS")
     print(f"{'='*80}")
@@ -192,10 +415,62 @@ def analyze_portfolio(portfolio_id):
     
     print(f"\nAnalyzing portfolio {portfolio_id} with {len(stocks)} stocks")
     
+    # Each ARIMA grid search is independent and CPU-bound, so the stocks are fit
+    # in parallel processes from arrays loaded here; workers never touch the DB.
+    # Stocks that already have enough history start fitting immediately, and the
+    # Yahoo fetch for the rest runs in this process while those fits are busy.
+    db = DatabaseConnection()
+    if not db.connect():
+        print("Failed to connect to database")
+        return None
+    
+    def submit_ready(executor, futures, series_by_id):
+        for stock_id, symbol, *_ in stocks:
+            series = series_by_id.get(stock_id)
+            if series is not None and len(series) >= 30 and symbol not in futures:
+                payload = (symbol, series.index.to_numpy(), series.to_numpy(), cached_orders.get(stock_id))
+                futures[symbol] = executor.submit(_arima_worker, payload)
+    
+    from trading.blas_threads import limit_blas_threads
+    futures = {}
+    workers = min(MAX_ARIMA_WORKERS, len(stocks), os.cpu_count() or 1)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=limit_blas_threads) as executor:
+            stock_ids = [stock[0] for stock in stocks]
+            cached_orders = load_cached_orders(db, stock_ids)
+            series_by_id = load_price_series(db, stock_ids)
+            submit_ready(executor, futures, series_by_id)
+            if futures:
+                print(f"\nFitting ARIMA models for {len(futures)} stocks on {workers} processes...")
+            
+            missing = [(stock_id, symbol) for stock_id, symbol, *_ in stocks
+                       if len(series_by_id.get(stock_id, ())) < 30]
+            if missing:
+                missing_symbols = [symbol for _, symbol in missing]
+                print(f"\nInsufficient historical data for {', '.join(missing_symbols)}")
+                print("Fetching from Yahoo Finance in batches...")
+                # Stored on this connection, whose commit also makes the rows
+                # visible to the reload below
+                collector = DataCollector()
+                collector.db = db
+                collector.fetch_stock_data_batch(missing_symbols, period='1y')
+                submit_ready(executor, futures, load_price_series(db, [stock_id for stock_id, _ in missing]))
+            
+            analyses = {symbol: future.result() for symbol, future in futures.items()}
+        
+        # Remember the orders that were grid searched this run
+        save_searched_orders(db, [(stock_id, analyses[symbol][1])
+                                  for stock_id, symbol, *_ in stocks if symbol in analyses])
+    finally:
+        db.disconnect()
+    
     results = {}
     buy_signals = []
     sell_signals = []
     hold_signals = []
+    # Running totals for the aggregate metrics, accumulated as results arrive
+    total_expected_return = 0.0
+    total_backtest_return = 0.0
     
     for stock in stocks:
         stock_id, symbol, company_name, quantity, avg_cost, _ = stock
@@ -203,10 +478,21 @@ def analyze_portfolio(portfolio_id):
         print(f"\nAnalyzing {symbol} ({company_name})")
         print(f"Current position: {quantity} shares @ ${avg_cost:.2f}")
         
-        result = fetch_and_predict(symbol)
+        print(f"\n{'='*60}")
+        print(f"ARIMA ANALYSIS FOR {symbol}")
+        print(f"{'='*60}")
+        
+        if symbol not in analyses:
+            print(f"Insufficient historical data for {symbol}")
+            continue
+        
+        output, result = analyses[symbol]
+        sys.stdout.write(output)
         
         if result:
             results[symbol] = result
+            total_expected_return += result['signal'].get('expected_return', 0)
+            total_backtest_return += result['backtest']['total_return']
             
             # Categorize signals
             if result['signal']['action'] == 'BUY':
@@ -221,24 +507,19 @@ def analyze_portfolio(portfolio_id):
     print("PORTFOLIO SUMMARY")
     print(f"{'='*80}")
     
-    print(f"\n🟢 BUY SIGNALS ({len(buy_signals)}):")
-    for symbol in buy_signals:
-        signal = results[symbol]['signal']
-        print(f"  {symbol}: Expected return {signal['expected_return']:.2%}, Confidence {signal['confidence']:.0%}")
-    
-    print(f"\n🔴 SELL SIGNALS ({len(sell_signals)}):")
-    for symbol in sell_signals:
-        signal = results[symbol]['signal']
-        print(f"  {symbol}: Expected return {signal['expected_return']:.2%}, Confidence {signal['confidence']:.0%}")
-    
-    print(f"\n⚪ HOLD SIGNALS ({len(hold_signals)}):")
-    for symbol in hold_signals:
-        print(f"  {symbol}")
+    # Each signal section is built as lines and written with one call
+    lines = [f"\n🟢 BUY SIGNALS ({len(buy_signals)}):"]
+    lines.extend(format_signal_row(symbol, results[symbol]['signal']) for symbol in buy_signals)
+    lines.append(f"\n🔴 SELL SIGNALS ({len(sell_signals)}):")
+    lines.extend(format_signal_row(symbol, results[symbol]['signal']) for symbol in sell_signals)
+    lines.append(f"\n⚪ HOLD SIGNALS ({len(hold_signals)}):")
+    lines.extend(f"  {symbol}" for symbol in hold_signals)
+    sys.stdout.write("\n".join(lines) + "\n")
     
     # Calculate aggregate metrics
     if results:
-        avg_expected_return = np.mean([r['signal'].get('expected_return', 0) for r in results.values()])
-        avg_backtest_return = np.mean([r['backtest']['total_return'] for r in results.values()])
+        avg_expected_return = total_expected_return / len(results)
+        avg_backtest_return = total_backtest_return / len(results)
         
         print(f"\n📈 AGGREGATE METRICS:")
         print(f"  Average Expected Return: {avg_expected_return:.2%}")
@@ -272,6 +553,7 @@ def main():
     
     elif choice == '2':
         # Display portfolios
+        from portfolio.portfolio_manager import PortfolioManager
         pm = PortfolioManager()
         pm.display_all_portfolios()
         
@@ -292,10 +574,19 @@ def main():
         demo_stocks = ['AAPL', 'GOOGL', 'MSFT']
         print(f"\nRunning demo with: {', '.join(demo_stocks)}")
         
-        for symbol in demo_stocks:
-            result = fetch_and_predict(symbol)
-            if result:
-                print(f"\n✅ {symbol} analyzed successfully")
+        stock_ids = lookup_stock_ids(demo_stocks)
+        # One connection for the whole demo so the history queries are prepared once
+        db = DatabaseConnection()
+        if db.connect():
+            try:
+                for symbol in demo_stocks:
+                    result = fetch_and_predict(symbol, stock_ids.get(symbol), db)
+                    if result:
+                        print(f"\n✅ {symbol} analyzed successfully")
+            finally:
+                db.disconnect()
+        else:
+            print("Failed to connect to database")
     
     else:
         print("Invalid choice")
@@ -10,14 +10,38 @@ sys.path.append('..')
 from data.data_collector import DataCollector
 from data.data_preprocessor import DataPreprocessor
 from portfolio.stock_validator import StockValidator
+import logging
+import logging.handlers
+import queue
+import threading
 import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Worker threads only enqueue log records; a background listener formats them
+# and writes to stderr, so the stdout lock never serializes the fan-out
+logger = logging.getLogger("standalone")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler(sys.stderr))
+
 class StandaloneDataProcessor:
+    MAX_WORKERS = 8  # Symbols processed concurrently; each one is three network round-trips
+    
     def __init__(self):
         self.api_call_count = 0
         self.last_call_time = 0
-        self.call_history = []
+        # Call history kept column-wise: entry i of every column is call number i + 1
+        self.call_timestamps = []
+        self.call_symbols = []
+        self.call_types = []
+        self.call_success = array('b')
+        self.call_errors = []
+        self.call_gaps = array('d')  # Seconds since the previous call
+        self._log_lock = threading.Lock()  # log_api_call runs on worker threads
         
         # Initialize production classes
         self.data_collector = DataCollector()
@@ -26,49 +50,49 @@ class StandaloneDataProcessor:
         
     def log_api_call(self, symbol, call_type, success, error=None):
         """Log each API call for debugging"""
-        self.api_call_count += 1
-        current_time = time.time()
-        
-        call_info = {
-            'call_number': self.api_call_count,
-            'timestamp': datetime.now().strftime('%H:%M:%S.%f')[:-3],
-            'symbol': symbol,
-            'call_type': call_type,
-            'success': success,
-            'error': str(error) if error else None,
-            'time_since_last': current_time - self.last_call_time if self.last_call_time > 0 else 0
-        }
-        
-        self.call_history.append(call_info)
-        self.last_call_time = current_time
-        
-        # Print real-time log
-        status = " SUCCESS" if success else " FAILED"
-        print(f"[{call_info['timestamp']}] Call #{self.api_call_count}: {call_type}({symbol}) - {status}")
-        if error:
-            print(f"   Error: {error}")
-        if call_info['time_since_last'] > 0:
-            print(f"   Time since last call: {call_info['time_since_last']:.2f}s")
-        print()
+        with self._log_lock:
+            self.api_call_count += 1
+            # One clock read serves both the gap and the displayed timestamp
+            current_time = time.time()
+            
+            timestamp = datetime.fromtimestamp(current_time).strftime('%H:%M:%S.%f')[:-3]
+            time_since_last = current_time - self.last_call_time if self.last_call_time > 0 else 0
+            
+            self.call_timestamps.append(timestamp)
+            self.call_symbols.append(symbol)
+            self.call_types.append(call_type)
+            self.call_success.append(1 if success else 0)
+            self.call_errors.append(str(error) if error else None)
+            self.call_gaps.append(time_since_last)
+            self.last_call_time = current_time
+            
+            # Record the real-time log; formatting happens on the listener thread
+            status = " SUCCESS" if success else " FAILED"
+            logger.info("[%s] Call #%d: %s(%s) - %s", timestamp, self.api_call_count,
+                        call_type, symbol, status)
+            if error:
+                logger.info("   Error: %s", error)
+            if time_since_last > 0:
+                logger.info("   Time since last call: %.2fs", time_since_last)
 
     def safe_ticker_info(self, symbol, wait_time=2):
         """Use production DataCollector.get_stock_info"""
-        print(f"--- Getting ticker info for {symbol} ---")
+        logger.info(f"--- Getting ticker info for {symbol} ---")
         
         try:
-            print("Using production DataCollector.get_stock_info()...")
+            logger.info("Using production DataCollector.get_stock_info()...")
             result = self.data_collector.get_stock_info(symbol)
             
             if result:
                 self.log_api_call(symbol, "DataCollector.get_stock_info", True)
                 
-                print(f" Successfully retrieved info for {symbol}")
-                print(f"   company_name: {result.get('name')}")
-                print(f"   sector: {result.get('sector')}")
-                print(f"   exchange: {result.get('exchange')}")
-                print(f"   current_price: {result.get('current_price')}")
-                print(f"   market_cap: {result.get('market_cap')}")
-                print(f"   pe_ratio: {result.get('pe_ratio')}")
+                logger.info(f" Successfully retrieved info for {symbol}")
+                logger.info(f"   company_name: {result.get('name')}")
+                logger.info(f"   sector: {result.get('sector')}")
+                logger.info(f"   exchange: {result.get('exchange')}")
+                logger.info(f"   current_price: {result.get('current_price')}")
+                logger.info(f"   market_cap: {result.get('market_cap')}")
+                logger.info(f"   pe_ratio: {result.get('pe_ratio')}")
                 
                 return result
             else:
@@ -77,25 +101,25 @@ class StandaloneDataProcessor:
                 
         except Exception as e:
             self.log_api_call(symbol, "DataCollector.get_stock_info", False, e)
-            print(f" Error getting info for {symbol}: {e}")
+            logger.info(f" Error getting info for {symbol}: {e}")
             return None
 
     def safe_historical_data(self, symbol, period="1y", wait_time=2):
         """Use production DataCollector.get_historical_data"""
-        print(f"--- Getting historical data for {symbol} ({period}) ---")
+        logger.info(f"--- Getting historical data for {symbol} ({period}) ---")
         
         try:
-            print("Using production DataCollector.get_historical_data()...")
+            logger.info("Using production DataCollector.get_historical_data()...")
             hist = self.data_collector.get_historical_data(symbol, period=period)
             
             if hist is not None and not hist.empty:
                 self.log_api_call(symbol, f"DataCollector.get_historical_data({period})", True)
                 
-                print(f" Successfully retrieved {len(hist)} records for {symbol}")
-                print(f"   Date range: {hist.index[0]} to {hist.index[-1]}")
-                print(f"   Recent close: ${float(hist['Close'].iloc[-1]):.2f}")
-                print(f"   Recent volume: {int(hist['Volume'].iloc[-1]):,}")
-                print(f"First five rows: {hist.head()}")
+                logger.info(f" Successfully retrieved {len(hist)} records for {symbol}")
+                logger.info(f"   Date range: {hist.index[0]} to {hist.index[-1]}")
+                logger.info(f"   Recent close: ${float(hist['Close'].iat[-1]):.2f}")
+                logger.info(f"   Recent volume: {int(hist['Volume'].iat[-1]):,}")
+                logger.info(f"First five rows: {hist.head()}")
                 
                 return hist
             else:
@@ -104,45 +128,62 @@ class StandaloneDataProcessor:
                 
         except Exception as e:
             self.log_api_call(symbol, f"DataCollector.get_historical_data({period})", False, e)
-            print(f" Error getting historical data for {symbol}: {e}")
+            logger.info(f" Error getting historical data for {symbol}: {e}")
             return None
 
     def test_stock_validation(self, symbol):
         """Test production StockValidator"""
-        print(f"--- Testing stock validation for {symbol} ---")
+        logger.info(f"--- Testing stock validation for {symbol} ---")
         
         try:
-            print("Using production StockValidator.validate_stock()...")
+            logger.info("Using production StockValidator.validate_stock()...")
             is_valid = self.stock_validator.validate_stock(symbol)
             
             if is_valid:
                 self.log_api_call(symbol, "StockValidator.validate_stock", True)
-                print(f" {symbol} validation passed")
+                logger.info(f" {symbol} validation passed")
                 return True
             else:
                 self.log_api_call(symbol, "StockValidator.validate_stock", False, "Invalid stock symbol")
-                print(f" {symbol} validation failed")
+                logger.info(f" {symbol} validation failed")
                 return False
                 
         except Exception as e:
             self.log_api_call(symbol, "StockValidator.validate_stock", False, e)
-            print(f" Error validating {symbol}: {e}")
+            logger.info(f" Error validating {symbol}: {e}")
             return False
 
     def process_single_stock(self, symbol):
         """Process a single stock with all production methods"""
-        print("=" * 80)
-        print(f"PROCESSING STOCK: {symbol}")
-        print("=" * 80)
+        logger.info("=" * 80)
+        logger.info(f"PROCESSING STOCK: {symbol}")
+        logger.info("=" * 80)
         
-        # Method 1: Validate stock
-        validation = self.test_stock_validation(symbol)
+        # Info and 1mo history come from one yf.Ticker; a non-empty info dict
+        # already proves the symbol is valid, so the validator is only a fallback
+        logger.info(f"--- Getting info + historical data for {symbol} (1mo) ---")
+        info, historical = self.data_collector.get_stock_bundle(symbol, period="1mo")
+        if info or historical is not None:
+            self.log_api_call(symbol, "DataCollector.get_stock_bundle", True)
+        else:
+            self.log_api_call(symbol, "DataCollector.get_stock_bundle", False, "No data returned")
         
-        # Method 2: Get basic info
-        info = self.safe_ticker_info(symbol)
+        if info:
+            validation = True
+            logger.info(f" {symbol} validation passed (info returned)")
+            logger.info(f"   company_name: {info.get('name')}")
+            logger.info(f"   sector: {info.get('sector')}")
+            logger.info(f"   exchange: {info.get('exchange')}")
+            logger.info(f"   current_price: {info.get('current_price')}")
+            logger.info(f"   market_cap: {info.get('market_cap')}")
+            logger.info(f"   pe_ratio: {info.get('pe_ratio')}")
+        else:
+            validation = self.test_stock_validation(symbol)
         
-        # Method 3: Get historical data
-        historical = self.safe_historical_data(symbol, period="1mo")
+        if historical is not None:
+            logger.info(f" Successfully retrieved {len(historical)} records for {symbol}")
+            logger.info(f"   Recent close: ${float(historical['Close'].iat[-1]):.2f}")
+            logger.info(f"   Recent volume: {int(historical['Volume'].iat[-1]):,}")
         
         return {
             'symbol': symbol,
@@ -152,16 +193,20 @@ class StandaloneDataProcessor:
         }
 
     def process_multiple_stocks(self, symbols):
-        """Process multiple stocks to test rate limiting"""
+        """Process multiple stocks concurrently to test rate limiting"""
         print("=" * 80)
         print(f"PROCESSING {len(symbols)} STOCKS")
         print("=" * 80)
         
-        results = {}
+        if not symbols:
+            return {}
         
-        for i, symbol in enumerate(symbols):
-            print(f"\n[Stock {i+1}/{len(symbols)}] Processing {symbol}")
-            results[symbol] = self.process_single_stock(symbol)
+        # The Yahoo calls are network-bound, so overlap them on a thread pool;
+        # the production rate limiters still space out the actual requests
+        workers = min(self.MAX_WORKERS, len(symbols))
+        print(f"Processing {', '.join(symbols)} on {workers} threads")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(zip(symbols, executor.map(self.process_single_stock, symbols)))
         
         return results
 
@@ -173,29 +218,29 @@ class StandaloneDataProcessor:
         
         print(f"Total API calls made: {self.api_call_count}")
         
-        successful_calls = [call for call in self.call_history if call['success']]
-        failed_calls = [call for call in self.call_history if not call['success']]
+        successful_calls = sum(self.call_success)
+        failed_idx = [i for i, ok in enumerate(self.call_success) if not ok]
         
-        print(f"Successful calls: {len(successful_calls)}")
-        print(f"Failed calls: {len(failed_calls)}")
+        print(f"Successful calls: {successful_calls}")
+        print(f"Failed calls: {len(failed_idx)}")
         
-        if failed_calls:
+        if failed_idx:
             print("\nFAILED CALLS DETAILS:")
-            for call in failed_calls:
-                print(f"  {call['timestamp']} - {call['call_type']}({call['symbol']}): {call['error']}")
+            for i in failed_idx:
+                print(f"  {self.call_timestamps[i]} - {self.call_types[i]}({self.call_symbols[i]}): {self.call_errors[i]}")
         
         # Show timing between calls
-        if len(self.call_history) > 1:
+        if len(self.call_gaps) > 1:
             print("\nCALL TIMING:")
-            for i in range(1, len(self.call_history)):
-                call = self.call_history[i]
-                print(f"  Call {call['call_number']}: {call['time_since_last']:.2f}s after previous")
+            for i in range(1, len(self.call_gaps)):
+                print(f"  Call {i + 1}: {self.call_gaps[i]:.2f}s after previous")
 
 def main():
     print("Standalone Yahoo Finance Data Processor")
     print("=" * 80)
     
     processor = StandaloneDataProcessor()
+    _log_listener.start()
     
     # Test with single stock first
     print("\n1. SINGLE STOCK TEST")
@@ -206,6 +251,9 @@ def main():
     symbols = ["MSFT", "GOOGL", "TSLA"]
     multiple_results = processor.process_multiple_stocks(symbols)
     
+    # Drain queued log records before the summary goes to stdout
+    _log_listener.stop()
+    
     # Print summary
     processor.print_summary()
     
@@ -214,8 +262,8 @@ def main():
     print("RECOMMENDATIONS")
     print("=" * 80)
     
-    successful_calls = len([call for call in processor.call_history if call['success']])
-    total_calls = len(processor.call_history)
+    successful_calls = sum(processor.call_success)
+    total_calls = len(processor.call_success)
     
     if successful_calls == total_calls:
         print(" ALL API CALLS SUCCESSFUL!")
@@ -0,0 +1,15 @@
+# src/trading/__init__.py
+"""
+Trading algorithms module
+"""
+
+__all__ = ['ARIMATradingAlgorithm']
+
+
+def __getattr__(name):
+    # Imported on first use, so light submodules (e.g. trading.blas_threads)
+    # don't pull in statsmodels and the compiled kernels
+    if name == 'ARIMATradingAlgorithm':
+        from .arima_algorithm import ARIMATradingAlgorithm
+        return ARIMATradingAlgorithm
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +0,0 @@
-# src/trading/__init__.py
-"""
-Trading algorithms module
-"""
-from .arima_algorithm import ARIMATradingAlgorithm
-
-__all__ = ['ARIMATradingAlgorithm']
\ No newline at end of file
@@ -6,20 +6,255 @@ DSCI-560 Lab 4: Algorithm Development
 
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.arima.model import ARIMA
+from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.tsa.stattools import adfuller, acf, pacf
+from statsmodels.tsa.adfvalues import mackinnonp
 from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
 import matplotlib.pyplot as plt
-from sklearn.metrics import mean_absolute_error, mean_squared_error
 import warnings
 warnings.filterwarnings('ignore')
+from collections import namedtuple
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 import sys
 import os
 
+try:
+    from numba import njit, prange
+except ImportError:  # Without numba the kernels below run as plain Python loops
+    def njit(*args, **kwargs):
+        return lambda func: func
+    prange = range
+
 # Add parent directory to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+from trading.blas_threads import limit_blas_threads
+
+# MacKinnon (2010) response-surface coefficients for the constant-only ADF
+# critical values: crit = b0 + b1/nobs + b2/nobs**2 + b3/nobs**3
+ADF_CRIT_COEFS = {
+    '1%': (-3.43035, -6.5393, -16.786, -79.433),
+    '5%': (-2.86154, -2.8903, -4.234, -40.040),
+    '10%': (-2.56677, -1.5384, -2.809, 0.0),
+}
+ADF_MIN_OBS = 50  # Shorter series go through statsmodels' adfuller
+
+
+@njit(cache=True)
+def _adf_tstat(y, maxlag):
+    """
+    ADF t-statistic with a constant: regresses dy_t on
+    [y_{t-1}, dy_{t-1}, ..., dy_{t-maxlag}, 1] built in a single loop.
+    
+    Returns:
+        tuple: (t-statistic of the y_{t-1} coefficient, regression nobs)
+    """
+    dy = np.diff(y)
+    nobs = len(dy) - maxlag
+    k = maxlag + 2
+    X = np.empty((nobs, k), dtype=np.float64)
+    target = np.empty(nobs, dtype=np.float64)
+    for r in range(nobs):
+        t = r + maxlag
+        target[r] = dy[t]
+        X[r, 0] = y[t]
+        for i in range(1, maxlag + 1):
+            X[r, i] = dy[t - i]
+        X[r, k - 1] = 1.0
+    
+    beta = np.linalg.lstsq(X, target)[0]
+    resid = target - X @ beta
+    sigma2 = (resid @ resid) / (nobs - k)
+    xtx_inv = np.linalg.inv(X.T @ X)
+    return beta[0] / np.sqrt(sigma2 * xtx_inv[0, 0]), nobs
+
+
+@lru_cache(maxsize=128)
+def _adf(series_bytes):
+    """
+    ADF test on a float64 buffer, cached by content so repeated tests of the
+    same prices (backtest refits, several passes over a portfolio) are free.
+    Uses a fixed Schwert maxlag instead of autolag='AIC', which would fit one
+    OLS regression per candidate lag. The regression runs in the compiled
+    kernel; series shorter than ADF_MIN_OBS use statsmodels' adfuller.
+    
+    Returns:
+        tuple: (adf_statistic, p_value, usedlag, nobs, critical_values), the
+        same layout as adfuller; critical_values is None from the compiled
+        path, see _adf_critical_values
+    """
+    values = np.frombuffer(series_bytes, dtype=np.float64)
+    maxlag = int(12 * (len(values) / 100) ** 0.25)
+    if len(values) < ADF_MIN_OBS:
+        return adfuller(values, maxlag=maxlag, autolag=None, regression='c')
+    
+    adf_statistic, nobs = _adf_tstat(values, maxlag)
+    p_value = mackinnonp(adf_statistic, regression='c', N=1)
+    return adf_statistic, p_value, maxlag, nobs, None
+
+
+def _adf_critical_values(nobs):
+    """MacKinnon critical values for a regression with nobs observations"""
+    return {
+        level: b0 + b1 / nobs + b2 / nobs ** 2 + b3 / nobs ** 3
+        for level, (b0, b1, b2, b3) in ADF_CRIT_COEFS.items()
+    }
+
+
+class Predictions(namedtuple('Predictions', ['values', 'start'])):
+    """Forecast prices as an ndarray plus the date of the first step; the
+    DataFrame view is only built when to_frame() is called"""
+    __slots__ = ()
+    
+    def to_frame(self):
+        return pd.DataFrame({
+            'prediction': self.values,
+            'date': pd.date_range(start=self.start, periods=len(self.values), freq='D')
+        })
+
+
+# Backtest signal codes used by the simulation kernel
+SIGNAL_CODES = {'BUY': 1, 'SELL': -1, 'HOLD': 0}
+
+
+@njit(cache=True)
+def _simulate(prices, signals, initial_capital):
+    """
+    All-in/all-out trading state machine over per-bar prices and signal codes
+    (1 = buy as many shares as cash allows, -1 = sell everything, 0 = hold).
+    
+    Returns:
+        tuple: (portfolio values, shares held, cash) per bar, plus the bar
+        index, action code and share count of every executed trade
+    """
+    n = len(prices)
+    values = np.empty(n, dtype=np.float64)
+    share_hist = np.empty(n, dtype=np.int64)
+    cash_hist = np.empty(n, dtype=np.float64)
+    trade_idx = np.empty(n, dtype=np.int64)
+    trade_actions = np.empty(n, dtype=np.int8)
+    trade_shares = np.empty(n, dtype=np.int64)
+    
+    cash = initial_capital
+    shares = 0
+    num_trades = 0
+    for i in range(n):
+        price = prices[i]
+        if signals[i] == 1 and cash > price:
+            shares_to_buy = int(cash / price)
+            if shares_to_buy > 0:
+                shares += shares_to_buy
+                cash -= shares_to_buy * price
+                trade_idx[num_trades] = i
+                trade_actions[num_trades] = 1
+                trade_shares[num_trades] = shares_to_buy
+                num_trades += 1
+        elif signals[i] == -1 and shares > 0:
+            cash += shares * price
+            trade_idx[num_trades] = i
+            trade_actions[num_trades] = -1
+            trade_shares[num_trades] = shares
+            num_trades += 1
+            shares = 0
+        
+        values[i] = cash + shares * price
+        share_hist[i] = shares
+        cash_hist[i] = cash
+    
+    return (values, share_hist, cash_hist,
+            trade_idx[:num_trades], trade_actions[:num_trades], trade_shares[:num_trades])
+
+
+@njit(parallel=True, cache=True)
+def _simulate_many(prices, lengths, signals, capitals):
+    """
+    _simulate for several stocks at once, one stock per parallel iteration.
+    Row s of prices/signals holds stock s's first lengths[s] bars (the rest is
+    padding); every output is padded the same way, with the number of trades
+    per stock in num_trades.
+    """
+    n_stocks, width = prices.shape
+    values = np.zeros((n_stocks, width), dtype=np.float64)
+    share_hist = np.zeros((n_stocks, width), dtype=np.int64)
+    cash_hist = np.zeros((n_stocks, width), dtype=np.float64)
+    trade_idx = np.zeros((n_stocks, width), dtype=np.int64)
+    trade_actions = np.zeros((n_stocks, width), dtype=np.int8)
+    trade_shares = np.zeros((n_stocks, width), dtype=np.int64)
+    num_trades = np.zeros(n_stocks, dtype=np.int64)
+    
+    for s in prange(n_stocks):
+        n = lengths[s]
+        v, sh, c, ti, ta, ts = _simulate(prices[s, :n], signals[s, :n], capitals[s])
+        values[s, :n] = v
+        share_hist[s, :n] = sh
+        cash_hist[s, :n] = c
+        k = len(ti)
+        trade_idx[s, :k] = ti
+        trade_actions[s, :k] = ta
+        trade_shares[s, :k] = ts
+        num_trades[s] = k
+    
+    return values, share_hist, cash_hist, trade_idx, trade_actions, trade_shares, num_trades
+
+
+# Optimizer settings shared by every fit and by rolling refits in backtest
+FIT_KWARGS = {'method': 'lbfgs', 'maxiter': 50, 'disp': False}
+
+
+def build_state_space(timeseries, order):
+    """
+    ARIMA(p, d, q) as a SARIMAX state-space model tuned for speed: no
+    stationarity/invertibility constraint projections and the scale
+    concentrated out of the likelihood. Differencing stays inside the state
+    space so forecasts are price levels, and the trend follows ARIMA's default
+    (a constant only when d == 0). float32 price data (e.g. from
+    ARIMAPortfolioTrader) is upcast here, since the Kalman filter runs in float64.
+    """
+    if getattr(timeseries, 'dtype', None) == np.float32:
+        timeseries = timeseries.astype(np.float64)
+    return SARIMAX(
+        timeseries,
+        order=order,
+        trend='c' if order[1] == 0 else 'n',
+        enforce_stationarity=False,
+        enforce_invertibility=False,
+        concentrate_scale=True
+    )
+
+
+def fit_state_space(timeseries, order):
+    """Fit build_state_space's model with a capped L-BFGS run"""
+    return build_state_space(timeseries, order).fit(**FIT_KWARGS)
+
+
+def filter_state_space(timeseries, order, params, param_names):
+    """
+    Run the Kalman filter over timeseries under already-estimated params (one
+    O(n) pass, no optimization); used to forecast after release_model().
+    param_names guards against params estimated under a different spec (e.g.
+    pmdarima's intercept handling).
+    """
+    model = build_state_space(timeseries, order)
+    if list(model.param_names) != list(param_names):
+        raise ValueError("Fitted parameters do not match the ARIMA spec; refit before forecasting")
+    return model.filter(params)
+
+
+def _fit_order(timeseries, order, keep_model=False):
+    """
+    Fit one candidate order for the grid search; module level so it can run in
+    a worker process. Returns (order, aic, bic, fitted model or None), or None
+    if the fit fails. The model is only kept when fitting in-process.
+    """
+    try:
+        fitted_model = fit_state_space(timeseries, order)
+        return order, fitted_model.aic, fitted_model.bic, fitted_model if keep_model else None
+    except Exception:
+        return None
+
+
 class ARIMATradingAlgorithm:
     """
     ARIMA-based trading algorithm for stock price prediction and signal generation
@@ -31,40 +266,55 @@ class ARIMATradingAlgorithm:
     - Performance metrics calculation
     """
     
-    def __init__(self, confidence_threshold=0.02, prediction_horizon=5):
+    def __init__(self, confidence_threshold=0.02, prediction_horizon=5, n_jobs=None, verbose=True):
         """
         Initialize ARIMA trading algorithm
         
         Args:
             confidence_threshold: Minimum predicted return to generate signals (2% default)
             prediction_horizon: Number of days to predict ahead (5 days default)
+            n_jobs: Processes used by the order grid search (None = all cores,
+                1 = sequential, e.g. when already running inside a worker process)
+            verbose: Print per-candidate grid results and the fitted model summary
         """
         self.confidence_threshold = confidence_threshold
         self.prediction_horizon = prediction_horizon
+        self.n_jobs = n_jobs
+        self.verbose = verbose
         self.model = None
+        self.params = None  # Fitted parameters; outlive the model after release_model()
+        self.param_names = None
         self.best_order = None
         self.predictions = None
         self.signals = []
         
-    def test_stationarity(self, timeseries, significance_level=0.05):
+    def test_stationarity(self, timeseries, significance_level=0.05, verbose=False):
         """
         Test if time series is stationary using Augmented Dickey-Fuller test
         
         Args:
             timeseries: Price series to test
             significance_level: Significance level for test (default 0.05)
+            verbose: Print the statistic, p-value and critical values
             
         Returns:
-            tuple: (is_stationary, adf_statistic, p_value, critical_values)
+            tuple: (is_stationary, adf_statistic, p_value, critical_values);
+            critical_values is None unless verbose
         """
-        result = adfuller(timeseries, autolag='AIC')
+        values = np.ascontiguousarray(timeseries, dtype=np.float64)
+        result = _adf(values.tobytes())
         
         adf_statistic = result[0]
         p_value = result[1]
-        critical_values = result[4]
         
         is_stationary = p_value < significance_level
         
+        # Only the pass/fail decision is needed when screening
+        if not verbose:
+            return is_stationary, adf_statistic, p_value, None
+        
+        critical_values = result[4] or _adf_critical_values(result[3])
+        
         print(f"ADF Statistic: {adf_statistic:.6f}")
         print(f"p-value: {p_value:.6f}")
         print(f"Critical Values:")
@@ -78,9 +328,10 @@ class ARIMATradingAlgorithm:
             
         return is_stationary, adf_statistic, p_value, critical_values
     
-    def find_optimal_order(self, timeseries, max_p=5, max_d=2, max_q=5, seasonal=False):
+    def find_optimal_order(self, timeseries, max_p=5, max_d=2, max_q=5, seasonal=False, n_jobs=None,
+                           method='stepwise'):
         """
-        Find optimal ARIMA order using grid search with AIC/BIC criteria
+        Find optimal ARIMA order by AIC
         
         Args:
             timeseries: Price series to fit
@@ -88,9 +339,16 @@ class ARIMATradingAlgorithm:
             max_d: Maximum differencing order to test  
             max_q: Maximum MA order to test
             seasonal: Whether to include seasonal components
+            n_jobs: Processes fitting candidates in parallel (defaults to self.n_jobs)
+            method: 'stepwise' for the Hyndman-Khandakar search, which fits a
+                handful of neighbouring orders (statsforecast's compiled AutoARIMA,
+                else pmdarima); 'grid' to fit every order
             
         Returns:
-            tuple: Best (p, d, q) order based on AIC
+            tuple: (order, model, results) - the best (p, d, q) by AIC, its fitted
+            results object (None if no candidate fit) and a list of
+            {'order', 'AIC', 'BIC'} dicts, one per grid candidate or just the
+            chosen order for the stepwise searches
         """
         print("\nSearching for optimal ARIMA parameters...")
         
@@ -102,43 +360,89 @@ class ARIMATradingAlgorithm:
         # Test for stationarity to determine d
         is_stationary, _, _, _ = self.test_stationarity(timeseries)
         
+        if method == 'stepwise':
+            found = self._statsforecast_search(timeseries, is_stationary, max_p, max_d, max_q, seasonal)
+            if found is not None:
+                return found
+            try:
+                import pmdarima as pm
+            except ImportError:
+                print("pmdarima is not installed; falling back to grid search")
+            else:
+                auto_model = pm.auto_arima(
+                    timeseries,
+                    d=0 if is_stationary else None,
+                    max_p=max_p,
+                    max_d=max_d,
+                    max_q=max_q,
+                    seasonal=seasonal,
+                    stepwise=True,
+                    information_criterion='aic',
+                    suppress_warnings=True,
+                    error_action='ignore'
+                )
+                # arima_res_ is the underlying statsmodels results object, so
+                # forecast()/summary() keep working for the rest of the class
+                best_order = auto_model.order
+                best_model = auto_model.arima_res_
+                best_aic, best_bic = best_model.aic, best_model.bic
+                results = [{'order': best_order, 'AIC': best_aic, 'BIC': best_bic}]
+                
+                print(f"\n✓ Best ARIMA order: {best_order}")
+                print(f"  AIC: {best_aic:.2f}")
+                print(f"  BIC: {best_bic:.2f}")
+                
+                self.best_order = best_order
+                return best_order, best_model, results
+        
         if is_stationary:
             d_range = [0]
         else:
             d_range = range(1, max_d + 1)
         
+        # Skip the (0,0,0) model
+        orders = [(p, d, q) for d in d_range for p in range(max_p + 1) for q in range(max_q + 1)
+                  if (p, d, q) != (0, 0, 0)]
+        
+        # Prepare the data once for the whole grid: a plain float64 array is what
+        # every candidate's state space filters (differencing lives inside the
+        # state, so there is no per-d copy to share), it skips each SARIMAX
+        # re-validating the date index, and it pickles compactly to workers
+        values = np.ascontiguousarray(timeseries, dtype=np.float64)
+        
+        # Every candidate fit is independent, so spread them over processes;
+        # only (order, aic, bic) comes back, never the fitted model. Fitting
+        # in-process keeps the running best model so it needs no refit.
+        workers = min(n_jobs or self.n_jobs or os.cpu_count() or 1, len(orders))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=limit_blas_threads) as executor:
+                fits = list(executor.map(partial(_fit_order, values), orders))
+        else:
+            fits = map(partial(_fit_order, values, keep_model=True), orders)
+        
         results = []
+        for fit_result in fits:
+            if fit_result is None:
+                continue
+            order, aic, bic, fitted_model = fit_result
+            results.append({
+                'order': order,
+                'AIC': aic,
+                'BIC': bic
+            })
+            
+            if aic < best_aic:
+                best_aic = aic
+                best_bic = bic
+                best_order = order
+                best_model = fitted_model
+                
+            if self.verbose:
+                print(f"   ARIMA{order} - AIC: {aic:.2f}, BIC: {bic:.2f}")
         
-        for d in d_range:
-            for p in range(max_p + 1):
-                for q in range(max_q + 1):
-                    # Skip the (0,0,0) model
-                    if p == 0 and d == 0 and q == 0:
-                        continue
-                        
-                    try:
-                        model = ARIMA(timeseries, order=(p, d, q))
-                        fitted_model = model.fit()
-                        
-                        aic = fitted_model.aic
-                        bic = fitted_model.bic
-                        
-                        results.append({
-                            'order': (p, d, q),
-                            'AIC': aic,
-                            'BIC': bic
-                        })
-                        
-                        if aic < best_aic:
-                            best_aic = aic
-                            best_bic = bic
-                            best_order = (p, d, q)
-                            best_model = fitted_model
-                            
-                        print(f"   ARIMA{(p,d,q)} - AIC: {aic:.2f}, BIC: {bic:.2f}")
-                        
-                    except Exception as e:
-                        continue
+        # Parallel fits only report scores, so refit the winner once to keep its model
+        if best_order is not None and best_model is None:
+            best_model = fit_state_space(values, best_order)
         
         print(f"\n✓ Best ARIMA order: {best_order}")
         print(f"  AIC: {best_aic:.2f}")
@@ -147,6 +451,46 @@ class ARIMATradingAlgorithm:
         self.best_order = best_order
         return best_order, best_model, results
     
+    def _statsforecast_search(self, timeseries, is_stationary, max_p, max_d, max_q, seasonal):
+        """
+        Stepwise order search with statsforecast's AutoARIMA, whose candidate
+        fits run in numba-compiled code, then one statsmodels fit of the chosen
+        order so the returned model has the API the rest of the class uses.
+        None if statsforecast is unavailable or the search fails.
+        """
+        try:
+            from statsforecast.models import AutoARIMA
+        except ImportError:
+            return None
+        
+        values = np.ascontiguousarray(timeseries, dtype=np.float64)
+        try:
+            auto_model = AutoARIMA(
+                d=0 if is_stationary else None,
+                max_p=max_p,
+                max_d=max_d,
+                max_q=max_q,
+                seasonal=seasonal,
+                season_length=1,
+                stepwise=True,
+                ic='aic'
+            ).fit(values)
+            # arma holds (p, q, P, Q, season, d, D)
+            p, q, _, _, _, d, _ = auto_model.model_['arma']
+            best_order = (int(p), int(d), int(q))
+            best_model = fit_state_space(values, best_order)
+        except Exception as e:
+            print(f"statsforecast AutoARIMA failed ({e}); falling back")
+            return None
+        
+        results = [{'order': best_order, 'AIC': best_model.aic, 'BIC': best_model.bic}]
+        print(f"\n✓ Best ARIMA order: {best_order}")
+        print(f"  AIC: {best_model.aic:.2f}")
+        print(f"  BIC: {best_model.bic:.2f}")
+        
+        self.best_order = best_order
+        return best_order, best_model, results
+    
     def fit_arima(self, train_data, order=None):
         """
         Fit ARIMA model to training data
@@ -163,60 +507,77 @@ class ARIMATradingAlgorithm:
             self.model = model
         else:
             self.best_order = order
-            arima_model = ARIMA(train_data, order=order)
-            self.model = arima_model.fit()
+            self.model = fit_state_space(train_data, order)
+        self.params = np.asarray(self.model.params)
+        self.param_names = list(self.model.model.param_names)
             
         print(f"\n✓ ARIMA{self.best_order} model fitted successfully")
         
         # Print model summary
-        print("\nModel Summary:")
-        print(self.model.summary().tables[1])
+        if self.verbose:
+            print("\nModel Summary:")
+            print(self.model.summary().tables[1])
         
         return self.model
     
-    def predict_prices(self, steps_ahead=None):
+    def release_model(self):
+        """
+        Drop the fitted results object (training data, residuals, filter output
+        and parameter covariance) and keep only params/param_names and
+        best_order, so many per-symbol algorithms can be held or pickled
+        cheaply. predict_prices can still forecast given the price data.
+        """
+        self.model = None
+    
+    def predict_prices(self, steps_ahead=None, verbose=True, data=None):
         """
         Generate price predictions using fitted ARIMA model
         
         Args:
             steps_ahead: Number of periods to forecast
+            verbose: Print the prediction table (builds its DataFrame)
+            data: Price series to condition the forecast on under the fitted
+                parameters; required after release_model()
             
         Returns:
-            DataFrame with predictions and confidence intervals
+            Predictions tuple; call .to_frame() for the dated DataFrame
         """
-        if self.model is None:
+        if data is not None and self.params is not None:
+            model = filter_state_space(data, self.best_order, self.params, self.param_names)
+        elif self.model is not None:
+            model = self.model
+        else:
             raise ValueError("Model must be fitted before prediction")
             
         if steps_ahead is None:
             steps_ahead = self.prediction_horizon
             
         # Generate forecast
-        forecast_result = self.model.forecast(steps=steps_ahead)
-        
-        # Get prediction intervals
-        forecast_df = pd.DataFrame({
-            'prediction': forecast_result,
-            'date': pd.date_range(
-                start=pd.Timestamp.today(), 
-                periods=steps_ahead, 
-                freq='D'
-            )
-        })
+        forecast_result = model.forecast(steps=steps_ahead)
         
-        self.predictions = forecast_df
+        predictions = Predictions(np.asarray(forecast_result, dtype=np.float64), pd.Timestamp.today())
+        self.predictions = predictions
         
         print(f"\n✓ Generated {steps_ahead}-day price predictions")
-        print(forecast_df)
+        if verbose:
+            print(predictions.to_frame())
         
-        return forecast_df
+        return predictions
     
-    def generate_signals(self, current_price, predictions=None):
+    def generate_signals(self, current_price, predictions=None, include_reason=False,
+                         record_signals=False, timestamp=None):
         """
         Generate trading signals based on ARIMA predictions
         
         Args:
             current_price: Current stock price
-            predictions: Price predictions (uses self.predictions if None)
+            predictions: Predictions tuple or DataFrame with a 'prediction'
+                column (uses self.predictions if None)
+            include_reason: Format the human-readable 'reason' (None otherwise);
+                only worth the string formatting when it is displayed
+            record_signals: Also append the signal to self.signals
+            timestamp: Time recorded with the signal; pass one value for a whole
+                batch of signals (defaults to now)
             
         Returns:
             dict: Trading signal with action and confidence
@@ -224,11 +585,18 @@ class ARIMATradingAlgorithm:
         if predictions is None:
             predictions = self.predictions
             
-        if predictions is None or predictions.empty:
+        if isinstance(predictions, Predictions):
+            forecast_values = predictions.values
+        elif predictions is not None:
+            forecast_values = predictions['prediction'].to_numpy()
+        else:
+            forecast_values = ()
+        
+        if len(forecast_values) == 0:
             return {'action': 'HOLD', 'confidence': 0, 'reason': 'No predictions available'}
         
         # Calculate expected returns
-        predicted_price = predictions['prediction'].iloc[-1]  # Use last prediction
+        predicted_price = forecast_values[-1]  # Use last prediction
         expected_return = (predicted_price - current_price) / current_price
         
         # Generate signal based on threshold
@@ -241,7 +609,7 @@ class ARIMATradingAlgorithm:
                 'expected_return': expected_return,
                 'predicted_price': predicted_price,
                 'current_price': current_price,
-                'reason': f'Expected return of {expected_return:.2%} exceeds threshold'
+                'reason': f'Expected return of {expected_return:.2%} exceeds threshold' if include_reason else None
             }
         elif expected_return < -self.confidence_threshold:
             signal = {
@@ -250,7 +618,7 @@ class ARIMATradingAlgorithm:
                 'expected_return': expected_return,
                 'predicted_price': predicted_price,
                 'current_price': current_price,
-                'reason': f'Expected loss of {expected_return:.2%} exceeds threshold'
+                'reason': f'Expected loss of {expected_return:.2%} exceeds threshold' if include_reason else None
             }
         else:
             signal = {
@@ -259,17 +627,19 @@ class ARIMATradingAlgorithm:
                 'expected_return': expected_return,
                 'predicted_price': predicted_price,
                 'current_price': current_price,
-                'reason': f'Expected return of {expected_return:.2%} within threshold'
+                'reason': f'Expected return of {expected_return:.2%} within threshold' if include_reason else None
             }
         
-        self.signals.append({
-            'timestamp': datetime.now(),
-            'signal': signal
-        })
+        if record_signals:
+            self.signals.append({
+                'timestamp': timestamp or datetime.now(),
+                'signal': signal
+            })
         
         return signal
     
-    def backtest(self, price_data, train_size=0.8, initial_capital=10000):
+    def backtest(self, price_data, train_size=0.8, initial_capital=10000, forecast=None,
+                 rolling=False, refit_every=None, order=None):
         """
         Backtest the ARIMA trading strategy
         
@@ -277,6 +647,14 @@ class ARIMATradingAlgorithm:
             price_data: Historical price data
             train_size: Proportion of data for training
             initial_capital: Starting capital for backtesting
+            forecast: Optional prediction_horizon-step forecast from the end of the
+                training window (e.g. from a batched multi-stock fit); when given,
+                no model is fitted here
+            rolling: Update the model with each test bar before predicting
+                (expanding window) instead of reusing one forecast for every bar
+            refit_every: With rolling, fully re-estimate the parameters every
+                this many bars (None = never)
+            order: ARIMA order to fit directly; None searches for one
             
         Returns:
             dict: Backtesting results with performance metrics
@@ -290,81 +668,140 @@ class ARIMATradingAlgorithm:
         print(f"Training samples: {len(train_data)}")
         print(f"Testing samples: {len(test_data)}")
         
-        # Fit model on training data
-        self.fit_arima(train_data)
+        # Signal per tradable bar; the last prediction_horizon bars are not traded
+        num_bars = max(len(test_data) - self.prediction_horizon, 0)
+        test_prices = np.ascontiguousarray(test_data.to_numpy(), dtype=np.float64)
+        prices = test_prices[:num_bars]
+        
+        # Fit model on training data (a rolling backtest always needs its own model)
+        if forecast is None or rolling:
+            self.fit_arima(train_data, order=order)
+        
+        if rolling:
+            predicted = self._rolling_predictions(train_data.to_numpy(), prices, refit_every)
+        else:
+            # Without retraining the forecast is the same for every bar: forecast
+            # once and threshold all bars together
+            if forecast is None:
+                forecast = self.model.forecast(steps=self.prediction_horizon)
+            predicted = np.asarray(forecast, dtype=np.float64)[-1]
+        
+        signals = self._signal_codes(predicted, prices)
+        
+        # Run the trading state machine in the compiled kernel
+        simulated = _simulate(prices, signals, float(initial_capital))
+        return self._backtest_results(test_data, test_prices, num_bars, initial_capital, simulated)
+    
+    def backtest_many(self, price_data_list, forecasts, train_size=0.8, initial_capital=10000):
+        """
+        Backtest several stocks that already have forecasts (e.g. from a batched
+        multi-stock fit) with one parallel kernel call; each result matches
+        backtest(price_data, forecast=forecast)
         
-        # Initialize portfolio
+        Args:
+            price_data_list: Historical price data per stock
+            forecasts: prediction_horizon-step forecast per stock, from the end
+                of its training window
+            train_size: Proportion of data for training
+            initial_capital: Starting capital per stock
+            
+        Returns:
+            list: Backtesting results per stock, in input order
+        """
+        splits = []
+        for price_data, forecast in zip(price_data_list, forecasts):
+            split_idx = int(len(price_data) * train_size)
+            test_data = price_data[split_idx:]
+            num_bars = max(len(test_data) - self.prediction_horizon, 0)
+            test_prices = np.ascontiguousarray(test_data.to_numpy(), dtype=np.float64)
+            signals = self._signal_codes(np.asarray(forecast, dtype=np.float64)[-1], test_prices[:num_bars])
+            splits.append((split_idx, test_data, test_prices, num_bars, signals))
+        
+        # Pad every stock's tradable bars into one 2D block for the kernel
+        lengths = np.array([split[3] for split in splits], dtype=np.int64)
+        width = max(int(lengths.max()) if len(lengths) else 0, 1)
+        prices = np.zeros((len(splits), width), dtype=np.float64)
+        signals = np.zeros((len(splits), width), dtype=np.int8)
+        for s, (_, _, test_prices, num_bars, stock_signals) in enumerate(splits):
+            prices[s, :num_bars] = test_prices[:num_bars]
+            signals[s, :num_bars] = stock_signals
+        capitals = np.full(len(splits), float(initial_capital))
+        
+        values, share_hist, cash_hist, trade_idx, trade_actions, trade_shares, num_trades = _simulate_many(
+            prices, lengths, signals, capitals
+        )
+        
+        results = []
+        for s, (split_idx, test_data, test_prices, num_bars, _) in enumerate(splits):
+            print(f"\n=== Backtesting ARIMA Strategy ===")
+            print(f"Training samples: {split_idx}")
+            print(f"Testing samples: {len(test_data)}")
+            k = num_trades[s]
+            simulated = (values[s, :num_bars], share_hist[s, :num_bars], cash_hist[s, :num_bars],
+                         trade_idx[s, :k], trade_actions[s, :k], trade_shares[s, :k])
+            results.append(self._backtest_results(test_data, test_prices, num_bars, initial_capital, simulated))
+        return results
+    
+    def _signal_codes(self, predicted, prices):
+        """Signal code per bar from the predicted price; the same rule
+        generate_signals applies to a single price"""
+        expected_returns = (predicted - prices) / prices
+        signals = np.zeros(len(prices), dtype=np.int8)
+        signals[expected_returns > self.confidence_threshold] = SIGNAL_CODES['BUY']
+        signals[expected_returns < -self.confidence_threshold] = SIGNAL_CODES['SELL']
+        return signals
+    
+    def _backtest_results(self, test_data, test_prices, num_bars, initial_capital, simulated):
+        """Build and print the backtest result dict from the kernel's outputs"""
+        values, share_hist, cash_hist, trade_idx, trade_actions, trade_shares = simulated
+        prices = test_prices[:num_bars]
+        
+        timeline = list(test_data.index[:num_bars])
+        # Per-trade price, value and label for all trades at once; the loop below
+        # only packs the ready columns into dicts
+        trade_prices = prices[trade_idx]
+        trade_values = trade_shares * trade_prices
+        trade_labels = np.where(trade_actions == SIGNAL_CODES['BUY'], 'BUY', 'SELL')
+        trades = [
+            {
+                'date': timeline[i],
+                'action': action,
+                'price': price,
+                'shares': shares,
+                'value': value
+            }
+            for i, action, price, shares, value in zip(
+                trade_idx.tolist(), trade_labels.tolist(), trade_prices.tolist(),
+                trade_shares.tolist(), trade_values.tolist()
+            )
+        ]
         portfolio = {
-            'cash': initial_capital,
-            'shares': 0,
-            'total_value': initial_capital,
-            'trades': [],
-            'portfolio_values': [],
-            'share_history': [],
-            'cash_history': [],
-            'timeline': []
+            'cash': cash_hist[-1] if num_bars else initial_capital,
+            'shares': int(share_hist[-1]) if num_bars else 0,
+            'total_value': values[-1] if num_bars else initial_capital,
+            'trades': trades,
+            # Per-bar histories stay as the kernel's preallocated arrays; no
+            # per-element boxing into Python floats/ints
+            'portfolio_values': values,
+            'share_history': share_hist,
+            'cash_history': cash_hist,
+            'timeline': timeline,
+            # The same trades as arrays, one per field, for column-wise consumers
+            'trade_columns': {
+                'date': test_data.index[trade_idx].to_numpy(dtype=object),
+                'action': trade_labels.astype(object),
+                'price': trade_prices,
+                'shares': trade_shares,
+                'value': trade_values
+            }
         }
-
-        # Simulate trading
-        for i in range(len(test_data) - self.prediction_horizon):
-            current_price = test_data.iloc[i]
-            current_date = test_data.index[i]
-            
-            # Retrain model with expanding window (optional, computationally expensive)
-            # For now, use initial model
-            
-            # Make prediction
-            forecast = self.model.forecast(steps=self.prediction_horizon)
-            temp_predictions = pd.DataFrame({'prediction': forecast})
-            
-            # Generate signal
-            signal = self.generate_signals(current_price, temp_predictions)
-            
-            # Execute trade based on signal
-            if signal['action'] == 'BUY' and portfolio['cash'] > current_price:
-                # Buy as many shares as possible
-                shares_to_buy = int(portfolio['cash'] / current_price)
-                if shares_to_buy > 0:
-                    cost = shares_to_buy * current_price
-                    portfolio['shares'] += shares_to_buy
-                    portfolio['cash'] -= cost
-                    
-                    portfolio['trades'].append({
-                        'date': current_date,
-                        'action': 'BUY',
-                        'price': current_price,
-                        'shares': shares_to_buy,
-                        'value': cost
-                    })
-                    
-            elif signal['action'] == 'SELL' and portfolio['shares'] > 0:
-                # Sell all shares
-                revenue = portfolio['shares'] * current_price
-                portfolio['cash'] += revenue
-                
-                portfolio['trades'].append({
-                    'date': current_date,
-                    'action': 'SELL',
-                    'price': current_price,
-                    'shares': portfolio['shares'],
-                    'value': revenue
-                })
-                
-                portfolio['shares'] = 0
-            
-            # Calculate portfolio value
-            portfolio['total_value'] = portfolio['cash'] + portfolio['shares'] * current_price
-            portfolio['portfolio_values'].append(portfolio['total_value'])
-            portfolio['share_history'].append(portfolio['shares'])
-            portfolio['cash_history'].append(portfolio['cash'])
-            portfolio['timeline'].append(current_date)
         
         # Calculate final metrics
         final_value = portfolio['total_value']
         total_return = (final_value - initial_capital) / initial_capital
         
         # Calculate buy-and-hold benchmark
-        buy_hold_return = (test_data.iloc[-1] - test_data.iloc[0]) / test_data.iloc[0]
+        buy_hold_return = (test_prices[-1] - test_prices[0]) / test_prices[0]
         
         results = {
             'initial_capital': initial_capital,
@@ -386,6 +823,37 @@ class ARIMATradingAlgorithm:
         
         return results
     
+    def _rolling_predictions(self, train_prices, prices, refit_every=None):
+        """
+        Expanding-window predictions for a rolling backtest. Each bar's price is
+        added with extend(), which runs the Kalman filter over that one
+        observation from the previous final state, so a step costs O(1) rather
+        than re-filtering (and copying) the whole history as append() does.
+        Every refit_every bars the parameters are re-estimated on a view of the
+        full history, warm-started from the current ones; self.model ends as
+        the most recent full fit.
+        
+        Returns:
+            Array with the prediction_horizon-ahead price predicted at each bar
+        """
+        # Training prices and test bars in one buffer; history[:end] is a view
+        history = np.concatenate((np.asarray(train_prices, dtype=np.float64), prices))
+        num_train = len(history) - len(prices)
+        
+        predicted = np.empty(len(prices), dtype=np.float64)
+        results = self.model
+        for i in range(len(prices)):
+            if refit_every and (i + 1) % refit_every == 0:
+                model = build_state_space(history[:num_train + i + 1], self.best_order)
+                # Warm start unless the current fit came from a different spec (pmdarima)
+                same_spec = list(results.model.param_names) == list(model.param_names)
+                self.model = model.fit(start_params=results.params if same_spec else None, **FIT_KWARGS)
+                results = self.model
+            else:
+                results = results.extend(prices[i:i + 1])
+            predicted[i] = np.asarray(results.forecast(steps=self.prediction_horizon))[-1]
+        return predicted
+    
     def calculate_metrics(self, actual, predicted):
         """
         Calculate prediction accuracy metrics
@@ -397,9 +865,15 @@ class ARIMATradingAlgorithm:
         Returns:
             dict: Dictionary of metrics (MAE, RMSE, MAPE)
         """
-        mae = mean_absolute_error(actual, predicted)
-        rmse = np.sqrt(mean_squared_error(actual, predicted))
-        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+        # Plain float64 arrays: values pair up by position, with no pandas index alignment
+        actual = np.ascontiguousarray(actual, dtype=np.float64)
+        predicted = np.ascontiguousarray(predicted, dtype=np.float64)
+        
+        diff = np.subtract(actual, predicted)
+        abs_err = np.abs(diff)
+        mae = abs_err.mean()
+        rmse = np.sqrt(np.mean(diff * diff))
+        mape = 100.0 * np.mean(abs_err / np.abs(actual))
         
         metrics = {
             'MAE': mae,
@@ -423,6 +897,9 @@ class ARIMATradingAlgorithm:
             predictions: Predicted prices
             title: Plot title
         """
+        if isinstance(predictions, Predictions):
+            predictions = predictions.to_frame()
+        
         plt.figure(figsize=(12, 6))
         
         # Plot historical data
@@ -473,7 +950,7 @@ def run_arima_demo():
     # Test stationarity
     print("\n1. STATIONARITY TEST")
     print("-" * 40)
-    arima_algo.test_stationarity(price_series)
+    arima_algo.test_stationarity(price_series, verbose=True)
     
     # Find optimal ARIMA order
     print("\n2. PARAMETER OPTIMIZATION")
@@ -493,8 +970,8 @@ def run_arima_demo():
     # Generate trading signal
     print("\n4. TRADING SIGNAL")
     print("-" * 40)
-    current_price = price_series.iloc[-1]
-    signal = arima_algo.generate_signals(current_price)
+    current_price = price_series.iat[-1]
+    signal = arima_algo.generate_signals(current_price, include_reason=True, record_signals=True)
     
     print(f"\nCurrent Price: ${current_price:.2f}")
     print(f"Signal: {signal['action']}")
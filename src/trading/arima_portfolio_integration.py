@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 """ARIMA portfolio integration and backtesting utilities."""
 
+import hashlib
+import io
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, redirect_stdout
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
@@ -12,10 +16,97 @@ import pandas as pd
 # Ensure repo modules are importable when running as a script
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from database.db_connection import DatabaseConnection
+# Persist statsforecast's numba compilations across runs (read when it is imported)
+os.environ.setdefault("NIXTLA_NUMBA_CACHE", "1")
+
+try:
+    from numba import njit
+except ImportError:  # Without numba the kernel below runs as a plain Python loop
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+from mysql.connector import Error
+
+from database.db_connection import DatabaseConnection, get_pool
 from portfolio.portfolio_manager import PortfolioManager
 from data.data_collector import DataCollector
 from trading.arima_algorithm import ARIMATradingAlgorithm
+from trading.blas_threads import limit_blas_threads
+from trading.order_cache import load_cached_orders, save_orders
+
+
+# Close prices are held as float32, which halves the memory and pickling cost of
+# every series; fitting and simulation upcast to float64 where they need it
+PRICE_DTYPES = {"close_price": np.float32}
+# Rows typed per fetch in the bulk history query (caps the Python tuples alive at once)
+BULK_FETCH_CHUNK_ROWS = 100_000
+
+# Columns of ARIMAPortfolioTrader's trade log, symbol first, and their dtypes
+TRADE_LOG_FIELDS = ('symbol', 'date', 'action', 'price', 'shares', 'value')
+TRADE_LOG_DTYPES = (object, object, object, float, float, float)
+
+
+def _backtest_symbol(payload):
+    """Process-pool entry point: rebuild one stock's series from plain arrays, run
+    its backtest and return (symbol, captured output, backtest results, fitted
+    order or None, its AIC or None)."""
+    symbol, dates, prices, train_size, capital, horizon, forecast, order = payload
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        price_series = pd.Series(prices, index=pd.DatetimeIndex(dates), copy=False)
+        # Already one stock per process, so any order search runs sequentially
+        algo = ARIMATradingAlgorithm(
+            confidence_threshold=0.02,
+            prediction_horizon=horizon,
+            n_jobs=1
+        )
+        backtest = algo.backtest(
+            price_series,
+            train_size=train_size,
+            initial_capital=capital,
+            forecast=forecast,
+            order=order
+        )
+    aic = algo.model.aic if algo.model is not None else None
+    return symbol, buffer.getvalue(), backtest, algo.best_order, aic
+
+
+def _series_key(symbol, series, *settings):
+    """Cache key for one stock's price Series under the given settings: a hash
+    of its values plus its last date, so an appended bar or a revised price
+    gives a new key"""
+    digest = hashlib.blake2b(np.ascontiguousarray(series.to_numpy()).tobytes(), digest_size=16)
+    last_date = series.index[-1] if len(series) else None
+    return (symbol, digest.hexdigest(), last_date) + settings
+
+
+@njit(cache=True)
+def _return_stats(values):
+    """
+    One pass over a value series computing the step returns
+    values[i] / values[i - 1] - 1 and their count, mean and sample standard
+    deviation (Welford's update), skipping NaN steps such as 0/0.
+    """
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(1, len(values)):
+        prev = values[i - 1]
+        cur = values[i]
+        if prev == 0.0:
+            if cur == 0.0 or np.isnan(cur):
+                continue
+            r = np.inf if cur > 0.0 else -np.inf
+        else:
+            r = cur / prev - 1.0
+        if np.isnan(r):
+            continue
+        count += 1
+        delta = r - mean
+        mean += delta / count
+        m2 += delta * (r - mean)
+    std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+    return count, mean, std
 
 
 class MockTradingEnvironment:
@@ -26,9 +117,15 @@ class MockTradingEnvironment:
         self.risk_free_rate = risk_free_rate
 
     def evaluate_series(self, value_series: pd.Series) -> Dict[str, float]:
-        values = pd.Series(value_series, dtype=float)
+        # The statistics only need the float64 array; a float Series (as
+        # total_values is) is returned as is rather than copied into a new one
+        v = np.asarray(value_series, dtype=np.float64)
+        if isinstance(value_series, pd.Series) and value_series.dtype == np.float64:
+            values = value_series
+        else:
+            values = pd.Series(v)
 
-        if values.empty:
+        if not v.size:
             return {
                 "initial_value": self.initial_capital,
                 "final_value": self.initial_capital,
@@ -39,18 +136,18 @@ class MockTradingEnvironment:
                 "value_series": values
             }
 
-        returns = values.pct_change().dropna()
-        initial_value = values.iloc[0]
-        final_value = values.iloc[-1]
+        # Daily return count/mean/std in the compiled kernel, straight from the
+        # ndarray; 0/0 steps are dropped, as pct_change().dropna() did
+        num_returns, avg_daily_return, daily_volatility = _return_stats(v)
+        initial_value = v[0]
+        final_value = v[-1]
         total_return = (final_value - initial_value) / initial_value if initial_value else 0.0
 
-        if returns.empty:
+        if num_returns == 0:
             annualized_return = 0.0
             annualized_volatility = 0.0
             sharpe_ratio = np.nan
         else:
-            avg_daily_return = returns.mean()
-            daily_volatility = returns.std()
             annualized_return = (1 + avg_daily_return) ** 252 - 1
             annualized_volatility = daily_volatility * np.sqrt(252)
             sharpe_ratio = (
@@ -77,16 +174,32 @@ class ARIMAPortfolioTrader:
         portfolio_id: int,
         initial_capital: float = 10000.0,
         risk_free_rate: float = 0.02,
-        min_history: int = 90
+        min_history: int = 90,
+        prediction_horizon: int = 5,
+        fixed_order: Optional[tuple] = None
     ) -> None:
         self.portfolio_id = portfolio_id
         self.initial_capital = float(initial_capital)
         self.risk_free_rate = risk_free_rate
         self.min_history = min_history
-
+        self.prediction_horizon = prediction_horizon
+        # ARIMA order used for every stock (skips the order search entirely)
+        self.fixed_order = tuple(fixed_order) if fixed_order else None
+        # _series_key -> batched forecast / (output, backtest), so repeated
+        # simulations over unchanged prices skip the fit and the backtest
+        self._forecast_cache: Dict[tuple, np.ndarray] = {}
+        self._backtest_cache: Dict[tuple, tuple] = {}
+        # symbol -> date of its last Yahoo refetch; Yahoo has nothing newer to
+        # give the same day, so a symbol still short after one is not refetched
+        self._refetched_on: Dict[str, object] = {}
+
+        # One DatabaseConnection shared by the trader, portfolio manager and
+        # data collector instead of three separate connections
         self.db = DatabaseConnection()
         self.portfolio_manager = PortfolioManager()
+        self.portfolio_manager.db = self.db
         self.data_collector = DataCollector()
+        self.data_collector.db = self.db
 
         self.results: Optional[Dict] = None
 
@@ -103,107 +216,312 @@ class ARIMAPortfolioTrader:
                 WHERE s.symbol = %s AND h.date >= %s
                 ORDER BY h.date ASC
             """
-            rows = self.db.execute_query(query, (symbol, start_date))
-            if not rows:
+            # pandas parses, indexes and types the column while building the frame
+            df = self.db.read_dataframe(query, (symbol, start_date), parse_dates=["date"],
+                                        index_col="date", dtype=PRICE_DTYPES)
+            if df is None or df.empty:
                 return None
 
-            df = pd.DataFrame(rows, columns=["date", "close_price"])
-            df["date"] = pd.to_datetime(df["date"])
-            df.set_index("date", inplace=True)
-            return df["close_price"].astype(float)
+            return df.squeeze("columns")
         except Exception as exc:  # pragma: no cover - defensive logging
             print(f"Error fetching data for {symbol}: {exc}")
             return None
 
+    def fetch_bulk_price_history(
+        self,
+        symbols: List[str],
+        lookback_days: int = 365,
+        start_date=None
+    ) -> Dict[str, pd.Series]:
+        """Close prices for several symbols in one JOIN query, split into one
+        date-indexed Series per symbol. Symbols without rows are left out.
+        start_date overrides the window start computed from lookback_days."""
+        if not symbols:
+            return {}
+        try:
+            if start_date is None:
+                start_date = (datetime.utcnow() - timedelta(days=lookback_days)).date()
+            placeholders = ",".join(["%s"] * len(symbols))
+            query = f"""
+                SELECT s.symbol, h.date, h.close_price
+                FROM stock_historical_data h
+                JOIN stocks s ON s.stock_id = h.stock_id
+                WHERE s.symbol IN ({placeholders}) AND h.date >= %s
+                ORDER BY s.symbol, h.date ASC
+            """
+            df = self.db.read_dataframe(query, tuple(symbols) + (start_date,), parse_dates=["date"],
+                                        index_col="date", dtype=PRICE_DTYPES,
+                                        chunksize=BULK_FETCH_CHUNK_ROWS)
+            if df is None or df.empty:
+                return {}
+
+            # Each group of the date-indexed price column is already that symbol's Series
+            return {
+                symbol: prices
+                for symbol, prices in df["close_price"].groupby(df["symbol"].to_numpy(), sort=False)
+            }
+        except Exception as exc:  # pragma: no cover - defensive logging
+            print(f"Error fetching data for {', '.join(symbols)}: {exc}")
+            return {}
+
+    def _load_price_history(self, stocks: List, lookback_days: int) -> Dict[str, pd.Series]:
+        """Price Series for every holding with at least min_history rows. One
+        query loads every holding's history; only the stocks that come back
+        short are fetched from Yahoo and then re-read together."""
+        symbols = [stock[1] for stock in stocks]
+        # One window start for the whole load, so the refetch below reads
+        # exactly the same date range as the first query
+        start_date = (datetime.utcnow() - timedelta(days=lookback_days)).date()
+        history = self.fetch_bulk_price_history(symbols, lookback_days, start_date=start_date)
+        # Settle every holding from the first query in one pass: viable ones are
+        # kept, and only the short list goes on to the Yahoo refetch
+        viable = {symbol for symbol in symbols if len(history.get(symbol, ())) >= self.min_history}
+        short = [symbol for symbol in symbols if symbol not in viable]
+        print(f"\n{len(viable)} of {len(symbols)} holdings have at least {self.min_history} days of history")
+
+        today = datetime.utcnow().date()
+        missing = []
+        for symbol in short:
+            if self._refetched_on.get(symbol) == today:
+                print(f"  {symbol}: insufficient historical data; already refetched today")
+                continue
+            self._refetched_on[symbol] = today
+            missing.append(symbol)
+
+        if missing:
+            # Holdings are already in the stocks table, so their refetch is one
+            # multi-ticker Yahoo download (tickers fetched on yfinance's threads);
+            # given symbols may be new and go through fetch_stock_data, which adds them
+            known = {stock[1] for stock in stocks if stock[0] is not None}
+            batch = [symbol for symbol in missing if symbol in known]
+            if batch:
+                print(f"  Insufficient historical data for {', '.join(batch)}; fetching from Yahoo Finance...")
+                self.data_collector.fetch_stock_data_batch(batch, period='2y')
+            for symbol in missing:
+                if symbol not in known:
+                    print(f"  {symbol}: insufficient historical data, fetching from Yahoo Finance...")
+                    self.data_collector.fetch_stock_data(symbol, period='2y')
+
+            # End the read snapshot so the collector's committed rows are visible
+            self.db.refresh()
+            refetched = self.fetch_bulk_price_history(missing, lookback_days, start_date=start_date)
+            for symbol in missing:
+                if len(refetched.get(symbol, ())) >= self.min_history:
+                    history[symbol] = refetched[symbol]
+                    viable.add(symbol)
+
+        for symbol in short:
+            if symbol not in viable:
+                print(f"  Skipping {symbol}; still insufficient data after refresh.")
+        # Portfolio order, viable holdings only
+        return {symbol: history[symbol] for symbol in symbols if symbol in viable}
+
+    @contextmanager
+    def db_session(self):
+        """Borrow one pooled connection for a whole simulation; the portfolio
+        manager and data collector share self.db, so every query of the cycle
+        reuses it. If the pool can't be opened the connection is made lazily."""
+        if not self.db.connection:
+            try:
+                self.db.connection = get_pool().get_connection()
+            except Error as e:
+                print(f"Connection pool unavailable, connecting directly: {e}")
+        try:
+            yield self.db
+        finally:
+            self.db.release()
+
     # ------------------------------------------------------------------
     # Simulation entry point
     # ------------------------------------------------------------------
     def run_portfolio_simulation(
         self,
         lookback_days: int = 365,
-        train_size: float = 0.8
+        train_size: float = 0.8,
+        symbols: Optional[List[str]] = None
     ) -> Optional[Dict]:
-        stocks = self.portfolio_manager.get_portfolio_stocks(self.portfolio_id)
+        """Backtest the portfolio's holdings, or only the given symbols. Passing
+        symbols (e.g. one shard of a scheduled batch) skips the holdings query;
+        the capital is then split evenly across them."""
+        # Windows that can't produce a simulation are rejected before a
+        # connection is borrowed; a lookback shorter than min_history calendar
+        # days can never hold min_history trading days
+        if not 0 < train_size < 1:
+            print(f"Invalid train_size {train_size}; it must be between 0 and 1.")
+            return None
+        if lookback_days < self.min_history:
+            print(f"Lookback of {lookback_days} days is shorter than the "
+                  f"{self.min_history}-day minimum history.")
+            return None
+
+        if symbols is not None:
+            # Same row shape as get_portfolio_stocks, without a position
+            stocks = [(None, symbol, symbol, 0, 0.0, None) for symbol in dict.fromkeys(symbols)]
+        else:
+            # A portfolio the manager saw empty within its cache TTL needs no connection
+            stocks = self.portfolio_manager._get_cached_portfolio('stocks', self.portfolio_id)
+        if stocks is not None and not stocks:
+            print("No stocks found in the selected portfolio.")
+            return None
+
+        # Holdings and price history are read on one borrowed connection
+        with self.db_session():
+            if stocks is None:
+                stocks = self.portfolio_manager.get_portfolio_stocks(self.portfolio_id)
+            price_series_map = self._load_price_history(stocks, lookback_days) if stocks else {}
+            # Orders searched within the last few days, by this trader or by
+            # run_arima_trading, are fitted directly instead of searched again
+            stock_ids = {stock[1]: stock[0] for stock in stocks or () if stock[0] is not None}
+            cached_orders = {} if self.fixed_order else load_cached_orders(self.db, list(stock_ids.values()))
+            known_orders = {symbol: cached_orders[stock_id]
+                            for symbol, stock_id in stock_ids.items() if stock_id in cached_orders}
+
         if not stocks:
             print("No stocks found in the selected portfolio.")
             return None
 
         allocation_per_stock = self.initial_capital / len(stocks)
-        value_series_map: Dict[str, pd.Series] = {}
-        share_series_map: Dict[str, pd.Series] = {}
         per_stock_reports: Dict[str, Dict] = {}
-        trade_log: List[Dict] = []
-
-        try:
-            for stock_id, symbol, company_name, quantity, avg_cost, _ in stocks:
-                print(f"\nProcessing {symbol} ({company_name})")
-                price_series = self.fetch_stock_data_from_db(symbol, lookback_days)
-
-                if price_series is None or len(price_series) < self.min_history:
-                    print("  Insufficient historical data, fetching from Yahoo Finance...")
-                    self.data_collector.fetch_stock_data(symbol, period='2y')
-                    price_series = self.fetch_stock_data_from_db(symbol, lookback_days)
-
-                if price_series is None or len(price_series) < self.min_history:
-                    print(f"  Skipping {symbol}; still insufficient data after refresh.")
-                    continue
-
-                algo = ARIMATradingAlgorithm(
-                    confidence_threshold=0.02,
-                    prediction_horizon=5
-                )
-
-                backtest = algo.backtest(
-                    price_series,
-                    train_size=train_size,
-                    initial_capital=allocation_per_stock
-                )
-
-                portfolio = backtest['portfolio']
-                portfolio_values = portfolio.get('portfolio_values', [])
-                share_history = portfolio.get('share_history', [])
-
-                value_series = pd.Series([allocation_per_stock] + portfolio_values, dtype=float)
-                share_series = pd.Series([0.0] + share_history, dtype=float)
-                value_series.index = range(len(value_series))
-                share_series.index = range(len(share_series))
-
-                value_series_map[symbol] = value_series
-                share_series_map[symbol] = share_series
-
-                per_stock_reports[symbol] = {
-                    'final_value': backtest['final_value'],
-                    'total_return': backtest['total_return'],
-                    'buy_hold_return': backtest['buy_hold_return'],
-                    'excess_return': backtest['excess_return'],
-                    'trades': portfolio.get('trades', []),
-                    'value_series': value_series,
-                    'share_series': share_series,
-                    'timeline': portfolio.get('timeline', [])
-                }
-
-                for trade in portfolio.get('trades', []):
-                    trade_log.append({
-                        'symbol': symbol,
-                        'date': trade['date'],
-                        'action': trade['action'],
-                        'price': float(trade['price']),
-                        'shares': float(trade['shares']),
-                        'value': float(trade['value'])
-                    })
-        finally:
-            self.db.disconnect()
-
-        if not value_series_map:
+        # Trade log kept column-wise: one list of per-stock arrays per field,
+        # concatenated once after the loop
+        trade_cols: Dict[str, List] = {field: [] for field in TRADE_LOG_FIELDS}
+
+        # Fit every stock's training window in one batched AutoARIMA call; stocks
+        # it could not cover fall back to fitting their own model inside
+        # backtest(). With a fixed order nothing is batched, so every stock is
+        # fitted with that order by the per-stock path below.
+        forecasts = self._batch_forecasts(price_series_map, train_size, self.prediction_horizon,
+                                          order=self.fixed_order)
+
+        # Backtest the stocks in parallel processes; reports are still printed
+        # and collected in portfolio order
+        backtests = {}
+        if (self.fixed_order is None and price_series_map
+                and all(symbol in forecasts for symbol in price_series_map)):
+            # Every stock has a batched forecast, so nothing is left to fit: run
+            # all the simulations in one parallel kernel call in this process.
+            # AutoARIMA picks each order itself, so this path neither reads nor
+            # stores arima_cache orders; only the per-stock path does.
+            algo = ARIMATradingAlgorithm(
+                confidence_threshold=0.02,
+                prediction_horizon=self.prediction_horizon
+            )
+            symbols_in_order = list(price_series_map)
+            batch_results = algo.backtest_many(
+                [price_series_map[symbol] for symbol in symbols_in_order],
+                [forecasts[symbol] for symbol in symbols_in_order],
+                train_size=train_size,
+                initial_capital=allocation_per_stock
+            )
+            backtests = {symbol: ("", result) for symbol, result in zip(symbols_in_order, batch_results)}
+        elif price_series_map:
+            keys = {
+                symbol: _series_key(symbol, price_series, train_size, allocation_per_stock,
+                                    self.prediction_horizon, self.fixed_order)
+                for symbol, price_series in price_series_map.items()
+            }
+            backtests = {
+                symbol: self._backtest_cache[key]
+                for symbol, key in keys.items() if key in self._backtest_cache
+            }
+            pending = [symbol for symbol in price_series_map if symbol not in backtests]
+            if pending:
+                searched = []
+                workers = min(os.cpu_count() or 1, len(pending))
+                with ProcessPoolExecutor(max_workers=workers, initializer=limit_blas_threads) as executor:
+                    futures = [
+                        executor.submit(_backtest_symbol, (
+                            symbol,
+                            price_series_map[symbol].index.to_numpy(),
+                            price_series_map[symbol].to_numpy(),
+                            train_size,
+                            allocation_per_stock,
+                            self.prediction_horizon,
+                            forecasts.get(symbol),
+                            self.fixed_order or known_orders.get(symbol)
+                        ))
+                        for symbol in pending
+                    ]
+                    for future in as_completed(futures):
+                        symbol, output, backtest, order, aic = future.result()
+                        backtests[symbol] = self._backtest_cache[keys[symbol]] = (output, backtest)
+                        if (order is not None and self.fixed_order is None
+                                and symbol not in known_orders and symbol in stock_ids):
+                            searched.append((stock_ids[symbol], tuple(order), aic))
+                # Share the newly searched orders with later runs and run_arima_trading
+                if searched:
+                    with self.db_session():
+                        save_orders(self.db, searched)
+
+        if not price_series_map:
             print("Portfolio simulation skipped: no stocks contained sufficient data.")
             return None
 
-        value_history = self._align_series(value_series_map)
-        share_history = self._align_series(share_series_map)
-        total_values = value_history.sum(axis=1)
+        # Per-stock value and share histories as rows of two dense matrices
+        # (starting capital/no shares in column 0); a stock whose history is
+        # shorter than the longest one holds its last row value to the end
+        symbols = list(price_series_map)
+        lengths = [len(backtests[symbol][1]['portfolio']['portfolio_values']) + 1 for symbol in symbols]
+        max_length = max(lengths)
+        value_matrix = np.empty((len(symbols), max_length), dtype=np.float64)
+        # Share counts are whole numbers, exact in float32
+        share_matrix = np.empty((len(symbols), max_length), dtype=np.float32)
+        # Portfolio total accumulated row by row while each row is still in cache
+        total = np.zeros(max_length, dtype=np.float64)
+
+        for row, symbol in enumerate(symbols):
+            output, backtest = backtests[symbol]
+            sys.stdout.write(output)
+
+            portfolio = backtest['portfolio']
+            length = lengths[row]
+            value_matrix[row, 0] = allocation_per_stock
+            value_matrix[row, 1:length] = portfolio['portfolio_values']
+            value_matrix[row, length:] = value_matrix[row, length - 1]
+            share_matrix[row, 0] = 0.0
+            share_matrix[row, 1:length] = portfolio['share_history']
+            share_matrix[row, length:] = share_matrix[row, length - 1]
+            total += value_matrix[row]
+
+            # Row views, not copies
+            value_series = pd.Series(value_matrix[row, :length], copy=False)
+            share_series = pd.Series(share_matrix[row, :length], copy=False)
+
+            per_stock_reports[symbol] = {
+                'final_value': backtest['final_value'],
+                'total_return': backtest['total_return'],
+                'buy_hold_return': backtest['buy_hold_return'],
+                'excess_return': backtest['excess_return'],
+                'trades': portfolio.get('trades', []),
+                'value_series': value_series,
+                'share_series': share_series,
+                'timeline': portfolio.get('timeline', [])
+            }
+
+            # The backtest's own trade columns, so no per-trade dict is read back
+            columns = portfolio['trade_columns']
+            trade_cols['symbol'].append(np.full(len(columns['action']), symbol, dtype=object))
+            for field in TRADE_LOG_FIELDS[1:]:
+                trade_cols[field].append(columns[field])
+
+        # DataFrames only wrap the matrices (one stock per column) for callers
+        value_history = pd.DataFrame(value_matrix.T, columns=symbols, copy=False)
+        share_history = pd.DataFrame(share_matrix.T, columns=symbols, copy=False)
+        total_values = pd.Series(total, copy=False)
 
         metrics = self._calculate_portfolio_metrics(total_values)
 
+        trade_log = {
+            field: np.concatenate(trade_cols[field]).astype(dtype, copy=False)
+            for field, dtype in zip(TRADE_LOG_FIELDS, TRADE_LOG_DTYPES)
+        }
+        # Trade counts in one comparison over the action column
+        is_buy = trade_log['action'] == 'BUY'
+        metrics['num_trades'] = int(is_buy.size)
+        metrics['num_buys'] = int(is_buy.sum())
+        metrics['num_sells'] = metrics['num_trades'] - metrics['num_buys']
+        metrics['traded_value'] = float(trade_log['value'].sum())
+
         self.results = {
             'value_history': value_history,
             'share_history': share_history,
@@ -215,23 +533,64 @@ class ARIMAPortfolioTrader:
 
         return self.results
 
-    # ------------------------------------------------------------------
-    # Reporting helpers
-    # ------------------------------------------------------------------
-    def _align_series(self, series_map: Dict[str, pd.Series]) -> pd.DataFrame:
-        max_length = max(len(series) for series in series_map.values())
-        target_index = range(max_length)
+    def _batch_forecasts(
+        self,
+        series_map: Dict[str, pd.Series],
+        train_size: float,
+        horizon: int,
+        order: Optional[tuple] = None
+    ) -> Dict[str, np.ndarray]:
+        """Fit AutoARIMA to every stock's training window with one StatsForecast
+        call (series fit in parallel by its compiled ARIMA) and return each
+        stock's horizon-step forecast. Windows unchanged since an earlier call
+        reuse that forecast. Empty if statsforecast is unavailable, or if an
+        order is given: AutoARIMA would choose its own, so those stocks are
+        fitted with that order by the per-stock backtest instead."""
+        if not series_map or order is not None:
+            return {}
 
-        aligned = {}
+        try:
+            from statsforecast import StatsForecast
+            from statsforecast.models import AutoARIMA
+        except ImportError:
+            print("statsforecast is not installed; fitting each stock separately")
+            return {}
+
+        forecasts = {}
+        keys = {}
+        frames = []
         for symbol, series in series_map.items():
-            aligned[symbol] = (
-                series.reindex(target_index)
-                .ffill()
-                .bfill()
-            )
+            train = series.iloc[:int(len(series) * train_size)]
+            keys[symbol] = _series_key(symbol, train, horizon)
+            cached = self._forecast_cache.get(keys[symbol])
+            if cached is not None:
+                forecasts[symbol] = cached
+                continue
+            frames.append(pd.DataFrame({
+                'unique_id': symbol,
+                'ds': train.index,
+                'y': train.to_numpy(dtype=float)
+            }))
+        if not frames:
+            return forecasts
 
-        return pd.DataFrame(aligned, index=target_index)
+        try:
+            sf = StatsForecast(models=[AutoARIMA(season_length=1)], freq='D', n_jobs=-1)
+            forecast_df = sf.forecast(df=pd.concat(frames, ignore_index=True), h=horizon)
+        except Exception as exc:
+            print(f"Batched ARIMA forecast failed ({exc}); fitting each stock separately")
+            return forecasts
+
+        # Older statsforecast releases return unique_id as the index
+        if 'unique_id' not in forecast_df.columns:
+            forecast_df = forecast_df.reset_index()
+        for symbol, group in forecast_df.groupby('unique_id', sort=False):
+            forecasts[symbol] = self._forecast_cache[keys[symbol]] = group['AutoARIMA'].to_numpy()
+        return forecasts
 
+    # ------------------------------------------------------------------
+    # Reporting helpers
+    # ------------------------------------------------------------------
     def _calculate_portfolio_metrics(self, total_values: pd.Series) -> Dict[str, float]:
         env = MockTradingEnvironment(
             initial_capital=self.initial_capital,
@@ -249,42 +608,54 @@ class ARIMAPortfolioTrader:
             return
 
         metrics = results['metrics']
-        value_history = results['value_history']
         share_history = results['share_history']
 
-        print("\n=== PORTFOLIO PERFORMANCE SUMMARY ===")
-        print(f"Initial Capital: ${metrics['initial_value']:,.2f}")
-        print(f"Final Portfolio Value: ${metrics['final_value']:,.2f}")
-        print(f"Total Return: {metrics['total_return']:.2%}")
-        print(f"Annualized Return: {metrics['annualized_return']:.2%}")
-        print(f"Annualized Volatility: {metrics['annualized_volatility']:.2%}")
+        # The whole report is built as lines and written with one call
         sharpe = metrics['sharpe_ratio']
         sharpe_str = f"{sharpe:.2f}" if not pd.isna(sharpe) else "N/A"
-        print(f"Sharpe Ratio: {sharpe_str}")
-
-        print("\nFinal Share Holdings:")
-        final_holdings = share_history.iloc[-1]
-        for symbol, shares in final_holdings.items():
-            print(f"  {symbol}: {shares:.2f} shares")
-
-        print("\nPer-Stock Results:")
-        for symbol, report in results['per_stock'].items():
-            print(
-                f"  {symbol}: Return {report['total_return']:.2%}, "
-                f"Final Value ${report['final_value']:.2f}, Trades {len(report['trades'])}"
+        lines = [
+            "\n=== PORTFOLIO PERFORMANCE SUMMARY ===",
+            f"Initial Capital: ${metrics['initial_value']:,.2f}",
+            f"Final Portfolio Value: ${metrics['final_value']:,.2f}",
+            f"Total Return: {metrics['total_return']:.2%}",
+            f"Annualized Return: {metrics['annualized_return']:.2%}",
+            f"Annualized Volatility: {metrics['annualized_volatility']:.2%}",
+            f"Sharpe Ratio: {sharpe_str}"
+        ]
+        if 'num_trades' in metrics:
+            lines.append(
+                f"Trades: {metrics['num_trades']} ({metrics['num_buys']} buys, "
+                f"{metrics['num_sells']} sells), traded value ${metrics['traded_value']:,.2f}"
             )
 
-        if results['trade_log']:
-            print("\nSample Trades:")
-            for trade in results['trade_log'][:sample_trades]:
-                trade_date = trade['date']
+        lines.append("\nFinal Share Holdings:")
+        # Last row straight from the float block, without building a row Series
+        final_holdings = share_history.to_numpy(copy=False)[-1]
+        lines.extend(
+            f"  {symbol}: {shares:.2f} shares"
+            for symbol, shares in zip(share_history.columns, final_holdings.tolist())
+        )
+
+        lines.append("\nPer-Stock Results:")
+        lines.extend(
+            f"  {symbol}: Return {report['total_return']:.2%}, "
+            f"Final Value ${report['final_value']:.2f}, Trades {len(report['trades'])}"
+            for symbol, report in results['per_stock'].items()
+        )
+
+        trade_log = results['trade_log']
+        num_samples = min(sample_trades, len(trade_log['symbol']))
+        if num_samples:
+            lines.append("\nSample Trades:")
+            for trade_date, symbol, action, shares, price in zip(
+                    trade_log['date'][:num_samples], trade_log['symbol'][:num_samples],
+                    trade_log['action'][:num_samples], trade_log['shares'][:num_samples].tolist(),
+                    trade_log['price'][:num_samples].tolist()):
                 date_str = trade_date.strftime('%Y-%m-%d') if hasattr(trade_date, 'strftime') else trade_date
-                print(
-                    f"  {date_str} - {trade['symbol']} {trade['action']} "
-                    f"{trade['shares']:.0f} @ ${trade['price']:.2f}"
-                )
+                lines.append(f"  {date_str} - {symbol} {action} {shares:.0f} @ ${price:.2f}")
 
-        print("\nPortfolio value history is available via results['value_history'].")
+        lines.append("\nPortfolio value history is available via results['value_history'].")
+        sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main() -> None:
@@ -299,12 +670,29 @@ def main() -> None:
     capital_input = input("Enter initial capital (default 10000): ").strip()
     initial_capital = float(capital_input) if capital_input else 10000.0
 
+    # A fixed order skips the per-stock order search, e.g. for scheduled daily runs
+    order_input = input("Fixed ARIMA order p,d,q (blank to search per stock): ").strip()
+    fixed_order = None
+    if order_input:
+        try:
+            fixed_order = tuple(int(part) for part in order_input.split(","))
+        except ValueError:
+            fixed_order = None
+        if fixed_order is None or len(fixed_order) != 3:
+            print("Invalid ARIMA order provided.")
+            return
+
+    # Known symbols skip the holdings lookup, e.g. for a scheduled batch shard
+    symbols_input = input("Symbols to simulate, comma separated (blank for portfolio holdings): ").strip()
+    symbols = [part.strip().upper() for part in symbols_input.split(",") if part.strip()] or None
+
     trader = ARIMAPortfolioTrader(
         portfolio_id=portfolio_id,
-        initial_capital=initial_capital
+        initial_capital=initial_capital,
+        fixed_order=fixed_order
     )
 
-    results = trader.run_portfolio_simulation()
+    results = trader.run_portfolio_simulation(symbols=symbols)
     if results:
         trader.print_report(results)
     
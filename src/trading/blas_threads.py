@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+BLAS thread limits for ARIMA worker processes
+Kept free of pandas/statsmodels imports so scripts can pass the pool
+initializer without loading the ARIMA algorithm
+"""
+
+import os
+
+BLAS_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def limit_blas_threads():
+    """
+    Process-pool initializer: one BLAS thread per worker, so N processes fitting
+    ARIMA models do not each start a full BLAS thread pool on top of one another
+    """
+    for var in BLAS_THREAD_VARS:
+        os.environ[var] = "1"
+    # Forked workers inherit an already-initialized BLAS, which no longer reads
+    # the environment; threadpoolctl (a scikit-learn dependency) caps it directly
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=1, user_api='blas')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Per-stock ARIMA (p, d, q) orders stored in the arima_cache table
+Shared by run_arima_trading and ARIMAPortfolioTrader, so an order searched by
+either is reused by both for ORDER_CACHE_DAYS
+"""
+
+ORDER_CACHE_DAYS = 7  # Days a searched (p, d, q) is reused before searching again
+
+# Same definition as sql/init.sql; databases initialised before the table was
+# added get it on first use
+CREATE_ORDER_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS arima_cache (
+    stock_id INT PRIMARY KEY,
+    p TINYINT NOT NULL,
+    d TINYINT NOT NULL,
+    q TINYINT NOT NULL,
+    aic DOUBLE,
+    fitted_at DATETIME NOT NULL,
+    FOREIGN KEY (stock_id) REFERENCES stocks(stock_id) ON DELETE CASCADE
+)
+"""
+
+# Set once CREATE_ORDER_CACHE_TABLE has succeeded in this process
+_table_ready = False
+
+
+def ensure_order_cache_table(db):
+    """Create arima_cache if it is missing; only the first call per process runs the DDL"""
+    global _table_ready
+    if not _table_ready:
+        db.execute_update(CREATE_ORDER_CACHE_TABLE)
+        _table_ready = db.last_error is None
+    return _table_ready
+
+
+def load_cached_orders(db, stock_ids):
+    """
+    Fetch the (p, d, q) orders found within the last ORDER_CACHE_DAYS for
+    several stocks in one query
+    
+    Returns:
+        Dictionary of {stock_id: (p, d, q)}
+    """
+    if not stock_ids or not ensure_order_cache_table(db):
+        return {}
+    
+    placeholders = ",".join(["%s"] * len(stock_ids))
+    query = f"""
+    SELECT stock_id, p, d, q FROM arima_cache
+    WHERE stock_id IN ({placeholders})
+    AND fitted_at > NOW() - INTERVAL %s DAY
+    """
+    rows = db.execute_query(query, tuple(stock_ids) + (ORDER_CACHE_DAYS,)) or []
+    return {stock_id: (p, d, q) for stock_id, p, d, q in rows}
+
+
+def save_orders(db, rows):
+    """
+    Upsert freshly searched orders into arima_cache
+    
+    Args:
+        rows: list of (stock_id, (p, d, q), aic or None)
+    """
+    rows = [(stock_id, *order, aic) for stock_id, order, aic in rows]
+    if not rows or not ensure_order_cache_table(db):
+        return
+    
+    upsert_query = """
+    INSERT INTO arima_cache (stock_id, p, d, q, aic, fitted_at)
+    VALUES (%s, %s, %s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        p = VALUES(p), d = VALUES(d), q = VALUES(q),
+        aic = VALUES(aic), fitted_at = VALUES(fitted_at)
+    """
+    db.execute_batch(upsert_query, rows)